@@ -0,0 +1,86 @@
+import { spawn } from 'child_process';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import fs from 'fs';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+const testingDir = path.resolve(__dirname, '../../testingcompo');
+const wrapperPath = path.join(testingDir, 'python_wrapper.py');
+
+// Long-running `python_wrapper.py serve` process shared by all uploads.
+// Requests and responses are JSON lines matched by id, so several uploads
+// can be in flight at once without paying interpreter startup each time.
+let worker = null;
+let nextId = 1;
+
+function pythonExecutable() {
+  // Prefer virtualenv python if available
+  const venvPy = path.join(testingDir, '.venv', 'bin', 'python');
+  return fs.existsSync(venvPy) ? venvPy : 'python3';
+}
+
+function startWorker() {
+  const concurrency = process.env.PYTHON_WORKER_CONCURRENCY || '2';
+  const py = spawn(pythonExecutable(), [wrapperPath, 'serve', '--concurrency', concurrency], { cwd: testingDir });
+  const pending = new Map();
+  py.pending = pending;
+
+  let buffer = '';
+  let stderr = '';
+  py.stdout.on('data', d => {
+    buffer += d.toString();
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      if (!line.trim()) continue;
+
+      let response;
+      try {
+        response = JSON.parse(line);
+      } catch {
+        continue;
+      }
+      const request = pending.get(response.id);
+      if (!request) continue;
+      pending.delete(response.id);
+      if (response.ok) request.resolve(response.result);
+      else request.reject(new Error(response.error || 'Converter request failed'));
+    }
+  });
+  py.stderr.on('data', d => (stderr = (stderr + d.toString()).slice(-4000)));
+
+  const fail = err => {
+    if (worker === py) worker = null;
+    for (const request of pending.values()) request.reject(err);
+    pending.clear();
+  };
+  py.on('error', fail);
+  py.on('close', code => fail(new Error(stderr || `Python worker exited ${code}`)));
+
+  return py;
+}
+
+export function converterRequest(mode, pdfFilePath, columnMapping) {
+  if (!worker) worker = startWorker();
+
+  const absPdfPath = path.isAbsolute(pdfFilePath)
+    ? pdfFilePath
+    : path.resolve(process.cwd(), pdfFilePath);
+
+  const id = nextId++;
+  const request = { id, mode, pdf_path: absPdfPath };
+  if (columnMapping) request.column_mapping = columnMapping;
+
+  return new Promise((resolve, reject) => {
+    worker.pending.set(id, { resolve, reject });
+    worker.stdin.write(JSON.stringify(request) + '\n');
+  });
+}
+
+export function stopWorker() {
+  if (worker) worker.stdin.end();
+  worker = null;
+}
@@ -0,0 +1,124 @@
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional
+from student_store import StudentStore, RowChange
+
+
+class StudentStats:
+    """
+    Materialized branch/section counters maintained alongside the student data
+    """
+
+    def __init__(self, store: Optional[StudentStore] = None):
+        self.total = 0
+        self.branches: Counter = Counter()
+        self.sections: Counter = Counter()
+        self.branch_sections: Counter = Counter()
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+        if store is not None:
+            self.build(store)
+
+    def build(self, store: StudentStore):
+        """
+        Recount everything from a store using its dictionary-encoded codes
+        """
+        branch_column = store.column("B")
+        section_column = store.column("Sec")
+
+        # Count (branch code, section code) pairs once and derive the rest
+        pair_codes = Counter(zip(branch_column.codes, section_column.codes))
+
+        branch_sections = Counter()
+        for (branch_code, section_code), count in pair_codes.items():
+            branch_sections[(branch_column.values[branch_code], section_column.values[section_code])] += count
+
+        self.total = len(store)
+        self.branch_sections = branch_sections
+        self.branches = Counter()
+        self.sections = Counter()
+        for (branch, section), count in branch_sections.items():
+            self.branches[branch] += count
+            self.sections[section] += count
+        self._snapshot = None
+
+    def add(self, student: Dict[str, Any]):
+        """
+        Account for one inserted student
+        """
+        self._update(student, 1)
+
+    def remove(self, student: Dict[str, Any]):
+        """
+        Account for one removed student
+        """
+        self._update(student, -1)
+
+    def updated(self, changes: List[RowChange]) -> "StudentStats":
+        """
+        Return a copy accounting for replaced and appended rows
+        """
+        stats = StudentStats()
+        stats.total = self.total
+        stats.branches = Counter(self.branches)
+        stats.sections = Counter(self.sections)
+        stats.branch_sections = Counter(self.branch_sections)
+
+        for _, old, new in changes:
+            if old is not None:
+                stats.remove(old)
+            stats.add(new)
+        return stats
+
+    def _update(self, student: Dict[str, Any], delta: int):
+        branch = student.get("B", "")
+        section = student.get("Sec", "")
+
+        self.total += delta
+        for counter, key in ((self.branches, branch), (self.sections, section),
+                             (self.branch_sections, (branch, section))):
+            counter[key] += delta
+            if counter[key] <= 0:
+                del counter[key]
+        self._snapshot = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the aggregates as plain dicts; cached until the next change
+        """
+        if self._snapshot is None:
+            cross_tab: Dict[str, Dict[str, int]] = {}
+            for (branch, section), count in self.branch_sections.items():
+                cross_tab.setdefault(branch, {})[section] = count
+
+            self._snapshot = {
+                "total_students": self.total,
+                "branches": dict(self.branches),
+                "sections": dict(self.sections),
+                "branch_sections": cross_tab,
+            }
+
+        return self._snapshot
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine StudentStats snapshots from several shards into one
+    """
+    total = 0
+    branches: Counter = Counter()
+    sections: Counter = Counter()
+    cross_tab: Dict[str, Counter] = {}
+
+    for snapshot in snapshots:
+        total += snapshot["total_students"]
+        branches.update(snapshot["branches"])
+        sections.update(snapshot["sections"])
+        for branch, counts in snapshot["branch_sections"].items():
+            cross_tab.setdefault(branch, Counter()).update(counts)
+
+    return {
+        "total_students": total,
+        "branches": dict(branches),
+        "sections": dict(sections),
+        "branch_sections": {branch: dict(counts) for branch, counts in cross_tab.items()},
+    }
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmarks for the Student Data API, run in-process
+
+The FastAPI app is driven through an ASGI client, so no server, port or
+sleep is needed. For each dataset size a deterministic synthetic dataset is
+written to a temporary directory and loaded by the app's own startup, then
+every endpoint is timed and p50/p95/p99 latency and requests per second are
+reported. Results are saved as JSON; pass an earlier results file as
+--baseline to see what regressed.
+
+Run: python api_benchmark.py [sizes...] [--requests N] [--concurrency N]
+                             [--output FILE] [--baseline FILE] [--cache]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmark import DEFAULT_SIZES, generate_students, misspell
+
+DEFAULT_REQUESTS = 200
+DEFAULT_OUTPUT = "api_benchmark_results.json"
+
+# Institution that upload benchmarks write to, so the measured shard stays untouched
+UPLOAD_INSTITUTION = "benchmark-uploads"
+UPLOAD_BATCH = 100
+UPLOAD_POOL = 1000
+
+# p95 increase over a baseline reported as a regression: relative, and in ms so
+# that jitter on sub-millisecond endpoints is not flagged
+REGRESSION_THRESHOLD = 0.2
+REGRESSION_MIN_MS = 1.0
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# A request is (method, url, keyword arguments for the client)
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+class Scenario:
+    """
+    One endpoint to benchmark: a factory for varied requests plus the statuses it may answer with
+
+    Heavy scenarios return the whole dataset, so they run fewer requests.
+    """
+
+    def __init__(self, name: str, make_request: Callable[[random.Random], Request],
+                 statuses: Tuple[int, ...] = (200,), heavy: bool = False):
+        self.name = name
+        self.make_request = make_request
+        self.statuses = statuses
+        self.heavy = heavy
+
+
+def build_scenarios(app_module, sample: List[Dict[str, str]], total: int, proof: Dict[str, Any]) -> List[Scenario]:
+    """
+    Scenarios for every read and upload endpoint, drawing keys from sampled students
+
+    PDF uploads (and their jobs and column listing) are not included: their
+    cost is extraction, which `python benchmark.py pages` measures directly.
+    """
+    def pick(rng):
+        return rng.choice(sample)
+
+    def page(rng):
+        cursor = app_module.encode_cursor(rng.randrange(0, max(total - 100, 1)))
+        return "GET", "/students", {"params": {"limit": 100, "cursor": cursor}}
+
+    def verify(rng):
+        students = rng.sample(sample, min(100, len(sample)))
+        return "POST", "/verify", {"json": {
+            "Rno": [student["Rno"] for student in students[:50]],
+            "Jno": [student["Jno"] for student in students[50:]]
+        }}
+
+    pool = generate_students(UPLOAD_POOL, seed=7)
+
+    def upload(rng):
+        start = rng.randrange(0, UPLOAD_POOL, UPLOAD_BATCH)
+        body = json.dumps(pool[start:start + UPLOAD_BATCH]).encode("utf-8")
+        return "POST", "/upload/json", {
+            "params": {"institution": UPLOAD_INSTITUTION},
+            "files": {"file": ("students.json", body, "application/json")}
+        }
+
+    return [
+        Scenario("root", lambda rng: ("GET", "/", {})),
+        Scenario("students_page", page),
+        Scenario("students_all", lambda rng: ("GET", "/students", {}), heavy=True),
+        Scenario("students_stream", lambda rng: ("GET", "/students/stream", {}), heavy=True),
+        Scenario("search_roll", lambda rng: ("GET", f"/search/roll/{pick(rng)['Rno']}", {})),
+        Scenario("search_application", lambda rng: ("GET", f"/search/application/{pick(rng)['Jno']}", {})),
+        Scenario("search_name", lambda rng: ("GET", f"/search/name/{pick(rng)['CN']}", {})),
+        Scenario("search_fuzzy", lambda rng: ("GET", f"/search/fuzzy/{misspell(pick(rng)['CN'], rng)}", {})),
+        Scenario("search_all", lambda rng: ("GET", "/search", {"params": {"query": pick(rng)["Rno"][:6]}})),
+        Scenario("verify", verify),
+        Scenario("merkle_root", lambda rng: ("GET", "/merkle/root", {})),
+        Scenario("merkle_proof", lambda rng: ("GET", "/merkle/proof", {"params": {"roll_no": pick(rng)["Rno"]}})),
+        Scenario("merkle_verify", lambda rng: ("POST", "/merkle/verify", {"json": proof})),
+        Scenario("institutions", lambda rng: ("GET", "/institutions", {})),
+        Scenario("stats", lambda rng: ("GET", "/stats", {})),
+        Scenario("cache_stats", lambda rng: ("GET", "/cache/stats", {})),
+        Scenario("response_cache_stats", lambda rng: ("GET", "/cache/responses", {})),
+        Scenario("job_missing", lambda rng: ("GET", "/jobs/does-not-exist", {}), statuses=(404,)),
+        # Last, because every upload bumps the dataset version
+        Scenario("upload_json", upload),
+    ]
+
+
+async def run_scenario(client, scenario: Scenario, count: int, concurrency: int,
+                       warmup: int, seed: int) -> Dict[str, Any]:
+    """Time count requests of one scenario, concurrency at a time"""
+    rng = random.Random(seed)
+    requests = [scenario.make_request(rng) for _ in range(warmup + count)]
+
+    for method, url, kwargs in requests[:warmup]:
+        await client.request(method, url, **kwargs)
+
+    pending = iter(requests[warmup:])
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for method, url, kwargs in pending:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code not in scenario.statuses:
+                errors += 1
+
+    gc.collect()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "endpoint": scenario.name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p95_ms": percentile(latencies, 95) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "mean_ms": sum(latencies) / len(latencies) * 1e3,
+        "max_ms": latencies[-1] * 1e3,
+        "rps": len(latencies) / elapsed
+    }
+
+
+async def bench_size(app_module, workdir: Path, size: int, args) -> Dict[str, Any]:
+    """Load a synthetic dataset of one size through the app's startup and time every endpoint"""
+    import httpx
+
+    students = generate_students(size, seed=args.seed)
+    sample = random.Random(args.seed).sample(students, min(1000, size))
+    app_module.converter.save(students, app_module.DATA_FILE)
+    del students
+    gc.collect()
+
+    # Start from this size's data alone: no leftover change log, shards or cached responses
+    for path in workdir.glob("students_*"):
+        if str(path) != app_module.DATA_FILE:
+            path.unlink()
+    app_module.response_cache.clear()
+
+    start = time.perf_counter()
+    await app_module.app.router.startup()
+    load_time = time.perf_counter() - start
+    print(f"Loaded {size} students in {load_time:.1f}s")
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        response = await client.get("/merkle/proof", params={"roll_no": sample[0]["Rno"]})
+        body = response.json()
+        proof = {"student": body["data"], "proof": body["proof"], "root": body["root"]}
+
+        print(f"{'endpoint':<22} {'requests':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} "
+              f"{'req/s':>10} {'errors':>7}")
+        for i, scenario in enumerate(build_scenarios(app_module, sample, size, proof)):
+            count = max(3, args.requests // 50) if scenario.heavy else args.requests
+            result = await run_scenario(client, scenario, count, args.concurrency,
+                                        warmup=1 if scenario.heavy else args.warmup, seed=args.seed + i)
+            results.append({"size": size, **result})
+            print(f"{result['endpoint']:<22} {result['requests']:>8} {result['p50_ms']:>10.2f} "
+                  f"{result['p95_ms']:>10.2f} {result['p99_ms']:>10.2f} {result['rps']:>10.1f} "
+                  f"{result['errors']:>7}")
+
+    await app_module.app.router.shutdown()
+    return {"size": size, "load_seconds": load_time, "results": results}
+
+
+def environment_info(args) -> Dict[str, Any]:
+    """What the numbers were measured on, so results from different runs can be compared fairly"""
+    import fastapi
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "fastapi": fastapi.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "response_cache": args.cache,
+        "seed": args.seed
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> List[Dict[str, Any]]:
+    """Print p95 and throughput changes against an earlier results file; return the regressions"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["size"], r["endpoint"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"Compared with {baseline_path}")
+    print(f"{'records':>10} {'endpoint':<22} {'p95 before':>11} {'p95 now':>10} {'change':>8} {'req/s change':>13}")
+    for result in results:
+        before = baseline.get((result["size"], result["endpoint"]))
+        if before is None:
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        rps_change = result["rps"] / before["rps"] - 1
+        regressed = change > REGRESSION_THRESHOLD and result["p95_ms"] - before["p95_ms"] > REGRESSION_MIN_MS
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{result['size']:>10} {result['endpoint']:<22} {before['p95_ms']:>11.2f} {result['p95_ms']:>10.2f} "
+              f"{change:>+8.0%} {rps_change:>+13.0%}{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="In-process load and latency benchmarks for the Student Data API")
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES, help="dataset sizes to benchmark")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="timed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per endpoint")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the dataset and request keys")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--cache", action="store_true",
+                        help="keep the response cache on (off by default, so handlers are measured)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="api_benchmark_") as workdir:
+        # The app reads its configuration when imported, so point it at the scratch directory first
+        os.environ["STUDENT_DATA_FILE"] = os.path.join(workdir, "students_data.json")
+        os.environ["STUDENT_CHANGELOG_FILE"] = os.path.join(workdir, "students_changes.log")
+        os.environ["EXTRACTION_CACHE_DIR"] = os.path.join(workdir, "extraction_cache")
+        if not args.cache:
+            os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+        import main as app_module
+
+        runs = []
+        for size in args.sizes:
+            print(f"API benchmark: {size} records, {args.requests} requests per endpoint, "
+                  f"concurrency {args.concurrency}")
+            runs.append(asyncio.run(bench_size(app_module, Path(workdir), size, args)))
+            print()
+
+    report = {
+        "environment": environment_info(args),
+        "load_seconds": {str(run["size"]): run["load_seconds"] for run in runs},
+        "results": [result for run in runs for result in run["results"]]
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    if args.baseline:
+        print()
+        if compare(report["results"], args.baseline):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Student Data API internals
+Run: python benchmark.py [benchmark_name] [sizes...]
+"""
+
+import gc
+import json
+import random
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from indexes import StudentIndex, TrigramIndex, FuzzyNameIndex, SEARCH_FIELDS, name_grams, normalize_name
+from student_store import StudentStore
+from merkle import MerkleTree, leaf_hash, verify_proof
+
+BRANCHES = ["CS", "IT", "EC", "EE", "SE", "MC", "EP", "ME", "MAM", "PE", "CH", "CE", "EN", "BT"]
+SECTIONS = ["Sec-1", "Sec-2", "Sec-3", "Sec-4", "Sec-5", "Sec-6", "Sec-7"]
+
+# Building blocks for realistic, high-cardinality candidate names
+NAME_SYLLABLES = ["aa", "ab", "ad", "ak", "an", "ar", "ash", "av", "bh", "ch", "de", "dh", "ee", "gu", "ha",
+                  "in", "ish", "ja", "ka", "kh", "ku", "la", "ma", "me", "mi", "na", "ni", "pa", "pr", "ra",
+                  "ri", "ro", "sa", "sh", "si", "ta", "th", "ti", "ur", "va", "vi", "ya", "yu"]
+SURNAMES = ["gupta", "sharma", "singh", "kumar", "verma", "yadav", "meena", "saini", "pandey", "rai",
+            "soni", "tripathi", "rathore", "chaturvedi", "mishra", "agarwal", "jain", "reddy", "nair", "iyer",
+            "das", "bose", "khan", "ali", "patel", "shah", "mehta", "joshi", "kapoor", "malhotra"]
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Students per roll number group, like "24/A01/001" to "24/A01/080"
+GROUP_SIZE = 80
+
+# Spreads application numbers over 8 digits without repeats (coprime to 10^8)
+JNO_MULTIPLIER = 48_271_813
+
+SAMPLE_PDF = Path(__file__).parent / "data" / "[httpsnoti.akshat.sh] file0811-1-2.pdf"
+
+def generate_students(count, seed=42):
+    """
+    Deterministic synthetic students in the real formats
+
+    Roll numbers are YY/<letter><group>/<seq> (e.g. 24/A01/001), with up to
+    GROUP_SIZE students per group, one branch and section per group, and
+    years counting down from 24. Application numbers are YY03 followed by
+    eight unique digits (e.g. 240310038495). Names are syllable-built first
+    names with common surnames.
+    """
+    rng = random.Random(seed)
+    groups_per_year = 26 * 99
+    students = []
+
+    for i in range(count):
+        group, seq = divmod(i, GROUP_SIZE)
+        year, group_in_year = divmod(group, groups_per_year)
+        letter, number = divmod(group_in_year, 99)
+        yy = (24 - year) % 100
+        if seq == 0:
+            # Sections are left empty for some groups, as in the real lists
+            branch = BRANCHES[group % len(BRANCHES)]
+            section = rng.choice(SECTIONS + [""])
+
+        first = "".join(rng.choice(NAME_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        students.append({
+            "Rno": f"{yy:02d}/{chr(ord('A') + letter)}{number + 1:02d}/{seq + 1:03d}",
+            "Jno": f"{yy:02d}03{(i * JNO_MULTIPLIER + seed) % 10 ** 8:08d}",
+            "CN": f"{first} {rng.choice(SURNAMES)}".upper(),
+            "B": branch,
+            "Sec": section
+        })
+
+    return students
+
+def generate_names(count, seed=42):
+    """Generate synthetic candidate names: a syllable-built first name and a common surname"""
+    rng = random.Random(seed)
+    return [
+        ("".join(rng.choice(NAME_SYLLABLES) for _ in range(rng.randint(2, 4))) + " " + rng.choice(SURNAMES)).upper()
+        for _ in range(count)
+    ]
+
+def misspell(name, rng):
+    """Replace one character of a name, like a verifier's typo"""
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice("AEIOUHK") + name[i + 1:]
+
+def _time_per_call(func, keys):
+    """Average seconds per call of func over keys"""
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys)
+
+def bench_exact_lookup(sizes):
+    """Compare linear-scan and hash-index lookups by roll and application number"""
+    print("Exact lookup: linear scan vs hash index")
+    print(f"{'records':>10} {'scan (us)':>12} {'index (us)':>12} {'build (ms)':>12} {'speedup':>10}")
+
+    for size in sizes:
+        students = generate_students(size)
+        rng = random.Random(size)
+        keys = [students[rng.randrange(size)]["Rno"] for _ in range(50)]
+
+        def linear_scan(roll_no):
+            for student in students:
+                if student["Rno"].upper() == roll_no.upper():
+                    return student
+            return None
+
+        store = StudentStore(students)
+        start = time.perf_counter()
+        index = StudentIndex(store)
+        build_time = time.perf_counter() - start
+
+        scan_time = _time_per_call(linear_scan, keys)
+        index_time = _time_per_call(index.find_by_roll, keys * 1000)
+
+        print(f"{size:>10} {scan_time * 1e6:>12.1f} {index_time * 1e6:>12.3f} "
+              f"{build_time * 1e3:>12.1f} {scan_time / index_time:>9.0f}x")
+
+def bench_substring_search(sizes):
+    """Compare full-scan and trigram-index substring search across all fields"""
+    print("Substring search: full scan vs trigram index")
+    print(f"{'records':>10} {'scan (ms)':>12} {'index (ms)':>12} {'build (s)':>12} {'speedup':>10}")
+
+    for size in sizes:
+        students = generate_students(size)
+        rng = random.Random(size)
+        queries = [students[rng.randrange(size)]["CN"][2:7] for _ in range(20)]
+
+        def full_scan(query):
+            query = query.lower()
+            return [i for i, student in enumerate(students)
+                    if any(query in student[field].lower() for field in SEARCH_FIELDS)]
+
+        store = StudentStore(students)
+        start = time.perf_counter()
+        index = TrigramIndex(store)
+        build_time = time.perf_counter() - start
+
+        scan_time = _time_per_call(full_scan, queries[:5])
+        index_time = _time_per_call(index.search, queries)
+
+        print(f"{size:>10} {scan_time * 1e3:>12.2f} {index_time * 1e3:>12.3f} "
+              f"{build_time:>12.2f} {scan_time / index_time:>9.0f}x")
+
+def bench_fuzzy_name_search(sizes, limit=10, threshold=0.3, scan_limit=100_000):
+    """Compare full-scan and indexed trigram-similarity name search (top-k) on misspelled names"""
+    print(f"Fuzzy name search (top {limit}, threshold {threshold}): full scan vs trigram similarity index")
+    print(f"{'records':>10} {'scan (ms)':>12} {'index (ms)':>12} {'p99 (ms)':>10} {'build (s)':>12} {'recall':>8}")
+
+    for size in sizes:
+        names = generate_names(size)
+        students = [{"Rno": str(i), "Jno": str(i), "CN": name, "B": "", "Sec": ""} for i, name in enumerate(names)]
+        rng = random.Random(size)
+        targets = [rng.randrange(size) for _ in range(200)]
+        queries = [misspell(names[row_id], rng) for row_id in targets]
+
+        def full_scan(query):
+            grams = name_grams(normalize_name(query))
+            scored = []
+            for row_id, name in enumerate(names):
+                other = name_grams(normalize_name(name))
+                overlap = len(grams & other)
+                score = overlap / (len(grams) + len(other) - overlap)
+                if score >= threshold:
+                    scored.append((score, row_id))
+            return sorted(scored, reverse=True)[:limit]
+
+        store = StudentStore(students)
+        start = time.perf_counter()
+        index = FuzzyNameIndex(store)
+        build_time = time.perf_counter() - start
+
+        # Scanning is too slow to be worth timing on the largest sizes
+        scan = f"{_time_per_call(full_scan, queries[:3]) * 1e3:>12.2f}" if size <= scan_limit else f"{'-':>12}"
+
+        latencies = []
+        recalled = 0
+        for row_id, query in zip(targets, queries):
+            start = time.perf_counter()
+            results = index.search(query, limit, threshold)
+            latencies.append(time.perf_counter() - start)
+            recalled += any(names[match] == names[row_id] for match, _ in results)
+        latencies.sort()
+
+        print(f"{size:>10} {scan} {sum(latencies) / len(latencies) * 1e3:>12.3f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1e3:>10.3f} {build_time:>12.2f} "
+              f"{recalled / len(queries):>8.1%}")
+
+def bench_merkle(sizes, changed=1000):
+    """Time building a Merkle tree, updating a few leaves in place of a rebuild, and proofs"""
+    print(f"Merkle tree: full build vs incremental update of {changed} records")
+    print(f"{'leaves':>10} {'build (s)':>12} {'rebuild (s)':>12} {'update (ms)':>12} "
+          f"{'proof (us)':>12} {'verify (us)':>12} {'speedup':>10}")
+
+    for size in sizes:
+        store = StudentStore(generate_students(size))
+        start = time.perf_counter()
+        tree = MerkleTree.build(store)
+        build_time = time.perf_counter() - start
+
+        # Change some existing records and append new ones, as an upsert would
+        rng = random.Random(size)
+        rows = store.to_list()
+        touched = set(rng.sample(range(size), min(changed // 2, size)))
+        for row_id in touched:
+            rows[row_id] = dict(rows[row_id], CN=rows[row_id]["CN"] + " JR")
+        for i in range(changed - len(touched)):
+            touched.add(len(rows))
+            rows.append({**rows[i], "Rno": f"NEW/{i:06d}"})
+        new_store = StudentStore(rows)
+
+        start = time.perf_counter()
+        updated = tree.updated({row_id: leaf_hash(new_store[row_id]) for row_id in touched}, len(new_store))
+        update_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rebuilt = MerkleTree.build(new_store)
+        rebuild_time = time.perf_counter() - start
+        assert updated.root == rebuilt.root
+
+        indexes = [rng.randrange(size) for _ in range(1000)]
+        proof_time = _time_per_call(updated.proof, indexes)
+        proofs = [(updated.leaf(i), updated.proof(i)) for i in indexes[:200]]
+        verify_time = _time_per_call(lambda item: verify_proof(item[0], item[1], updated.root), proofs)
+
+        print(f"{size:>10} {build_time:>12.2f} {rebuild_time:>12.2f} {update_time * 1e3:>12.1f} "
+              f"{proof_time * 1e6:>12.1f} {verify_time * 1e6:>12.1f} {rebuild_time / update_time:>9.0f}x")
+
+def bench_upsert(sizes, batch_sizes=(1, 100, 10_000)):
+    """Time committing an upsert batch to a shard against rebuilding the shard from scratch"""
+    from changelog import ChangeLog, UPSERT
+    from dataset import ShardedDataset, StudentDataset
+
+    print("Upsert: incremental commit vs full shard rebuild (half the batch replaces records, half is new)")
+    print(f"{'records':>10} {'batch':>8} {'commit (ms)':>12} {'rebuild (s)':>12} {'speedup':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            students = generate_students(size)
+            dataset = ShardedDataset({"default": StudentDataset(students)})
+            changelog = ChangeLog(os.path.join(directory, f"changes_{size}.log"))
+            rng = random.Random(size)
+
+            # The first update after a build also maps the indexes' values to ids; time it apart
+            start = time.perf_counter()
+            dataset.commit(changelog, UPSERT, "default",
+                           students=[dict(students[0], CN="WARM UP"), {**students[0], "Rno": "NEW/0", "Jno": "NEW0"}])
+            print(f"{size:>10} {'first':>8} {(time.perf_counter() - start) * 1e3:>12.1f}")
+
+            for batch_size in batch_sizes:
+                replaced = [dict(students[i], CN=students[i]["CN"] + " JR")
+                            for i in rng.sample(range(size), min(batch_size // 2, size))]
+                appended = [{**students[i], "Rno": f"NEW/{batch_size}/{i:06d}", "Jno": f"NEW{batch_size}/{i}"}
+                            for i in range(batch_size - len(replaced))]
+
+                start = time.perf_counter()
+                shard = dataset.commit(changelog, UPSERT, "default", students=replaced + appended)
+                commit_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                StudentDataset(shard.store)
+                rebuild_time = time.perf_counter() - start
+
+                print(f"{size:>10} {batch_size:>8} {commit_time * 1e3:>12.1f} {rebuild_time:>12.2f} "
+                      f"{rebuild_time / commit_time:>9.0f}x")
+            del students, dataset, shard
+
+def bench_response_serialization(sizes, page=10_000):
+    """Compare per-record Pydantic models + response_model validation against direct JSON encoding"""
+    import asyncio
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from models import Student, StudentsListResponse
+
+    field = create_response_field(name="response", type_=StudentsListResponse, mode="serialization")
+
+    def model_path(rows):
+        # What the handlers did before: a Student per record, then FastAPI validates and encodes
+        response = StudentsListResponse(success=True, data=[Student(**row) for row in rows],
+                                        total_count=len(rows), message="")
+        content = asyncio.run(serialize_response(field=field, response_content=response))
+        return JSONResponse(content).body
+
+    def direct_path(rows):
+        return JSONResponse({"success": True, "data": rows, "total_count": len(rows),
+                             "message": "", "next_cursor": None}).body
+
+    print(f"Response serialization ({page} records per response): models vs direct JSON")
+    print(f"{'records':>10} {'models (ms)':>12} {'direct (ms)':>12} {'models/s':>10} {'direct/s':>10} {'speedup':>10}")
+
+    for size in sizes:
+        store = StudentStore(generate_students(size))
+        rows = list(store.iter_range(0, min(page, size)))
+        assert model_path(rows) == direct_path(rows)
+
+        model_time = _time_per_call(model_path, [rows] * 5)
+        direct_time = _time_per_call(direct_path, [rows] * 5)
+
+        print(f"{size:>10} {model_time * 1e3:>12.1f} {direct_time * 1e3:>12.1f} "
+              f"{1 / model_time:>10.1f} {1 / direct_time:>10.1f} {model_time / direct_time:>9.1f}x")
+
+def _traced_size(build):
+    """Bytes still allocated by the object that build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def bench_store_memory(sizes):
+    """Compare memory of a list of dicts against the columnar StudentStore"""
+    print("Student storage memory: list of dicts vs columnar store")
+    print(f"{'records':>10} {'dicts (MB)':>12} {'store (MB)':>12} {'B/record':>10} {'reduction':>10}")
+
+    for size in sizes:
+        # Round-trip through JSON so every record owns its strings, as after json.load
+        students, dict_bytes = _traced_size(
+            lambda: json.loads(json.dumps(generate_students(size))))
+        store, store_bytes = _traced_size(lambda: StudentStore(students))
+
+        print(f"{size:>10} {dict_bytes / 2**20:>12.1f} {store_bytes / 2**20:>12.1f} "
+              f"{store_bytes / size:>10.1f} {dict_bytes / store_bytes:>9.1f}x")
+
+        del students, store
+
+def bench_page_analysis(sizes, pdf_path=SAMPLE_PDF, repeat=5):
+    """Compare per-page extraction time of the text-then-tables method and single-pass analysis"""
+    import pdfplumber
+    from pdf_to_json_converter import StudentDataConverter
+
+    converter = StudentDataConverter()
+
+    def text_then_tables(page):
+        # Previous method: always lay out the text, then run table detection
+        text = page.extract_text()
+        if text:
+            tables = page.extract_tables()
+            if tables:
+                return [row for table in tables for row in converter._process_table(table)]
+            return converter._parse_text_data(text)
+        return []
+
+    def single_pass(page):
+        return converter._page_records(converter._analyze_page(page))
+
+    def time_pages(extract):
+        # Reopen each round so no page keeps cached layout between runs
+        timings, records = [], []
+        for _ in range(repeat):
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in pdf.pages:
+                    start = time.perf_counter()
+                    records.append(extract(page))
+                    timings.append(time.perf_counter() - start)
+        return sum(timings) / len(timings), records
+
+    print(f"Per-page PDF extraction: text-then-tables vs single-pass ({Path(pdf_path).name})")
+    old_time, old_records = time_pages(text_then_tables)
+    new_time, new_records = time_pages(single_pass)
+
+    print(f"{'text-then-tables (ms/page)':>28} {old_time * 1e3:>10.1f}")
+    print(f"{'single-pass (ms/page)':>28} {new_time * 1e3:>10.1f}")
+    print(f"{'saved (ms/page)':>28} {(old_time - new_time) * 1e3:>10.1f}  ({(1 - new_time / old_time) * 100:.0f}%)")
+    print(f"{'identical output':>28} {str(old_records == new_records):>10}")
+
+def bench_template_extraction(sizes, pdf_path=SAMPLE_PDF, repeat=5):
+    """Compare accuracy and per-page time of table detection, the text fallback and the column template"""
+    import pdfplumber
+    from pdf_to_json_converter import StudentDataConverter
+
+    converter = StudentDataConverter()
+    record = lambda stage, seconds: None
+
+    def tables(page, template):
+        return converter._page_records(converter._analyze_page(page, record))
+
+    def text(page, template):
+        # What a page without ruling lines goes through
+        return converter._parse_text_data(page.extract_text() or "")
+
+    def sliced(page, template):
+        return converter._page_records(converter._analyze_page(page, record, template))
+
+    def time_pages(extract):
+        # Reopen each round so no page keeps cached layout between runs. The
+        # first page is where the template is learned, so only later pages are
+        # timed. Parsing the page objects is the same for every method and is
+        # timed apart from the layout step that differs
+        parse_timings, layout_timings, records = [], [], []
+        for _ in range(repeat):
+            with pdfplumber.open(pdf_path) as pdf:
+                _, template = converter._learn_template(pdf.pages[0], record)
+                for page in pdf.pages[1:]:
+                    start = time.perf_counter()
+                    page.chars, page.edges
+                    parsed = time.perf_counter()
+                    records.append(extract(page, template))
+                    parse_timings.append(parsed - start)
+                    layout_timings.append(time.perf_counter() - parsed)
+        return (sum(parse_timings) / len(parse_timings), sum(layout_timings) / len(layout_timings),
+                [row for rows in records for row in rows])
+
+    print(f"Per-page extraction after the first page: tables vs text vs template ({Path(pdf_path).name})")
+    print(f"{'method':>10} {'parse (ms)':>11} {'layout (ms)':>12} {'layout speedup':>15} {'records':>9} {'matching':>9}")
+    results = {name: time_pages(extract) for name, extract in (("tables", tables), ("text", text), ("template", sliced))}
+    reference_layout, reference = results["tables"][1:]
+    for name, (parse_time, layout_time, records) in results.items():
+        matching = sum(record == expected for record, expected in zip(records, reference))
+        print(f"{name:>10} {parse_time * 1e3:>11.1f} {layout_time * 1e3:>12.1f} {reference_layout / layout_time:>14.1f}x "
+              f"{len(records) // repeat:>9} {matching / len(reference):>8.0%}")
+
+def bench_preview(sizes, pdf_path=SAMPLE_PDF, page_counts=(10, 100, 500), repeat=3):
+    """Time a column mapping preview against the previous column discovery on PDFs of growing length"""
+    import pdfplumber
+    import pypdfium2
+    from pdf_to_json_converter import StudentDataConverter
+
+    converter = StudentDataConverter()
+
+    def previous_columns(path):
+        # Previous get_pdf_columns: list every page, then extract tables page
+        # after page until one is found
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                tables = page.extract_tables()
+                if tables and tables[0]:
+                    return [str(cell).strip() for cell in tables[0][0] if cell]
+        return []
+
+    def best_time(func, path):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(path)
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    print(f"Column discovery: previous get_pdf_columns vs preview_pdf ({Path(pdf_path).name} pages repeated)")
+    print(f"{'pages':>8} {'columns (ms)':>13} {'preview (ms)':>13} {'mapping':>40}")
+    with tempfile.TemporaryDirectory() as directory:
+        source = pypdfium2.PdfDocument(str(pdf_path))
+        for page_count in page_counts:
+            path = os.path.join(directory, f"{page_count}.pdf")
+            document = pypdfium2.PdfDocument.new()
+            document.import_pages(source, [index % len(source) for index in range(page_count)])
+            document.save(path)
+            document.close()
+
+            columns_time, _ = best_time(previous_columns, path)
+            preview_time, preview = best_time(converter.preview_pdf, path)
+            print(f"{page_count:>8} {columns_time * 1e3:>13.1f} {preview_time * 1e3:>13.1f} {json.dumps(preview['mapping']):>40}")
+        source.close()
+
+def bench_wrapper_overhead(sizes, pdf_path=SAMPLE_PDF, requests=10):
+    """Compare per-request cost of spawning python_wrapper.py against its warm serve mode"""
+    wrapper = str(Path(__file__).parent / "python_wrapper.py")
+    pdf_path = str(pdf_path)
+
+    def spawn_per_request(mode):
+        start = time.perf_counter()
+        for _ in range(requests):
+            subprocess.run([sys.executable, wrapper, mode, pdf_path], check=True, capture_output=True)
+        return (time.perf_counter() - start) / requests
+
+    server = subprocess.Popen([sys.executable, wrapper, "serve", "--concurrency", "1"],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    def warm(mode):
+        request = json.dumps({"id": 0, "mode": mode, "pdf_path": pdf_path})
+        # First call primes the worker process
+        server.stdin.write(request + "\n")
+        server.stdin.flush()
+        server.stdout.readline()
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            server.stdin.write(request + "\n")
+            server.stdin.flush()
+            if not json.loads(server.stdout.readline())["ok"]:
+                raise RuntimeError(f"serve-mode {mode} request failed")
+        return (time.perf_counter() - start) / requests
+
+    try:
+        print(f"python_wrapper.py per-request time: spawn vs warm serve mode ({requests} requests)")
+        print(f"{'mode':>10} {'spawn (ms)':>12} {'warm (ms)':>12} {'overhead saved (ms)':>20}")
+        for mode in ("columns", "extract"):
+            spawn_time = spawn_per_request(mode)
+            warm_time = warm(mode)
+            print(f"{mode:>10} {spawn_time * 1e3:>12.1f} {warm_time * 1e3:>12.1f} {(spawn_time - warm_time) * 1e3:>20.1f}")
+    finally:
+        server.stdin.close()
+        server.wait()
+
+def bench_snapshot_load(sizes):
+    """Compare loading the dataset from JSON against memory-mapping a binary snapshot, up to a built dataset"""
+    from changelog import ChangeLog, UPSERT
+    from dataset import ShardedDataset, StudentDataset
+    from pdf_to_json_converter import StudentDataConverter
+
+    converter = StudentDataConverter()
+    print("Dataset load: JSON vs binary snapshot. The API serves once the data is loaded and builds the indexes,")
+    print("aggregates and Merkle tree in the background: 'first lookup' builds only the roll number index,")
+    print("'built' builds everything; 'first upsert' copies the mapped columns into memory")
+    print(f"{'records':>10} {'json (MB)':>10} {'snap (MB)':>10} {'json load (ms)':>15} {'snap load (ms)':>15} "
+          f"{'snap row (us)':>14} {'first lookup (s)':>17} {'json built (s)':>15} {'snap built (s)':>15} "
+          f"{'first upsert (s)':>17}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            json_path = os.path.join(directory, "students.json")
+            snapshot_path = os.path.join(directory, "students.snap")
+            students = generate_students(size)
+            converter.save(students, json_path)
+            converter.save(students, snapshot_path)
+            roll_no = students[size // 2]["Rno"]
+            new_student = {**students[0], "Rno": "NEW/0", "Jno": "NEW0"}
+            del students
+
+            start = time.perf_counter()
+            StudentDataset(converter.load(json_path)).build()
+            json_built = time.perf_counter() - start
+
+            start = time.perf_counter()
+            converter.load(json_path)
+            json_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            store = converter.load(snapshot_path)
+            shard = StudentDataset(store)
+            snapshot_time = time.perf_counter() - start
+
+            row_time = _time_per_call(store.__getitem__, list(range(0, size, max(size // 1000, 1))))
+
+            start = time.perf_counter()
+            assert shard.find_by_roll(roll_no) is not None
+            first_lookup = snapshot_time + time.perf_counter() - start
+
+            start = time.perf_counter()
+            shard.build()
+            snapshot_built = first_lookup + time.perf_counter() - start
+
+            dataset = ShardedDataset({"default": shard})
+            changelog = ChangeLog(os.path.join(directory, f"changes_{size}.log"))
+            start = time.perf_counter()
+            dataset.commit(changelog, UPSERT, "default", students=[new_student])
+            upsert_time = time.perf_counter() - start
+
+            print(f"{size:>10} {os.path.getsize(json_path) / 2**20:>10.1f} {os.path.getsize(snapshot_path) / 2**20:>10.1f} "
+                  f"{json_time * 1e3:>15.1f} {snapshot_time * 1e3:>15.3f} {row_time * 1e6:>14.2f} "
+                  f"{first_lookup:>17.2f} {json_built:>15.1f} {snapshot_built:>15.1f} {upsert_time:>17.2f}")
+            del store, shard, dataset
+
+BENCHMARKS = {
+    "lookup": bench_exact_lookup,
+    "search": bench_substring_search,
+    "fuzzy": bench_fuzzy_name_search,
+    "memory": bench_store_memory,
+    "pages": bench_page_analysis,
+    "template": bench_template_extraction,
+    "preview": bench_preview,
+    "wrapper": bench_wrapper_overhead,
+    "snapshot": bench_snapshot_load,
+    "merkle": bench_merkle,
+    "upsert": bench_upsert,
+    "responses": bench_response_serialization,
+}
+
+def main():
+    names = [sys.argv[1]] if len(sys.argv) > 1 else list(BENCHMARKS)
+    sizes = [int(arg) for arg in sys.argv[2:]] or DEFAULT_SIZES
+
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name](sizes)
+        print()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
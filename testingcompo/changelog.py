@@ -0,0 +1,123 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from atomic_file import atomic_write
+
+# Each record is framed as: payload length (u32), CRC-32 of payload (u32), payload
+FRAME = struct.Struct("<II")
+
+# Batch operations
+REPLACE = "replace"  # students replace the whole dataset
+UPSERT = "upsert"    # students are inserted or replace rows with the same Rno
+DELETE = "delete"    # keys are roll numbers to remove
+
+OPERATIONS = (REPLACE, UPSERT, DELETE)
+
+
+def _encode(batch: Dict[str, Any]) -> bytes:
+    payload = json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class ChangeLog:
+    """
+    Append-only, crash-safe log of student batches
+
+    Every batch is one framed JSON record with a sequence number, written
+    with fsync before the append returns. Replay stops at the first torn or
+    corrupt record (a crash mid-write) and cuts it off, so the log always
+    ends on a complete batch. Compaction writes the data elsewhere and then
+    drops the batches it covers with truncate_through().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, op: str, students: Optional[List[Dict[str, Any]]] = None,
+               keys: Optional[List[str]] = None, **meta) -> int:
+        """
+        Durably append one batch and return its sequence number
+        """
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown change log operation '{op}'")
+
+        with self._lock:
+            seq = self.last_seq + 1
+            batch = {"seq": seq, "op": op, **meta}
+            if students is not None:
+                batch["students"] = students
+            if keys is not None:
+                batch["keys"] = keys
+
+            with open(self.path, "ab") as f:
+                f.write(_encode(batch))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.last_seq = seq
+            return seq
+
+    def _read(self, repair: bool) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return
+
+        good_end = 0
+        with open(self.path, "rb") as f:
+            while True:
+                header = f.read(FRAME.size)
+                if len(header) < FRAME.size:
+                    break
+                length, checksum = FRAME.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                try:
+                    batch = json.loads(payload)
+                except ValueError:
+                    break
+
+                good_end = f.tell()
+                yield batch
+
+            torn = f.tell() != good_end or f.read(1) != b""
+
+        # Cut off the incomplete record left by a crash mid-append
+        if repair and torn:
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the complete batches in order, repairing a torn tail
+        """
+        with self._lock:
+            batches = list(self._read(repair=True))
+
+        for batch in batches:
+            self.last_seq = max(self.last_seq, batch["seq"])
+            yield batch
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def truncate_through(self, seq: int):
+        """
+        Drop every batch with a sequence number up to and including seq
+        """
+        with self._lock:
+            remaining = [batch for batch in self._read(repair=False) if batch["seq"] > seq]
+
+            with atomic_write(self.path) as f:
+                for batch in remaining:
+                    f.write(_encode(batch))
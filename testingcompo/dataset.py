@@ -0,0 +1,397 @@
+import heapq
+import re
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+from student_store import StudentStore, RowChange
+from indexes import StudentIndex, TrigramIndex, FuzzyNameIndex, normalize_key
+from aggregates import StudentStats, merge_snapshots
+from changelog import ChangeLog, REPLACE, UPSERT, DELETE
+from merkle import MerkleTree, leaf_hash
+
+# Shard that receives uploads made without an institution
+DEFAULT_INSTITUTION = "default"
+
+# Largest share of a shard's rows an upsert may touch and still be applied
+# incrementally; past it, rebuilding the shard is as fast
+INCREMENTAL_MAX_FRACTION = 0.5
+
+# Institution ids end up in file names, so keep them to a safe alphabet
+INSTITUTION_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class StudentDataset:
+    """
+    A student store bundled with the indexes and aggregates built over it
+
+    Datasets are complete before they are published, so replacing the data
+    is a single reference swap and readers never see a store and its indexes
+    out of sync. Each index, the aggregates and the Merkle tree are built
+    from the store on first use (or all at once by build()), so a dataset
+    over a memory-mapped snapshot is ready as soon as the file is mapped.
+    """
+
+    # How each derived structure is built from the store, in the order build() builds them
+    BUILDERS = {
+        "index": StudentIndex,
+        "stats": StudentStats,
+        "merkle": MerkleTree.build,
+        "search_index": TrigramIndex,
+        "name_index": FuzzyNameIndex,
+    }
+
+    def __init__(self, data: Optional[Union[StudentStore, Iterable[Dict[str, Any]]]] = None, seq: int = 0,
+                 merkle: Optional[MerkleTree] = None, index: Optional[StudentIndex] = None,
+                 search_index: Optional[TrigramIndex] = None, name_index: Optional[FuzzyNameIndex] = None,
+                 stats: Optional[StudentStats] = None):
+        if data is None:
+            data = StudentStore()
+        self.store = data if isinstance(data, StudentStore) else StudentStore(data)
+        # Sequence number of the last change log batch reflected in this dataset
+        self.seq = seq
+        # Pass structures derived from the previous version (see updated()) to skip building them
+        self._structures = {"index": index, "search_index": search_index, "name_index": name_index,
+                            "stats": stats, "merkle": merkle}
+        self._build_lock = threading.Lock()
+
+    def _structure(self, name: str):
+        structure = self._structures[name]
+        if structure is None:
+            # Readers that need a structure while it is being built wait for it
+            with self._build_lock:
+                structure = self._structures[name]
+                if structure is None:
+                    structure = self._structures[name] = self.BUILDERS[name](self.store)
+        return structure
+
+    @property
+    def index(self) -> StudentIndex:
+        return self._structure("index")
+
+    @property
+    def search_index(self) -> TrigramIndex:
+        return self._structure("search_index")
+
+    @property
+    def name_index(self) -> FuzzyNameIndex:
+        return self._structure("name_index")
+
+    @property
+    def stats(self) -> StudentStats:
+        return self._structure("stats")
+
+    @property
+    def merkle(self) -> MerkleTree:
+        return self._structure("merkle")
+
+    def build(self) -> "StudentDataset":
+        """
+        Build every structure not built yet, cheapest and most used first
+        """
+        for name in self.BUILDERS:
+            self._structure(name)
+        return self
+
+    def updated(self, store: StudentStore, changes: List[RowChange], seq: int) -> "StudentDataset":
+        """
+        Return the dataset for store, which is this one's store with the
+        given rows replaced or appended, updating only those rows' entries
+
+        Structures this dataset has not built yet are left for the new one
+        to build from its store on first use.
+        """
+        updates = {
+            "index": lambda index: index.updated(store, changes),
+            "search_index": lambda search_index: search_index.updated(changes),
+            "name_index": lambda name_index: name_index.updated(changes),
+            "stats": lambda stats: stats.updated(changes),
+            "merkle": lambda merkle: merkle.updated({row_id: leaf_hash(new) for row_id, _, new in changes}, len(store)),
+        }
+        structures = {name: None if self._structures[name] is None else update(self._structures[name])
+                      for name, update in updates.items()}
+        return StudentDataset(store, seq=seq, **structures)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def find_by_roll(self, roll_no: str) -> Optional[Dict[str, Any]]:
+        row_id = self.index.find_by_roll(roll_no)
+        return None if row_id is None else self.store[row_id]
+
+    def find_by_application(self, application_no: str) -> Optional[Dict[str, Any]]:
+        row_id = self.index.find_by_application(application_no)
+        return None if row_id is None else self.store[row_id]
+
+    def find_many(self, keys: Iterable[str], field: str) -> Dict[str, Dict[str, Any]]:
+        store = self.store
+        return {key: store[row_id] for key, row_id in self.index.find_many(keys, field).items()}
+
+    def search(self, query: str, fields) -> List[Dict[str, Any]]:
+        store = self.store
+        return [store[row_id] for row_id in self.search_index.search(query, fields=fields)]
+
+    def fuzzy_search(self, name: str, limit: int, threshold: float) -> List[Tuple[Dict[str, Any], float]]:
+        store = self.store
+        return [(store[row_id], score) for row_id, score in self.name_index.search(name, limit, threshold)]
+
+
+def apply_batch(store: StudentStore, batch: Dict[str, Any]) -> StudentStore:
+    """
+    Return a new store with one change log batch applied
+
+    Batches are idempotent, so replaying one that is already reflected in
+    the store (e.g. after a crash during compaction) is harmless.
+    """
+    return apply_batch_changes(store, batch)[0]
+
+
+def apply_batch_changes(store: StudentStore, batch: Dict[str, Any],
+                        by_roll: Optional[Dict[str, int]] = None) -> Tuple[StudentStore, Optional[List[int]]]:
+    """
+    Like apply_batch, but also return the row ids that were replaced or
+    appended, or None when rows may have moved (replace and delete)
+
+    by_roll maps normalized roll numbers to their first row in store, as
+    kept by StudentIndex; it is built from the store when not given.
+    """
+    op = batch["op"]
+
+    if op == REPLACE:
+        return StudentStore(batch.get("students") or []), None
+
+    if op == UPSERT:
+        if by_roll is None:
+            by_roll = {}
+            for row_id, value in enumerate(store.column("Rno")):
+                by_roll.setdefault(normalize_key(value), row_id)
+
+        # Existing roll numbers are replaced in place, new ones appended once
+        replaced: Dict[int, Dict[str, Any]] = {}
+        appended: List[Dict[str, Any]] = []
+        appended_positions: Dict[str, int] = {}
+        for student in batch.get("students") or []:
+            key = normalize_key(student.get("Rno", ""))
+            row_id = by_roll.get(key)
+            if row_id is not None:
+                replaced[row_id] = student
+            elif key in appended_positions:
+                appended[appended_positions[key]] = student
+            else:
+                appended_positions[key] = len(appended)
+                appended.append(student)
+
+        updated = store.updated(replaced, appended)
+        return updated, sorted(replaced) + list(range(len(store), len(updated)))
+
+    if op == DELETE:
+        deleted = {normalize_key(key) for key in batch.get("keys") or []}
+        return StudentStore(student for student in store if normalize_key(student["Rno"]) not in deleted), None
+
+    raise ValueError(f"Unknown change log operation '{op}'")
+
+
+def is_valid_institution(institution: str) -> bool:
+    return bool(INSTITUTION_PATTERN.match(institution))
+
+
+class ShardedDataset:
+    """
+    Student data partitioned by institution, one StudentDataset per shard
+
+    Scoped queries touch a single shard; unscoped ones visit every shard in
+    institution order. A change replaces only the shard it targets, and the
+    shard map is replaced rather than mutated so readers always see a
+    consistent set of shards.
+    """
+
+    def __init__(self, shards: Optional[Dict[str, StudentDataset]] = None):
+        self.shards: Dict[str, StudentDataset] = dict(shards or {})
+        # Bumped on every change; response caches and ETags are keyed on it
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    def get(self, institution: str) -> Optional[StudentDataset]:
+        return self.shards.get(institution)
+
+    def scope(self, institution: Optional[str] = None) -> List[Tuple[str, StudentDataset]]:
+        """
+        Return (institution, shard) pairs for one institution, or for all of them
+        """
+        shards = self.shards
+        if institution is not None:
+            return [(institution, shards[institution])] if institution in shards else []
+        return sorted(shards.items())
+
+    def count(self, institution: Optional[str] = None) -> int:
+        return sum(len(shard) for _, shard in self.scope(institution))
+
+    def iter_students(self, institution: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for _, shard in self.scope(institution):
+            yield from shard.store
+
+    def iter_range(self, start: int, stop: int, institution: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield rows [start, stop) of the shards in scope, as if they were one table
+        """
+        offset = 0
+        for _, shard in self.scope(institution):
+            size = len(shard)
+            if offset + size > start and offset < stop:
+                yield from shard.store.iter_range(max(start - offset, 0), min(stop - offset, size))
+            offset += size
+            if offset >= stop:
+                break
+
+    def find_by_roll(self, roll_no: str, institution: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for _, shard in self.scope(institution):
+            student = shard.find_by_roll(roll_no)
+            if student is not None:
+                return student
+        return None
+
+    def locate_roll(self, roll_no: str, institution: Optional[str] = None) -> Optional[Tuple[str, StudentDataset, int]]:
+        """
+        Return (institution, shard, row id) of the first student with a roll number
+        """
+        for name, shard in self.scope(institution):
+            row_id = shard.index.find_by_roll(roll_no)
+            if row_id is not None:
+                return name, shard, row_id
+        return None
+
+    def find_by_application(self, application_no: str, institution: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for _, shard in self.scope(institution):
+            student = shard.find_by_application(application_no)
+            if student is not None:
+                return student
+        return None
+
+    def find_many(self, keys: Iterable[str], field: str,
+                  institution: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Resolve many Rno or Jno keys; each shard is only asked for keys still missing
+        """
+        remaining = list(dict.fromkeys(keys))
+        found: Dict[str, Dict[str, Any]] = {}
+        for _, shard in self.scope(institution):
+            if not remaining:
+                break
+            found.update(shard.find_many(remaining, field))
+            remaining = [key for key in remaining if key not in found]
+        return found
+
+    def search(self, query: str, fields, institution: Optional[str] = None) -> List[Dict[str, Any]]:
+        results = []
+        for _, shard in self.scope(institution):
+            results.extend(shard.search(query, fields))
+        return results
+
+    def fuzzy_search(self, name: str, limit: int, threshold: float,
+                     institution: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Best fuzzy name matches across the shards in scope, highest score first
+        """
+        results = []
+        for _, shard in self.scope(institution):
+            results.extend(shard.fuzzy_search(name, limit, threshold))
+        # nlargest is stable, so ties keep institution and row order
+        return heapq.nlargest(limit, results, key=lambda result: result[1])
+
+    def stats(self, institution: Optional[str] = None) -> Dict[str, Any]:
+        scope = self.scope(institution)
+        if len(scope) == 1:
+            return scope[0][1].stats.snapshot()
+        return merge_snapshots(shard.stats.snapshot() for _, shard in scope)
+
+    def institutions(self) -> Dict[str, int]:
+        return {institution: len(shard) for institution, shard in self.scope()}
+
+    def replay(self, batches: List[Dict[str, Any]]) -> int:
+        """
+        Apply logged batches in order, building each touched shard's indexes once
+
+        Batches before an institution's last full replacement are skipped.
+        Returns the number of batches applied. Nothing is published if any
+        batch cannot be applied, so the caller can refuse to start instead
+        of serving (and later compacting) a partial dataset.
+        """
+        last_replace = {}
+        for i, batch in enumerate(batches):
+            if batch["op"] == REPLACE:
+                last_replace[batch.get("institution", DEFAULT_INSTITUTION)] = i
+
+        stores: Dict[str, StudentStore] = {}
+        seqs: Dict[str, int] = {}
+        applied = 0
+        with self._lock:
+            for i, batch in enumerate(batches):
+                institution = batch.get("institution", DEFAULT_INSTITUTION)
+                if i < last_replace.get(institution, 0):
+                    continue
+                if institution not in stores:
+                    current = self.shards.get(institution)
+                    stores[institution] = current.store if current is not None else StudentStore()
+                try:
+                    stores[institution] = apply_batch(stores[institution], batch)
+                except Exception as e:
+                    raise ValueError(f"Change log batch {batch.get('seq')} cannot be applied: {e}") from e
+                seqs[institution] = batch["seq"]
+                applied += 1
+
+            rebuilt = {institution: StudentDataset(store, seq=seqs[institution]) for institution, store in stores.items()}
+            self.shards = {**self.shards, **rebuilt}
+            self.version += 1
+
+        return applied
+
+    def _build(self, batch: Dict[str, Any]) -> StudentDataset:
+        """
+        Return the shard a batch produces, without publishing it
+        """
+        current = self.shards.get(batch.get("institution", DEFAULT_INSTITUTION))
+        if current is None:
+            return StudentDataset(apply_batch(StudentStore(), batch), seq=batch["seq"])
+
+        store, touched = apply_batch_changes(current.store, batch, current.index.by_roll)
+        if touched is None or len(touched) > len(store) * INCREMENTAL_MAX_FRACTION:
+            return StudentDataset(store, seq=batch["seq"])
+
+        # Rows kept their positions, so only the touched rows need reindexing and rehashing
+        size = len(current.store)
+        changes = [(row_id, current.store[row_id] if row_id < size else None, store[row_id])
+                   for row_id in touched]
+        return current.updated(store, changes, batch["seq"])
+
+    def commit(self, changelog: ChangeLog, op: str, institution: str,
+               students: Optional[Iterable[Dict[str, Any]]] = None,
+               keys: Optional[List[str]] = None) -> StudentDataset:
+        """
+        Apply a batch for one institution, durably log it, then publish the shard
+
+        The shard is built before the batch is logged, so a batch that cannot
+        be applied raises here and never reaches the log, where it would fail
+        every replay. Building, logging and publishing happen under one lock
+        so batches reach the shards in log order even when uploads finish
+        concurrently.
+        """
+        if students is not None:
+            students = StudentStore(students).to_list()
+
+        with self._lock:
+            batch = {"seq": changelog.last_seq + 1, "op": op, "institution": institution,
+                     "students": students, "keys": keys}
+            shard = self._build(batch)
+            shard.seq = changelog.append(op, students=students, keys=keys, institution=institution)
+
+            self.shards = {**self.shards, institution: shard}
+            self.version += 1
+            return shard
+
+    def capture(self, changelog: ChangeLog) -> Tuple[Dict[str, StudentDataset], int]:
+        """
+        Return the current shards with the last log sequence number they reflect
+        """
+        with self._lock:
+            return self.shards, changelog.last_seq
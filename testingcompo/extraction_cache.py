@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from atomic_file import atomic_write
+
+# Bump when the shape of the cached page content changes
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ExtractionCache:
+    """
+    On-disk cache of raw per-page PDF content, keyed by the file's SHA-256
+
+    Entries hold the tables and text found on each page before any column
+    mapping is applied, so a repeat upload or a remap of the same PDF skips
+    pdfplumber entirely. Least recently used entries are evicted once the
+    cache directory grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = ".extraction_cache", max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+        """
+        SHA-256 of a file, read in chunks
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.v{CACHE_FORMAT_VERSION}.json"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the cached pages for a key, or None on a miss
+        """
+        path = self._entry_path(key)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            # Refresh the timestamp that eviction orders by
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, key: str, pages: List[Dict[str, Any]]):
+        """
+        Store the pages for a key, then evict old entries over the size limit
+        """
+        path = self._entry_path(key)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file and rename so readers never see a partial entry
+        with atomic_write(str(path), "w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False, separators=(",", ":"))
+
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
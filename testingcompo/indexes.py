@@ -0,0 +1,534 @@
+import heapq
+from bisect import insort
+from collections import Counter
+import math
+import re
+import unicodedata
+from typing import List, Dict, Iterable, Optional, Set, Tuple
+from student_store import StudentStore, STUDENT_FIELDS, RowChange
+
+
+def normalize_key(value: str) -> str:
+    """
+    Normalize a roll number for lookups; roll numbers match case-insensitively
+    """
+    return str(value).strip().upper()
+
+
+def application_key(value: str) -> str:
+    """
+    Key of an application number; application numbers match exactly
+    """
+    return str(value)
+
+
+# How each indexed field's values are turned into lookup keys
+KEY_FUNCTIONS = {"Rno": normalize_key, "Jno": application_key}
+
+
+class StudentIndex:
+    """
+    Hash indexes mapping roll number (Rno) and application number (Jno) to row ids
+    """
+
+    def __init__(self, store: Optional[StudentStore] = None):
+        self.by_roll: Dict[str, int] = {}
+        self.by_application: Dict[str, int] = {}
+
+        if store is not None:
+            self.build(store)
+
+    def build(self, store: StudentStore):
+        """
+        Build both indexes from scratch; the first record wins on duplicate keys,
+        matching the old linear scan
+        """
+        by_roll = {}
+        by_application = {}
+
+        for row_id, value in enumerate(store.column("Rno")):
+            by_roll.setdefault(normalize_key(value), row_id)
+        for row_id, value in enumerate(store.column("Jno")):
+            by_application.setdefault(application_key(value), row_id)
+
+        self.by_roll = by_roll
+        self.by_application = by_application
+
+    def updated(self, store: StudentStore, changes: List[RowChange]) -> "StudentIndex":
+        """
+        Return a copy with the changed and appended rows of store reindexed
+
+        The first record still wins on duplicate keys. Only when a key's
+        first row changed to another key is the store scanned, once, for
+        the next row with that key.
+        """
+        index = StudentIndex()
+        index.by_roll = self._updated_keys(self.by_roll, store, "Rno", changes)
+        index.by_application = self._updated_keys(self.by_application, store, "Jno", changes)
+        return index
+
+    @staticmethod
+    def _updated_keys(keys: Dict[str, int], store: StudentStore, field: str,
+                      changes: List[RowChange]) -> Dict[str, int]:
+        key_of = KEY_FUNCTIONS[field]
+        keys = dict(keys)
+        lost = set()
+        for row_id, old, new in changes:
+            key = key_of(new[field])
+            if old is not None:
+                old_key = key_of(old[field])
+                if old_key == key:
+                    continue
+                if keys.get(old_key) == row_id:
+                    lost.add(old_key)
+            first = keys.get(key)
+            if first is None or row_id < first:
+                keys[key] = row_id
+
+        if lost:
+            for key in lost:
+                del keys[key]
+            for row_id, value in enumerate(store.column(field)):
+                key = key_of(value)
+                if key in lost and key not in keys:
+                    keys[key] = row_id
+        return keys
+
+    def find_by_roll(self, roll_no: str) -> Optional[int]:
+        """
+        Find the row id of a student by roll number (case-insensitive)
+        """
+        return self.by_roll.get(normalize_key(roll_no))
+
+    def find_by_application(self, application_no: str) -> Optional[int]:
+        """
+        Find the row id of a student by application number (exact match)
+        """
+        return self.by_application.get(application_key(application_no))
+
+    def find_many(self, keys: Iterable[str], field: str = "Rno") -> Dict[str, int]:
+        """
+        Resolve many roll (Rno) or application (Jno) numbers in one pass;
+        returns {key: row id} for the keys that were found
+        """
+        index = self.by_roll if field == "Rno" else self.by_application
+        key_of = normalize_key if field == "Rno" else application_key
+        found = {}
+        for key in keys:
+            row_id = index.get(key_of(key))
+            if row_id is not None:
+                found[key] = row_id
+        return found
+
+
+SEARCH_FIELDS = STUDENT_FIELDS
+
+def trigrams(text: str) -> List[str]:
+    """
+    Split a lowercase string into its overlapping 3-character grams
+    """
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+def value_grams(value: str) -> Set[str]:
+    """
+    Grams a value is posted under: its trigrams, or the value itself when it
+    is shorter than a trigram, so short queries can still find it
+    """
+    if len(value) < 3:
+        return {value} if value else set()
+    return set(trigrams(value))
+
+
+def _add_postings(postings: Dict[str, List[int]], shared: Dict[str, List[int]], grams: Iterable[str],
+                  value_id: int, grown: Dict[str, int]):
+    """
+    Append a new value id to the postings of its grams
+
+    Lists that came from the previous index version (shared) are appended
+    to in place; grown records their lengths before the first append so a
+    failed update can be rolled back with _truncate_postings.
+    """
+    for gram in grams:
+        posting = postings.get(gram)
+        if posting is None:
+            posting = postings[gram] = []
+        elif posting is shared.get(gram) and gram not in grown:
+            grown[gram] = len(posting)
+        posting.append(value_id)
+
+
+def _truncate_postings(postings: Dict[str, List[int]], grown: Dict[str, int]):
+    for gram, length in grown.items():
+        del postings[gram][length:]
+
+
+class _FieldIndex:
+    """
+    Trigram postings for one field, built over its distinct lowercase values
+
+    Value ids only ever grow, so posting lists are shared by successive
+    versions of the index and appended to in place; each version ignores
+    the ids past its own values.
+    """
+
+    def __init__(self, values: List[str], rows: List[List[int]], postings: Dict[str, List[int]],
+                 ids: Optional[Dict[str, int]] = None):
+        self.values = values
+        self.rows = rows
+        self.postings = postings
+        # Value -> value id, only built once the index is first updated
+        self.ids = ids
+
+    def updated(self, moves: List[Tuple[int, Optional[str], str]]) -> "_FieldIndex":
+        """
+        Return a copy with rows moved from their old value (None if new) to another
+
+        Row lists are copied before they are changed and postings only
+        grow, so readers of this index are unaffected; since the postings
+        are shared, only the newest version may be updated. A value left
+        without rows stays in the postings and simply matches nothing until
+        the next full build.
+        """
+        values = list(self.values)
+        rows = list(self.rows)
+        postings = dict(self.postings)
+        ids = dict(self.ids) if self.ids is not None else {value: value_id for value_id, value in enumerate(values)}
+        copied_rows = set()
+        grown: Dict[str, int] = {}
+
+        def own_rows(value_id: int) -> List[int]:
+            if value_id not in copied_rows:
+                rows[value_id] = list(rows[value_id])
+                copied_rows.add(value_id)
+            return rows[value_id]
+
+        try:
+            for row_id, old, new in moves:
+                if old is not None:
+                    own_rows(ids[old]).remove(row_id)
+
+                value_id = ids.get(new)
+                if value_id is None:
+                    value_id = ids[new] = len(values)
+                    values.append(new)
+                    rows.append([])
+                    _add_postings(postings, self.postings, value_grams(new), value_id, grown)
+                insort(own_rows(value_id), row_id)
+        except BaseException:
+            _truncate_postings(postings, grown)
+            raise
+
+        return _FieldIndex(values, rows, postings, ids)
+
+    def candidates(self, query: str):
+        """
+        Ids of values that contain every trigram of the query
+        """
+        size = len(self.values)
+        if not query:
+            return range(size)
+        if len(query) < 3:
+            return self._short_candidates(query, size)
+
+        lists = []
+        for gram in set(trigrams(query)):
+            posting = self.postings.get(gram)
+            if not posting:
+                return []
+            lists.append(posting)
+
+        lists.sort(key=len)
+        result = set(lists[0])
+        for posting in lists[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+
+        # Drop ids added to the shared postings by later versions
+        return [value_id for value_id in result if value_id < size]
+
+    def _short_candidates(self, query: str, size: int):
+        """
+        Ids of values that may contain a query shorter than a trigram
+
+        Such a value has a posted gram (a trigram, or the whole value when it
+        is short) that contains the query, so the postings of those grams are
+        merged. There are far fewer distinct grams than values; only when the
+        merged postings would be longer than the list of values is every
+        value checked instead.
+        """
+        lists = [posting for gram, posting in self.postings.items() if query in gram]
+        if sum(map(len, lists)) >= size:
+            return range(size)
+
+        result = set()
+        for posting in lists:
+            result.update(posting)
+        return [value_id for value_id in result if value_id < size]
+
+
+class TrigramIndex:
+    """
+    Trigram inverted index for case-insensitive substring search
+    """
+
+    def __init__(self, store: Optional[StudentStore] = None):
+        self.fields: Dict[str, _FieldIndex] = {}
+
+        if store is not None:
+            self.build(store)
+
+    def build(self, store: StudentStore):
+        """
+        Build postings for every searchable field from scratch
+        """
+        fields = {}
+
+        for field in SEARCH_FIELDS:
+            value_rows: Dict[str, List[int]] = {}
+            for row_id, value in enumerate(store.column(field)):
+                value_rows.setdefault(value.lower(), []).append(row_id)
+
+            values = list(value_rows)
+            postings: Dict[str, List[int]] = {}
+            for value_id, value in enumerate(values):
+                for gram in value_grams(value):
+                    postings.setdefault(gram, []).append(value_id)
+
+            fields[field] = _FieldIndex(values, [value_rows[value] for value in values], postings)
+
+        self.fields = fields
+
+    def updated(self, changes: List[RowChange]) -> "TrigramIndex":
+        """
+        Return a copy with the changed and appended rows reindexed; fields
+        whose values did not change are shared with this index
+        """
+        index = TrigramIndex()
+        index.fields = dict(self.fields)
+
+        for field, field_index in self.fields.items():
+            moves = []
+            for row_id, old, new in changes:
+                old_value = None if old is None else old[field].lower()
+                new_value = new[field].lower()
+                if old_value != new_value:
+                    moves.append((row_id, old_value, new_value))
+            if moves:
+                index.fields[field] = field_index.updated(moves)
+
+        return index
+
+    def search(self, query: str, fields=SEARCH_FIELDS) -> List[int]:
+        """
+        Return the row ids, in dataset order, whose fields contain the query
+        """
+        query = query.lower()
+        matched = set()
+
+        for field in fields:
+            field_index = self.fields.get(field)
+            if field_index is None:
+                continue
+
+            # Postings only narrow the candidates; verify the actual substring
+            for value_id in field_index.candidates(query):
+                if query in field_index.values[value_id]:
+                    matched.update(field_index.rows[value_id])
+
+        return sorted(matched)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase a name, strip accents and punctuation, and collapse whitespace
+    """
+    decomposed = unicodedata.normalize("NFKD", str(name))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[\W_]+", " ", stripped.lower()).split())
+
+
+def _pad_words(name: str) -> str:
+    return "".join(f"  {word} " for word in name.split())
+
+
+def name_grams(name: str) -> Set[str]:
+    """
+    Trigrams of a normalized name, each word padded so word starts and ends
+    count and word order does not matter
+    """
+    grams = set()
+    for word in name.split():
+        grams.update(trigrams(f"  {word} "))
+    return grams
+
+
+class FuzzyNameIndex:
+    """
+    Trigram similarity index over normalized names for ranked, typo-tolerant search
+
+    Candidates are scored by the Jaccard similarity of their trigram sets.
+    Only the rarest query trigrams are used to find candidates: a name that
+    reaches the threshold must share at least one of them, so common grams
+    never have their (long) postings walked.
+    """
+
+    def __init__(self, store: Optional[StudentStore] = None, field: str = "CN"):
+        self.field = field
+        self.values: List[str] = []
+        self.rows: List[List[int]] = []
+        self.gram_counts: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        # Normalized name -> value id, only built once the index is first updated
+        self.ids: Optional[Dict[str, int]] = None
+
+        if store is not None:
+            self.build(store)
+
+    def build(self, store: StudentStore):
+        """
+        Build postings over the distinct normalized names
+        """
+        value_rows: Dict[str, List[int]] = {}
+        for row_id, value in enumerate(store.column(self.field)):
+            name = normalize_name(value)
+            if name:
+                value_rows.setdefault(name, []).append(row_id)
+
+        values = []
+        gram_counts = []
+        postings: Dict[str, List[int]] = {}
+        for value_id, name in enumerate(value_rows):
+            grams = name_grams(name)
+            for gram in grams:
+                postings.setdefault(gram, []).append(value_id)
+            values.append(_pad_words(name))
+            gram_counts.append(len(grams))
+
+        self.values = values
+        self.rows = list(value_rows.values())
+        self.gram_counts = gram_counts
+        self.postings = postings
+        self.ids = None
+
+    def updated(self, changes: List[RowChange]) -> "FuzzyNameIndex":
+        """
+        Return a copy with the changed and appended rows reindexed
+
+        As with the trigram index, row lists are copied before they are
+        changed, postings are shared and only grow (so only the newest
+        version may be updated), and names left without rows only drop out
+        at the next full build.
+        """
+        index = FuzzyNameIndex(field=self.field)
+        values = index.values = list(self.values)
+        rows = index.rows = list(self.rows)
+        gram_counts = index.gram_counts = list(self.gram_counts)
+        postings = index.postings = dict(self.postings)
+        ids = index.ids = (dict(self.ids) if self.ids is not None
+                           else {" ".join(padded.split()): value_id for value_id, padded in enumerate(values)})
+        copied_rows = set()
+        grown: Dict[str, int] = {}
+
+        def own_rows(value_id: int) -> List[int]:
+            if value_id not in copied_rows:
+                rows[value_id] = list(rows[value_id])
+                copied_rows.add(value_id)
+            return rows[value_id]
+
+        try:
+            for row_id, old, new in changes:
+                old_name = None if old is None else normalize_name(old[self.field])
+                name = normalize_name(new[self.field])
+                if old_name == name:
+                    continue
+                if old_name:
+                    own_rows(ids[old_name]).remove(row_id)
+                if not name:
+                    continue
+
+                value_id = ids.get(name)
+                if value_id is None:
+                    value_id = ids[name] = len(values)
+                    grams = name_grams(name)
+                    _add_postings(postings, self.postings, grams, value_id, grown)
+                    values.append(_pad_words(name))
+                    gram_counts.append(len(grams))
+                    rows.append([])
+                insort(own_rows(value_id), row_id)
+        except BaseException:
+            _truncate_postings(postings, grown)
+            raise
+
+        return index
+
+    def search(self, query: str, limit: int = 10, threshold: float = 0.3) -> List[Tuple[int, float]]:
+        """
+        Return up to limit (row id, score) pairs with score >= threshold, best first
+        """
+        grams = name_grams(normalize_name(query))
+        if not grams or limit <= 0:
+            return []
+
+        query_count = len(grams)
+        threshold = max(threshold, 1e-9)
+        # Jaccard >= threshold implies sharing at least threshold * |query| grams,
+        # so a match shares at least one of the query_count - min_overlap + 1
+        # rarest grams; the remaining common grams are only checked per candidate
+        min_overlap = max(1, math.ceil(threshold * query_count - 1e-9))
+        postings = self.postings
+        ordered = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+        split = query_count - min_overlap + 1
+        rest = ordered[split:]
+
+        counts: Counter = Counter()
+        for gram in ordered[:split]:
+            counts.update(postings.get(gram, ()))
+
+        by_count: Dict[int, List[int]] = {}
+        for value_id, count in counts.items():
+            by_count.setdefault(count, []).append(value_id)
+
+        values, gram_counts, rows = self.values, self.gram_counts, self.rows
+        size = len(values)
+        best: List[Tuple[float, int, int]] = []
+        floor = threshold
+        for shared in sorted(by_count, reverse=True):
+            # No value can beat (shared + len(rest)) / query_count from here on
+            if (shared + len(rest)) / query_count < floor:
+                break
+
+            for value_id in by_count[shared]:
+                # Names added to the shared postings by later versions, or
+                # whose rows were all updated away
+                if value_id >= size or not rows[value_id]:
+                    continue
+                value_count = gram_counts[value_id]
+                most = min(shared + len(rest), value_count)
+                if most / (query_count + value_count - most) < floor:
+                    continue
+
+                # Trigrams of padded words only occur where they really are, so a
+                # substring check is an exact set-membership test
+                padded = values[value_id]
+                overlap = shared + sum(1 for gram in rest if gram in padded)
+                score = overlap / (query_count + value_count - overlap)
+                if score < floor:
+                    continue
+
+                entry = (score, -rows[value_id][0], value_id)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heappushpop(best, entry)
+                if len(best) == limit:
+                    floor = max(threshold, best[0][0])
+
+        results = []
+        for score, _, value_id in sorted(best, reverse=True):
+            for row_id in rows[value_id]:
+                results.append((row_id, round(score, 4)))
+                if len(results) == limit:
+                    return results
+        return results
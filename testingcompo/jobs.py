@@ -0,0 +1,145 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+class Job:
+    """
+    State and progress of one background ingestion job
+    """
+
+    def __init__(self, filename: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = QUEUED
+        self.pages_total = 0
+        self.pages_processed = 0
+        self.records_found = 0
+        self.errors: List[str] = []
+        self.result: Dict[str, Any] = {}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def report_progress(self, pages_processed: int, pages_total: int, records_found: int):
+        """
+        Progress callback handed to the extraction code; runs on a worker thread
+        """
+        self.pages_processed = pages_processed
+        self.pages_total = pages_total
+        self.records_found = records_found
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_total": self.pages_total,
+            "pages_processed": self.pages_processed,
+            "records_found": self.records_found,
+            "errors": list(self.errors),
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Bounded queue of background jobs executed off the event loop
+
+    `workers` jobs run at a time on a thread pool, at most `max_queued` wait
+    behind them, and the `history` most recent finished jobs are kept for
+    status queries. Each job has a blocking `work(job)` function, run on the
+    pool, and an optional `on_complete(job, result)` callback, run back on
+    the event loop so it can swap shared state without locking.
+    """
+
+    def __init__(self, workers: int = 1, max_queued: int = 16, history: int = 100):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history = history
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, job: Job, work: Callable[[Job], Any],
+               on_complete: Optional[Callable[[Job, Any], None]] = None) -> Job:
+        """
+        Queue a job; must be called from the event loop
+        """
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait((job, work, on_complete))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Too many pending jobs (limit {self.max_queued})")
+
+        self.jobs[job.id] = job
+        self._trim_history()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job, work, on_complete = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+
+            try:
+                result = await loop.run_in_executor(self._executor, work, job)
+                if on_complete is not None:
+                    on_complete(job, result)
+                job.status = COMPLETED
+            except Exception as e:
+                job.errors.append(str(e))
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self.jobs[job_id]
+
+    async def shutdown(self):
+        """
+        Cancel the worker tasks and release the thread pool
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._queue = None
+        self._tasks = []
+        self._executor = None
@@ -1,11 +1,30 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
+import asyncio
+import base64
+import binascii
 import json
 import os
+import time
 from pathlib import Path
-from models import Student, StudentResponse, StudentsListResponse, SearchRequest
-from pdf_to_json_converter import StudentDataConverter
+from models import (Student, StudentResponse, StudentsListResponse, FuzzySearchResponse,
+                    VerifyRequest, VerifyResponse, MerkleProofResponse, MerkleVerifyRequest)
+from pdf_to_json_converter import StudentDataConverter, record_stage, PREVIEW_PAGES, PREVIEW_ROWS
+from extraction_cache import ExtractionCache
+from indexes import SEARCH_FIELDS
+from dataset import StudentDataset, ShardedDataset, DEFAULT_INSTITUTION, is_valid_institution
+from student_store import StudentStore
+from changelog import ChangeLog, REPLACE, UPSERT
+from jobs import Job, JobManager, JobQueueFull
+from merkle import leaf_hash, verify_proof
+from response_cache import ResponseCache, ResponseCacheMiddleware
+from metrics import REGISTRY, CONTENT_TYPE, RequestMetricsMiddleware
+from uploads import (UploadLimitMiddleware, StreamedUpload, JsonArraySplitter, spool_upload, upload_openapi,
+                     DEFAULT_MAX_UPLOAD_BYTES)
 
 app = FastAPI(
     title="Student Data API",
@@ -13,6 +32,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Largest upload request body accepted; bigger ones are refused with 413
+# before (or while) they are read
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(DEFAULT_MAX_UPLOAD_BYTES)))
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES, paths={"/upload/pdf", "/upload/json", "/pdf-preview", "/pdf-columns"})
+
+# Cache GET responses per dataset version. Added before CORS so that CORS
+# wraps it and cached responses still get CORS headers
+response_cache = ResponseCache(int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    version=lambda: dataset.version,
+    paths={"/students", "/stats", "/search", "/institutions", "/merkle/root", "/merkle/proof", "/merkle/consistency"},
+    prefixes=("/search/",)
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -22,32 +57,205 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variable to store student data
-students_data: List[Student] = []
+# Per-route latency and requests in flight, served with the extraction stage
+# timers on /metrics. Added last so it is outermost and times everything,
+# including responses served from the cache
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Request latency until the last byte of the response, by route",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled, by route",
+    ["method", "route"]
+)
+app.add_middleware(
+    RequestMetricsMiddleware,
+    latency=REQUEST_SECONDS,
+    in_flight=REQUESTS_IN_FLIGHT,
+    routes=lambda: app.routes
+)
+
+# Global student data: one shard (store, indexes, aggregates) per institution
+dataset = ShardedDataset()
+
+# Initialize converter with a cache of previously extracted PDFs
+converter = StudentDataConverter(cache=ExtractionCache(
+    os.environ.get("EXTRACTION_CACHE_DIR", ".extraction_cache"),
+    max_bytes=int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+))
+
+# Where the default shard is persisted; a .snap path uses the binary snapshot format.
+# Other institutions are saved next to it as <stem>.<institution><suffix>
+DATA_FILE = os.environ.get("STUDENT_DATA_FILE", "students_data.json")
+
+# Uploads are appended to a change log and folded into DATA_FILE once it grows
+changelog = ChangeLog(os.environ.get("STUDENT_CHANGELOG_FILE", "students_changes.log"))
+CHANGELOG_COMPACT_BYTES = int(os.environ.get("CHANGELOG_COMPACT_BYTES", str(64 * 1024 * 1024)))
+compaction = None
+compacted_seq = 0
+
+# Page size limits for /students
+MAX_PAGE_SIZE = 10000
+
+# Most Rno + Jno keys accepted by one /verify request
+MAX_VERIFY_KEYS = int(os.environ.get("MAX_VERIFY_KEYS", "10000"))
+
+# JSON uploads: records committed per change log batch, and invalid records
+# listed in the response
+JSON_UPLOAD_BATCH_SIZE = int(os.environ.get("JSON_UPLOAD_BATCH_SIZE", "10000"))
+MAX_REPORTED_INVALID = 20
+
+# Fuzzy name search: default number of candidates and minimum similarity (0-1)
+FUZZY_SEARCH_LIMIT = int(os.environ.get("FUZZY_SEARCH_LIMIT", "10"))
+FUZZY_SEARCH_THRESHOLD = float(os.environ.get("FUZZY_SEARCH_THRESHOLD", "0.3"))
+
+# Number of NDJSON lines sent per chunk by /students/stream
+STREAM_CHUNK_ROWS = 1000
+
+# Default number of processes used to parse uploaded PDFs (0 = one per CPU)
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", "1"))
+
+# Default way of laying out PDF pages: "tables" (table detection on every page)
+# or "template" (column layout learned from the first page)
+PDF_EXTRACT_METHOD = os.environ.get("PDF_EXTRACT_METHOD", "tables")
+
+# Background PDF ingestion: concurrent jobs and how many may wait in the queue
+ingest_jobs = JobManager(
+    workers=int(os.environ.get("INGEST_WORKERS", "1")),
+    max_queued=int(os.environ.get("INGEST_QUEUE_SIZE", "16"))
+)
+
+def shard_file(institution: str) -> Path:
+    """Path a shard is compacted into"""
+    data_file = Path(DATA_FILE)
+    if institution == DEFAULT_INSTITUTION:
+        return data_file
+    return data_file.with_name(f"{data_file.stem}.{institution}{data_file.suffix}")
+
+def scoped_institution(institution: Optional[str]) -> Optional[str]:
+    """Check an optional institution scope for a query; None means every institution"""
+    if institution is not None and dataset.get(institution) is None:
+        raise HTTPException(status_code=404, detail=f"Institution '{institution}' not found")
+    return institution
+
+def upload_institution(institution: Optional[str]) -> str:
+    """Check the institution an upload targets, defaulting to the default shard"""
+    if institution is None:
+        return DEFAULT_INSTITUTION
+    if not is_valid_institution(institution):
+        raise HTTPException(status_code=400, detail="Institution may only contain letters, digits, '-' and '_'")
+    return institution
 
-# Initialize converter
-converter = StudentDataConverter()
+def validate_elements(texts: List[str], first_index: int, students: List[Dict[str, str]], invalid: List[Dict]) -> int:
+    """
+    Validate the source text of JSON array elements as Students, appending the valid
+    ones to students and the index and errors of the first invalid ones to invalid;
+    return the number of invalid elements
+    """
+    invalid_count = 0
+    for i, text in enumerate(texts, first_index):
+        try:
+            students.append(Student.model_validate_json(text).model_dump())
+        except ValidationError as e:
+            invalid_count += 1
+            if len(invalid) < MAX_REPORTED_INVALID:
+                invalid.append({
+                    "index": i,
+                    "errors": [f"{'.'.join(map(str, error['loc'])) or 'record'}: {error['msg']}" for error in e.errors()]
+                })
+    return invalid_count
+
+def maybe_compact():
+    """Fold the change log into the shard files in the background once it is large enough"""
+    global compaction
+    if compaction is not None or changelog.size() < CHANGELOG_COMPACT_BYTES:
+        return
+    
+    # Everything logged up to seq is reflected in these shards
+    shards, seq = dataset.capture(changelog)
+    
+    def compact():
+        for institution, shard in shards.items():
+            if shard.seq > compacted_seq:
+                converter.save(shard.store, str(shard_file(institution)))
+        changelog.truncate_through(seq)
+        return seq
+    
+    def done(future):
+        global compaction, compacted_seq
+        compaction = None
+        if future.exception() is not None:
+            print(f"Error compacting change log: {future.exception()}")
+        else:
+            compacted_seq = future.result()
+    
+    compaction = asyncio.get_running_loop().run_in_executor(None, compact)
+    compaction.add_done_callback(done)
 
 @app.on_event("startup")
 async def startup_event():
     """Load student data on startup"""
-    global students_data
-    data_file = Path("students_data.json")
+    data_file = Path(DATA_FILE)
+    shards = {}
     
     if data_file.exists():
         try:
-            students_data = converter.load_from_json("students_data.json")
-            print(f"Loaded {len(students_data)} students from JSON file")
+            shards[DEFAULT_INSTITUTION] = StudentDataset(converter.load(DATA_FILE))
+            print(f"Loaded {len(shards[DEFAULT_INSTITUTION])} students from {DATA_FILE}")
         except Exception as e:
             print(f"Error loading student data: {e}")
     else:
         # Load sample data if no data file exists
         sample_file = Path("sample_students_data.json")
         if sample_file.exists():
-            students_data = converter.load_from_json("sample_students_data.json")
-            print(f"Loaded {len(students_data)} sample students")
-        else:
+            shards[DEFAULT_INSTITUTION] = StudentDataset(converter.load_from_json("sample_students_data.json"))
+            print(f"Loaded {len(shards[DEFAULT_INSTITUTION])} sample students")
+        elif changelog.size() == 0:
             print("No student data file found. Please upload a PDF or JSON file.")
+    
+    # Load the other institutions' shards saved by compaction
+    for path in sorted(data_file.parent.glob(f"{data_file.stem}.*{data_file.suffix}")):
+        institution = path.name[len(data_file.stem) + 1:-len(data_file.suffix)]
+        if institution == DEFAULT_INSTITUTION or not is_valid_institution(institution):
+            continue
+        try:
+            shards[institution] = StudentDataset(converter.load(str(path)))
+            print(f"Loaded {len(shards[institution])} students for {institution} from {path}")
+        except Exception as e:
+            print(f"Error loading student data for {institution}: {e}")
+    
+    global dataset
+    dataset = ShardedDataset(shards)
+    
+    # Uploads since the last compaction only exist in the change log. If it
+    # cannot be replayed, refuse to start: serving without those uploads and
+    # then compacting would make their loss permanent.
+    try:
+        applied = dataset.replay(list(changelog.replay()))
+    except Exception as e:
+        raise RuntimeError(f"Error replaying change log {changelog.path}: {e}") from e
+    if applied:
+        print(f"Replayed {applied} change log batches from {changelog.path}")
+    
+    def build_indexes():
+        for institution, shard in dataset.scope():
+            try:
+                shard.build()
+            except Exception as e:
+                print(f"Error building indexes for {institution}: {e}")
+    
+    # Indexes are built in the background so the API serves as soon as the
+    # data is loaded; a request that needs one before it is ready waits for it
+    asyncio.get_running_loop().run_in_executor(None, build_indexes)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background ingestion workers and let a running compaction finish"""
+    await ingest_jobs.shutdown()
+    if compaction is not None:
+        await asyncio.wait([compaction])
 
 @app.get("/", response_model=dict)
 async def root():
@@ -59,250 +267,530 @@ async def root():
             "search_by_roll": "/search/roll/{roll_no}",
             "search_by_application": "/search/application/{application_no}",
             "search_by_name": "/search/name/{name}",
+            "fuzzy_search_by_name": "/search/fuzzy/{name}?limit={limit}&threshold={threshold}",
             "search_all": "/search?query={query}",
-            "get_all_students": "/students",
+            "verify_batch": "/verify",
+            "merkle_root": "/merkle/root",
+            "merkle_proof": "/merkle/proof?roll_no={roll_no}",
+            "merkle_verify": "/merkle/verify",
+            "merkle_consistency": "/merkle/consistency?first_size={first_size}&institution={institution}",
+            "get_all_students": "/students?limit={limit}&cursor={cursor}",
+            "stream_students": "/students/stream",
             "upload_pdf": "/upload/pdf",
-            "upload_json": "/upload/json"
-        }
+            "job_status": "/jobs/{job_id}",
+            "upload_json": "/upload/json",
+            "pdf_preview": "/pdf-preview?pages={pages}&rows={rows}",
+            "pdf_columns": "/pdf-columns",
+            "institutions": "/institutions",
+            "metrics": "/metrics"
+        },
+        "institution_scope": "Every endpoint accepts ?institution={institution}"
     }
 
+def students_response(data, total_count: int, message: str, next_cursor: Optional[str] = None) -> JSONResponse:
+    """StudentsListResponse serialized straight from store records, without per-record models"""
+    # Records come out of the store with exactly the Student fields as strings,
+    # so they were effectively validated when they were ingested
+    return JSONResponse({
+        "success": True,
+        "data": data,
+        "total_count": total_count,
+        "message": message,
+        "next_cursor": next_cursor
+    })
+
+def student_response(student, message: str) -> JSONResponse:
+    """StudentResponse serialized straight from a store record (or None)"""
+    return JSONResponse({
+        "success": student is not None,
+        "data": student,
+        "message": message
+    })
+
+def encode_cursor(offset: int) -> str:
+    """Encode a row offset as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(f"row:{offset}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a pagination cursor back into a row offset"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, offset = base64.urlsafe_b64decode(padded).decode().split(":")
+        if prefix != "row" or int(offset) < 0:
+            raise ValueError(cursor)
+        return int(offset)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/students", response_model=StudentsListResponse)
-async def get_all_students():
-    """Get all students"""
-    return StudentsListResponse(
-        success=True,
-        data=students_data,
-        total_count=len(students_data),
-        message=f"Retrieved {len(students_data)} students"
+async def get_all_students(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    institution: Optional[str] = Query(None, description="Limit to one institution")
+):
+    """Get all students, or one page of them when limit/cursor are given"""
+    institution = scoped_institution(institution)
+    total = dataset.count(institution)
+    
+    if limit is None and cursor is None:
+        return students_response(
+            list(dataset.iter_students(institution)),
+            total_count=total,
+            message=f"Retrieved {total} students"
+        )
+    
+    start = decode_cursor(cursor) if cursor else 0
+    stop = start + (limit or MAX_PAGE_SIZE)
+    page = list(dataset.iter_range(start, stop, institution))
+    
+    return students_response(
+        page,
+        total_count=total,
+        message=f"Retrieved {len(page)} of {total} students",
+        next_cursor=encode_cursor(stop) if stop < total else None
     )
 
-@app.get("/search/roll/{roll_no}", response_model=StudentResponse)
-async def search_by_roll_number(roll_no: str):
+@app.get("/students/stream")
+async def stream_all_students(
+    institution: Optional[str] = Query(None, description="Limit to one institution")
+):
+    """Stream all students as newline-delimited JSON"""
+    # Take the shards now so an upload mid-stream can't mix two versions of one
+    shards = dataset.scope(scoped_institution(institution))
+    
+    def generate():
+        lines = []
+        for student in (student for _, shard in shards for student in shard.store):
+            lines.append(json.dumps(student, ensure_ascii=False))
+            if len(lines) >= STREAM_CHUNK_ROWS:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/search/roll/{roll_no:path}", response_model=StudentResponse)
+async def search_by_roll_number(roll_no: str, institution: Optional[str] = None):
     """Search student by roll number"""
-    global students_data
-    
-    for student in students_data:
-        if student["Rno"].upper() == roll_no.upper():
-            return StudentResponse(
-                success=True,
-                data=Student(**student),
-                message="Student found"
-            )
+    student = dataset.find_by_roll(roll_no, scoped_institution(institution))
     
-    return StudentResponse(
-        success=False,
-        message=f"Student with roll number {roll_no} not found"
-    )
+    if student is not None:
+        return student_response(student, "Student found")
+    
+    return student_response(None, f"Student with roll number {roll_no} not found")
 
 @app.get("/search/application/{application_no}", response_model=StudentResponse)
-async def search_by_application_number(application_no: str):
+async def search_by_application_number(application_no: str, institution: Optional[str] = None):
     """Search student by application number"""
-    global students_data
-    
-    for student in students_data:
-        if student["Jno"] == application_no:
-            return StudentResponse(
-                success=True,
-                data=Student(**student),
-                message="Student found"
-            )
+    student = dataset.find_by_application(application_no, scoped_institution(institution))
     
-    return StudentResponse(
-        success=False,
-        message=f"Student with application number {application_no} not found"
-    )
+    if student is not None:
+        return student_response(student, "Student found")
+    
+    return student_response(None, f"Student with application number {application_no} not found")
 
 @app.get("/search/name/{name}", response_model=StudentsListResponse)
-async def search_by_name(name: str):
+async def search_by_name(name: str, institution: Optional[str] = None):
     """Search students by name (partial match)"""
-    global students_data
-    
-    matching_students = []
-    name_lower = name.lower()
+    institution = scoped_institution(institution)
+    matching_students = dataset.search(name, fields=("CN",), institution=institution)
     
-    for student in students_data:
-        if name_lower in student["CN"].lower():
-            matching_students.append(Student(**student))
-    
-    return StudentsListResponse(
-        success=True,
-        data=matching_students,
+    return students_response(
+        matching_students,
         total_count=len(matching_students),
         message=f"Found {len(matching_students)} students matching '{name}'"
     )
 
+@app.get("/search/fuzzy/{name}", response_model=FuzzySearchResponse)
+async def fuzzy_search_by_name(
+    name: str,
+    limit: int = Query(FUZZY_SEARCH_LIMIT, ge=1, le=100),
+    threshold: float = Query(FUZZY_SEARCH_THRESHOLD, ge=0, le=1),
+    institution: Optional[str] = None
+):
+    """Search students by name, tolerating typos and spelling variants; best matches first"""
+    institution = scoped_institution(institution)
+    matches = dataset.fuzzy_search(name, limit, threshold, institution)
+    matching_students = [{**student, "score": score} for student, score in matches]
+    
+    return JSONResponse({
+        "success": True,
+        "data": matching_students,
+        "total_count": len(matching_students),
+        "message": f"Found {len(matching_students)} students similar to '{name}'"
+    })
+
 @app.get("/search", response_model=StudentsListResponse)
-async def search_all(query: str, search_type: str = "all"):
+async def search_all(query: str, search_type: str = "all", institution: Optional[str] = None):
     """Search students across all fields"""
-    global students_data
-    
-    matching_students = []
-    query_lower = query.lower()
+    fields = SEARCH_FIELDS if search_type == "all" else (search_type,)
+    institution = scoped_institution(institution)
     
-    for student in students_data:
-        match_found = False
-        
-        if search_type == "all" or search_type == "Rno":
-            if query_lower in student["Rno"].lower():
-                match_found = True
-        
-        if search_type == "all" or search_type == "Jno":
-            if query_lower in student["Jno"].lower():
-                match_found = True
-        
-        if search_type == "all" or search_type == "CN":
-            if query_lower in student["CN"].lower():
-                match_found = True
-        
-        if search_type == "all" or search_type == "B":
-            if query_lower in student["B"].lower():
-                match_found = True
-        
-        if search_type == "all" or search_type == "Sec":
-            if query_lower in student["Sec"].lower():
-                match_found = True
-        
-        if match_found:
-            matching_students.append(Student(**student))
+    matching_students = dataset.search(query, fields=fields, institution=institution)
     
-    return StudentsListResponse(
-        success=True,
-        data=matching_students,
+    return students_response(
+        matching_students,
         total_count=len(matching_students),
         message=f"Found {len(matching_students)} students matching '{query}'"
     )
 
-@app.post("/upload/pdf")
-async def upload_pdf(file: UploadFile = File(...), column_mapping: str = None):
-    """Upload and process PDF file to extract student data"""
-    global students_data
+@app.post("/verify", response_model=VerifyResponse)
+async def verify_batch(request: VerifyRequest, institution: Optional[str] = None):
+    """Look up a batch of roll and application numbers in one request"""
+    if len(request.Rno) + len(request.Jno) > MAX_VERIFY_KEYS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_VERIFY_KEYS} keys can be verified per request")
+    institution = scoped_institution(institution)
+    
+    results = {}
+    for field, keys in (("Rno", request.Rno), ("Jno", request.Jno)):
+        found = dataset.find_many(keys, field, institution)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        results[field] = {"found": found, "missing": missing}
     
-    if not file.filename.endswith('.pdf'):
+    found_count = len(results["Rno"]["found"]) + len(results["Jno"]["found"])
+    missing_count = len(results["Rno"]["missing"]) + len(results["Jno"]["missing"])
+    return JSONResponse({
+        "success": True,
+        **results,
+        "found_count": found_count,
+        "missing_count": missing_count,
+        "message": f"Found {found_count} of {found_count + missing_count} keys"
+    })
+
+@app.post("/upload/pdf", status_code=202, openapi_extra=upload_openapi("PDF with the student table"))
+async def upload_pdf(
+    request: Request,
+    column_mapping: str = None,
+    workers: Optional[int] = Query(None, ge=0, description="Processes to parse pages in (0 = one per CPU), capped at the CPU count"),
+    method: Optional[str] = Query(None, pattern="^(tables|template)$", description="Page layout: table detection on every page, or a column template learned from the first"),
+    institution: Optional[str] = Query(None, description="Institution shard to merge into"),
+    replace: bool = Query(False, description="Replace the institution's students instead of merging by roll number")
+):
+    """Upload a PDF and queue a background job that merges the student data into an institution"""
+    # The body is parsed as it arrives, so the name is checked before any content is read
+    upload = await StreamedUpload(request).open()
+    if not upload.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
+    institution = upload_institution(institution)
     
-    # Save uploaded file temporarily
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Write the upload to a unique temporary path as it streams in; the job removes it when done
+    temp_path = await spool_upload(upload, suffix=".pdf")
     
-    try:
-        # Parse column mapping if provided
-        mapping = None
-        if column_mapping:
-            try:
-                mapping = json.loads(column_mapping)
-            except json.JSONDecodeError:
-                raise HTTPException(status_code=400, detail="Invalid column mapping format")
-        
-        # Extract data from PDF
-        extracted_students = converter.extract_data_from_pdf(temp_path, mapping)
-        
-        if extracted_students:
-            # Update global data
-            students_data = extracted_students
-            
-            # Save to JSON file
-            converter.save_to_json(extracted_students, "students_data.json")
+    # Parse column mapping if provided, as a query parameter or a form field
+    mapping = None
+    column_mapping = column_mapping or upload.fields.get("column_mapping")
+    if column_mapping:
+        try:
+            mapping = json.loads(column_mapping)
+        except json.JSONDecodeError:
+            os.remove(temp_path)
+            raise HTTPException(status_code=400, detail="Invalid column mapping format")
+    
+    extract_workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    extract_workers = min(extract_workers, os.cpu_count() or 1)
+    
+    def extract(job):
+        """Runs on the ingest pool: parse, log the batch and rebuild the institution's shard"""
+        try:
+            students = converter.extract_data_from_pdf(
+                temp_path, mapping,
+                workers=extract_workers,
+                progress=job.report_progress,
+                method=method or PDF_EXTRACT_METHOD
+            )
+            if not students:
+                return None
             
-            return {
-                "success": True,
-                "message": f"Successfully processed PDF and extracted {len(extracted_students)} students",
-                "students_count": len(extracted_students)
-            }
-        else:
-            return {
+            start = time.perf_counter()
+            shard = dataset.commit(changelog, REPLACE if replace else UPSERT, institution, students=students)
+            record_stage("commit", time.perf_counter() - start)
+            return len(students), shard
+        finally:
+            # Clean up temporary file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def publish(job, outcome):
+        """Runs on the event loop: report the outcome and compact if due"""
+        if outcome is None:
+            job.result = {
                 "success": False,
                 "message": "No student data found in the PDF"
             }
+            return
+        
+        count, shard = outcome
+        maybe_compact()
+        job.result = {
+            "success": True,
+            "message": f"Successfully processed PDF and extracted {count} students",
+            "students_count": count,
+            "institution": institution,
+            "institution_count": len(shard),
+            "merkle_root": shard.merkle.root
+        }
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    job = Job(upload.filename)
+    try:
+        ingest_jobs.submit(job, extract, publish)
+    except JobQueueFull as e:
+        os.remove(temp_path)
+        raise HTTPException(status_code=503, detail=str(e))
     
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "message": f"PDF queued for processing as job {job.id}"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get progress and outcome of a PDF ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job.to_dict()
+
+async def spool_pdf(request: Request) -> str:
+    """Stream an uploaded PDF to a temporary file; the caller removes it"""
+    upload = await StreamedUpload(request).open()
+    if not upload.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    return await spool_upload(upload, suffix=".pdf")
+
+@app.post("/pdf-preview", openapi_extra=upload_openapi("PDF to sample"))
+async def pdf_preview(
+    request: Request,
+    pages: int = Query(PREVIEW_PAGES, ge=1, le=20, description="Most pages to analyze"),
+    rows: int = Query(PREVIEW_ROWS, ge=0, le=100, description="Sample rows to return")
+):
+    """Header, sample rows and a suggested column mapping from the first pages of a PDF"""
+    temp_path = await spool_pdf(request)
+    try:
+        preview = await run_in_threadpool(converter.preview_pdf, temp_path, pages, rows)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading PDF: {str(e)}")
     finally:
-        # Clean up temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        os.remove(temp_path)
+    
+    return {
+        "success": True,
+        **preview,
+        "message": f"Found {len(preview['columns'])} columns in the first {preview['pages_scanned']} of {preview['page_count']} pages"
+    }
 
-@app.get("/pdf-columns/{filename}")
-async def get_pdf_columns(filename: str):
+@app.post("/pdf-columns", openapi_extra=upload_openapi("PDF to read the column headers of"))
+async def get_pdf_columns(request: Request):
     """Get column headers from PDF for mapping"""
+    temp_path = await spool_pdf(request)
     try:
-        # Check if file exists in temp directory
-        temp_path = f"temp_{filename}"
-        if not os.path.exists(temp_path):
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        columns = converter.get_pdf_columns(temp_path)
-        return {
-            "success": True,
-            "columns": columns,
-            "message": f"Found {len(columns)} columns in PDF"
-        }
+        columns = await run_in_threadpool(converter.get_pdf_columns, temp_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading PDF columns: {str(e)}")
-
-@app.post("/upload/json")
-async def upload_json(file: UploadFile = File(...)):
-    """Upload JSON file with student data"""
-    global students_data
+    finally:
+        os.remove(temp_path)
     
-    if not file.filename.endswith('.json'):
+    return {
+        "success": True,
+        "columns": columns,
+        "message": f"Found {len(columns)} columns in PDF"
+    }
+
+@app.post("/upload/json", openapi_extra=upload_openapi("JSON array of student records"))
+async def upload_json(
+    request: Request,
+    institution: Optional[str] = Query(None, description="Institution shard to merge into"),
+    replace: bool = Query(False, description="Replace the institution's students instead of merging by roll number")
+):
+    """Upload JSON file with student data, merged into an institution by roll number"""
+    upload = await StreamedUpload(request).open()
+    if not upload.filename.endswith('.json'):
         raise HTTPException(status_code=400, detail="File must be a JSON file")
+    institution = upload_institution(institution)
+    
+    # The array is split and validated element by element as it streams in, and
+    # valid records are committed in batches, so memory is bounded by the batch
+    # size rather than the file. Records are validated here, once: the store keeps
+    # exactly the Student fields as strings, so responses can be encoded without models
+    splitter = JsonArraySplitter()
+    students: List[Dict[str, str]] = []
+    invalid: List[Dict] = []
+    invalid_count = 0
+    stored = 0
+    shard = None
+    op = REPLACE if replace else UPSERT
+    # A replace is staged in a columnar store and committed as one batch once
+    # the whole array has parsed, so a malformed file never leaves the
+    # institution half replaced
+    staged = StudentStore() if replace else None
+    
+    def parse(chunk: bytes, final: bool = False) -> int:
+        first = splitter.count
+        try:
+            texts = splitter.close() if final else splitter.feed(chunk)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={
+                "message": f"Invalid JSON array: {e}",
+                "students_count": stored  # Records committed before the error
+            })
+        return validate_elements(texts, first, students, invalid)
+    
+    async def commit(batch):
+        nonlocal shard, stored
+        # Update the institution's shard and indexes, then log the batch. Both
+        # block (dataset lock, fsync), so they run off the event loop
+        shard = await run_in_threadpool(dataset.commit, changelog, op, institution, students=batch)
+        stored += len(batch)
+    
+    async def flush():
+        batch = students.copy()
+        students.clear()
+        if staged is not None:
+            staged.extend(batch)
+        else:
+            await commit(batch)
     
     try:
-        content = await file.read()
-        json_data = json.loads(content.decode('utf-8'))
+        async for chunk in upload.chunks():
+            invalid_count += await run_in_threadpool(parse, chunk)
+            if len(students) >= JSON_UPLOAD_BATCH_SIZE:
+                await flush()
+        invalid_count += await run_in_threadpool(parse, b"", True)
+        if students:
+            await flush()
+        if staged is not None:
+            await commit(staged)
+        elif shard is None:
+            await commit([])
+        maybe_compact()
         
-        # Validate data structure
-        if isinstance(json_data, list):
-            # Update global data
-            students_data = json_data
-            
-            # Save to file
-            converter.save_to_json(json_data, "students_data.json")
-            
-            return {
-                "success": True,
-                "message": f"Successfully uploaded JSON with {len(json_data)} students",
-                "students_count": len(json_data)
-            }
-        else:
-            raise HTTPException(status_code=400, detail="JSON must contain an array of student objects")
+        message = f"Successfully uploaded JSON with {stored} students"
+        if invalid_count:
+            message += f"; skipped {invalid_count} invalid records"
+        return {
+            "success": True,
+            "message": message,
+            "students_count": stored,
+            "invalid_count": invalid_count,
+            "invalid_records": invalid,
+            "institution": institution,
+            "institution_count": len(shard),
+            "merkle_root": shard.merkle.root
+        }
     
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON format")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing JSON: {str(e)}")
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters and size of the PDF extraction cache"""
+    return converter.cache.stats()
+
+@app.get("/merkle/root")
+async def get_merkle_root(institution: Optional[str] = None):
+    """Get the Merkle root over each institution's student records"""
+    shards = dataset.scope(scoped_institution(institution))
+    return {
+        "success": True,
+        "roots": {name: {"root": shard.merkle.root, "leaf_count": len(shard.merkle)} for name, shard in shards}
+    }
+
+@app.get("/merkle/proof", response_model=MerkleProofResponse)
+async def get_merkle_proof(roll_no: str, institution: Optional[str] = None):
+    """Get the inclusion proof of a student's record in its institution's Merkle tree"""
+    located = dataset.locate_roll(roll_no, scoped_institution(institution))
+    if located is None:
+        return MerkleProofResponse(
+            success=False,
+            message=f"Student with roll number {roll_no} not found"
+        )
+    
+    name, shard, row_id = located
+    tree = shard.merkle
+    return JSONResponse({
+        "success": True,
+        "data": shard.store[row_id],
+        "institution": name,
+        "leaf_index": row_id,
+        "leaf": tree.leaf(row_id),
+        "proof": tree.proof(row_id),
+        "root": tree.root,
+        "message": "Proof generated"
+    })
+
+@app.get("/merkle/consistency")
+async def get_merkle_consistency(
+    first_size: int = Query(..., ge=0, description="Leaf count of the earlier tree"),
+    institution: str = Query(DEFAULT_INSTITUTION, description="Institution whose tree to prove")
+):
+    """Get a proof that an institution's tree at an earlier size is a prefix of its current tree"""
+    shard = dataset.get(institution)
+    if shard is None:
+        raise HTTPException(status_code=404, detail=f"Institution '{institution}' not found")
+    
+    tree = shard.merkle
+    if first_size > len(tree):
+        raise HTTPException(status_code=400, detail=f"first_size is larger than the tree ({len(tree)} leaves)")
+    return {
+        "success": True,
+        "institution": institution,
+        "first_size": first_size,
+        "second_size": len(tree),
+        "proof": tree.consistency_proof(first_size),
+        "root": tree.root
+    }
+
+@app.post("/merkle/verify")
+async def verify_merkle_proof(request: MerkleVerifyRequest):
+    """Check a student record against a Merkle proof and root"""
+    leaf = leaf_hash(request.student.model_dump()).hex()
+    valid = verify_proof(leaf, [step.model_dump() for step in request.proof], request.root)
+    return {
+        "success": True,
+        "valid": valid,
+        "leaf": leaf,
+        "message": "Record is included under this root" if valid else "Record does not match this root"
+    }
+
+@app.get("/institutions")
+async def get_institutions():
+    """List the institutions with their student counts"""
+    institutions = dataset.institutions()
+    return {
+        "success": True,
+        "institutions": institutions,
+        "total_count": sum(institutions.values())
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request latency, requests in flight and PDF extraction stage timings in Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/cache/responses")
+async def get_response_cache_stats():
+    """Get hit/miss counters and size of the read response cache"""
+    return {**response_cache.stats(), "dataset_version": dataset.version}
+
 @app.get("/stats")
-async def get_stats():
+async def get_stats(institution: Optional[str] = None):
     """Get statistics about the student data"""
-    global students_data
+    stats = dataset.stats(scoped_institution(institution))
     
-    if not students_data:
+    if not stats["total_students"]:
         return {
-            "total_students": 0,
-            "branches": {},
-            "sections": {},
+            **stats,
             "message": "No student data available"
         }
     
-    # Count by branch
-    branches = {}
-    sections = {}
-    
-    for student in students_data:
-        branch = student.get("B", "Unknown")
-        section = student.get("Sec", "Unknown")
-        
-        branches[branch] = branches.get(branch, 0) + 1
-        sections[section] = sections.get(section, 0) + 1
-    
     return {
-        "total_students": len(students_data),
-        "branches": branches,
-        "sections": sections,
+        **stats,
         "message": "Statistics retrieved successfully"
     }
 
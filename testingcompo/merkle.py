@@ -0,0 +1,256 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from student_store import StudentStore, STUDENT_FIELDS
+
+HASH_SIZE = 32
+
+# Domain separation (as in RFC 6962) so a leaf can never be passed off as a node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def canonical_values(values: Sequence[str]) -> bytes:
+    """
+    Canonical encoding of a student's field values (in STUDENT_FIELDS order):
+    a compact UTF-8 JSON array, e.g. ["24/A01/001","240310038495","AADIT MOGHA","CS","Sec-1"]
+    """
+    joined = '","'.join(values)
+    # Values without quotes, backslashes or control characters need no escaping,
+    # so the array can be written directly; json.dumps gives the same bytes
+    if joined.isprintable() and joined.count('"') == 2 * (len(values) - 1) and "\\" not in joined:
+        return f'["{joined}"]'.encode("utf-8")
+    return json.dumps(list(values), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def canonical_student(student: Dict[str, Any]) -> bytes:
+    return canonical_values([str(student.get(field, "")) for field in STUDENT_FIELDS])
+
+
+def leaf_hash(student: Dict[str, Any]) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + canonical_student(student)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def _parent_level(level: bytes, size: int) -> bytearray:
+    """
+    Hash pairs of nodes into the level above; an odd last node is promoted as is
+    """
+    sha256 = hashlib.sha256
+    parent = bytearray()
+    for offset in range(0, (size - 1) * HASH_SIZE, 2 * HASH_SIZE):
+        parent += sha256(NODE_PREFIX + level[offset:offset + 2 * HASH_SIZE]).digest()
+    if size % 2:
+        parent += level[(size - 1) * HASH_SIZE:size * HASH_SIZE]
+    return parent
+
+
+class MerkleTree:
+    """
+    SHA-256 Merkle tree over a store's rows, one leaf per row in row order
+
+    Every level is kept as one bytearray of 32-byte hashes, so proofs are
+    read straight from the levels and changing a few leaves only rehashes
+    their paths to the root. Trees are never modified in place: updated()
+    copies the levels, so readers of the old tree are not affected.
+    """
+
+    def __init__(self, levels: Optional[List[bytearray]] = None):
+        self.levels = levels or [bytearray()]
+
+    @classmethod
+    def build(cls, store: StudentStore) -> "MerkleTree":
+        sha256 = hashlib.sha256
+        leaves = bytearray()
+        # Read the columns directly rather than building a dict per row
+        for values in zip(*(store.column(field) for field in STUDENT_FIELDS)):
+            leaves += sha256(LEAF_PREFIX + canonical_values(values)).digest()
+        return cls.from_leaves(leaves)
+
+    @classmethod
+    def from_leaves(cls, leaves: bytearray) -> "MerkleTree":
+        levels = [leaves]
+        size = len(leaves) // HASH_SIZE
+        while size > 1:
+            levels.append(_parent_level(bytes(levels[-1]), size))
+            size = (size + 1) // 2
+        return cls(levels)
+
+    def __len__(self) -> int:
+        return len(self.levels[0]) // HASH_SIZE
+
+    @property
+    def root(self) -> str:
+        if not len(self):
+            return EMPTY_ROOT
+        return bytes(self.levels[-1][:HASH_SIZE]).hex()
+
+    def leaf(self, index: int) -> str:
+        return bytes(self.levels[0][index * HASH_SIZE:(index + 1) * HASH_SIZE]).hex()
+
+    def proof(self, index: int) -> List[Dict[str, str]]:
+        """
+        Sibling hashes from the leaf up to the root, each with the side it sits on
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        proof = []
+        for level in self.levels[:-1]:
+            size = len(level) // HASH_SIZE
+            sibling = index ^ 1
+            if sibling < size:
+                proof.append({
+                    "hash": bytes(level[sibling * HASH_SIZE:(sibling + 1) * HASH_SIZE]).hex(),
+                    "position": "left" if sibling < index else "right",
+                })
+            index //= 2
+        return proof
+
+    def _range_hash(self, start: int, end: int) -> bytes:
+        """
+        Hash of the subtree over leaves [start, end), split as in RFC 6962
+        """
+        size = end - start
+        depth = (size - 1).bit_length()
+        # A node of the levels covers it when aligned, possibly cut short by the tree's end
+        if start % (1 << depth) == 0 and (size == 1 << depth or end == len(self)):
+            level = self.levels[depth]
+            return bytes(level[(start >> depth) * HASH_SIZE:((start >> depth) + 1) * HASH_SIZE])
+        split = 1 << (depth - 1)
+        return node_hash(self._range_hash(start, start + split), self._range_hash(start + split, end))
+
+    def consistency_proof(self, first_size: int) -> List[str]:
+        """
+        Hashes proving that the tree of the first first_size leaves is a
+        prefix of this tree (RFC 9162, section 2.1.4)
+
+        Leaves replaced in place since then make the proof fail, which is
+        what it is meant to detect.
+        """
+        if not 0 <= first_size <= len(self):
+            raise IndexError(first_size)
+        if first_size in (0, len(self)):
+            return []
+
+        # SUBPROOF unrolled: narrow [start, end) down to the subtree ending at
+        # the old size, collecting the sibling subtree hashes on the way
+        proof = []
+        start, end, remaining, complete = 0, len(self), first_size, True
+        while remaining != end - start:
+            split = 1 << (end - start - 1).bit_length() - 1
+            if remaining <= split:
+                proof.append(self._range_hash(start + split, end))
+                end = start + split
+            else:
+                proof.append(self._range_hash(start, start + split))
+                start += split
+                remaining -= split
+                complete = False
+        if not complete:
+            proof.append(self._range_hash(start, end))
+        return [digest.hex() for digest in reversed(proof)]
+
+    def updated(self, leaves: Dict[int, bytes], leaf_count: int) -> "MerkleTree":
+        """
+        Return a tree with some leaves replaced or appended, rehashing only their paths
+
+        leaves maps row index to leaf hash and must include every index from
+        the current length up to leaf_count. The tree cannot shrink; rebuild
+        it instead.
+        """
+        if leaf_count < len(self):
+            raise ValueError("MerkleTree.updated() cannot remove leaves")
+
+        level = bytearray(self.levels[0])
+        level.extend(bytes((leaf_count - len(self)) * HASH_SIZE))
+        for index, digest in leaves.items():
+            level[index * HASH_SIZE:(index + 1) * HASH_SIZE] = digest
+
+        levels = [level]
+        dirty = sorted(leaves)
+        size = leaf_count
+        depth = 0
+        while size > 1:
+            parent_size = (size + 1) // 2
+            old = self.levels[depth + 1] if depth + 1 < len(self.levels) else b""
+            parent = bytearray(old[:parent_size * HASH_SIZE])
+            parent.extend(bytes(parent_size * HASH_SIZE - len(parent)))
+
+            parents = sorted({index // 2 for index in dirty})
+            for index in parents:
+                left = 2 * index * HASH_SIZE
+                if 2 * index + 1 < size:
+                    digest = node_hash(level[left:left + HASH_SIZE], level[left + HASH_SIZE:left + 2 * HASH_SIZE])
+                else:
+                    digest = level[left:left + HASH_SIZE]
+                parent[index * HASH_SIZE:(index + 1) * HASH_SIZE] = digest
+
+            levels.append(parent)
+            level, dirty, size = parent, parents, parent_size
+            depth += 1
+
+        return MerkleTree(levels)
+
+
+def verify_proof(leaf: str, proof: Iterable[Dict[str, str]], root: str) -> bool:
+    """
+    Check that a leaf hash (hex) is included in the tree with the given root
+    """
+    try:
+        digest = bytes.fromhex(leaf)
+        for step in proof:
+            sibling = bytes.fromhex(step["hash"])
+            digest = node_hash(sibling, digest) if step["position"] == "left" else node_hash(digest, sibling)
+    except (KeyError, TypeError, ValueError):
+        return False
+    return digest.hex() == root
+
+
+def verify_consistency(first_size: int, second_size: int, first_root: str, second_root: str,
+                       proof: Sequence[str]) -> bool:
+    """
+    Check that the tree with first_root over first_size leaves is a prefix
+    of the tree with second_root over second_size leaves (RFC 9162, section 2.1.4.2)
+    """
+    try:
+        path = [bytes.fromhex(digest) for digest in proof]
+        first_hash, second_hash = bytes.fromhex(first_root), bytes.fromhex(second_root)
+    except (TypeError, ValueError):
+        return False
+
+    if not 0 <= first_size <= second_size:
+        return False
+    if first_size == second_size:
+        return not path and first_root == second_root
+    if first_size == 0:
+        return not path
+    if not path:
+        return False
+
+    if first_size & (first_size - 1) == 0:
+        path.insert(0, first_hash)
+    fn, sn = first_size - 1, second_size - 1
+    while fn & 1:
+        fn, sn = fn >> 1, sn >> 1
+
+    fr = sr = path[0]
+    for digest in path[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr, sr = node_hash(digest, fr), node_hash(digest, sr)
+            if not fn & 1:
+                while fn and not fn & 1:
+                    fn, sn = fn >> 1, sn >> 1
+        else:
+            sr = node_hash(sr, digest)
+        fn, sn = fn >> 1, sn >> 1
+
+    return fr == first_hash and sr == second_hash and sn == 0
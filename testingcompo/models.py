@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, field_validator
+from typing import Dict, List, Optional
 
 class Student(BaseModel):
     Rno: str  # Roll Number
@@ -8,6 +8,14 @@ class Student(BaseModel):
     B: str    # Branch
     Sec: str  # Section
 
+    @field_validator("Rno", "Jno", "CN", "B", "Sec", mode="before")
+    @classmethod
+    def numbers_as_text(cls, value):
+        # Roll and application numbers are often exported as JSON numbers
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return value
+
 class StudentResponse(BaseModel):
     success: bool
     data: Optional[Student] = None
@@ -18,6 +26,51 @@ class StudentsListResponse(BaseModel):
     data: List[Student]
     total_count: int
     message: Optional[str] = None
+    next_cursor: Optional[str] = None  # Set when more pages are available
+
+class ScoredStudent(Student):
+    score: float  # Similarity to the query, 0-1
+
+class FuzzySearchResponse(BaseModel):
+    success: bool
+    data: List[ScoredStudent]
+    total_count: int
+    message: Optional[str] = None
+
+class VerifyRequest(BaseModel):
+    Rno: List[str] = []  # Roll numbers to look up
+    Jno: List[str] = []  # Application numbers to look up
+
+class VerifyResult(BaseModel):
+    found: Dict[str, Student]  # Requested key -> matching student
+    missing: List[str]
+
+class VerifyResponse(BaseModel):
+    success: bool
+    Rno: VerifyResult
+    Jno: VerifyResult
+    found_count: int
+    missing_count: int
+    message: Optional[str] = None
+
+class MerkleProofStep(BaseModel):
+    hash: str      # Sibling hash (hex)
+    position: str  # "left" or "right" of the running hash
+
+class MerkleProofResponse(BaseModel):
+    success: bool
+    data: Optional[Student] = None
+    institution: Optional[str] = None
+    leaf_index: Optional[int] = None
+    leaf: Optional[str] = None  # Leaf hash (hex)
+    proof: List[MerkleProofStep] = []
+    root: Optional[str] = None
+    message: Optional[str] = None
+
+class MerkleVerifyRequest(BaseModel):
+    student: Student
+    proof: List[MerkleProofStep]
+    root: str
 
 class SearchRequest(BaseModel):
     query: str
@@ -1,55 +1,477 @@
 import json
+import os
 import re
-from typing import List, Dict, Any, Optional
-import pdfplumber
-import pandas as pd
+import time
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from pathlib import Path
+from atomic_file import atomic_write
+from student_store import StudentStore
+from extraction_cache import ExtractionCache
+from snapshot import SNAPSHOT_SUFFIX, SnapshotStore, write_snapshot
+from metrics import REGISTRY
+
+# Time spent in each step of turning a PDF into saved records. Per page:
+# page_objects (parsing the page's characters and lines), page_tables,
+# page_text (only for pages without tables), page_template (slicing words with
+# a learned column template) and mapping; per file: open and save
+EXTRACTION_STAGE_SECONDS = REGISTRY.histogram(
+    "pdf_extraction_stage_seconds",
+    "Time spent in each PDF extraction stage",
+    ["stage"]
+)
+
+# "tables" runs table detection on every page; "template" learns the column
+# layout from the first page's table and slices later pages by word position
+EXTRACTION_METHODS = ("tables", "template")
+
+# Pages a preview (and column discovery) looks at, and sample rows it returns
+PREVIEW_PAGES = 3
+PREVIEW_ROWS = 5
+
+# Patterns of the values of each student field, used to suggest which PDF
+# column holds it. Fields are assigned in this order, most specific first, so
+# the loose name pattern only picks among the columns left over
+FIELD_PATTERNS = {
+    "Rno": re.compile(r"\d{2}/[A-Z]\d{2}/\d{3,}"),
+    "Jno": re.compile(r"[A-Z]{0,4}\d{8,}"),
+    "Sec": re.compile(r"(?i)sec(tion)?[- ]?\w{1,3}"),
+    "B": re.compile(r"[A-Z]{2,4}"),
+    "CN": re.compile(r"[^\W\d_][^\W\d_.' -]*(?:[.' -]+[^\W\d_]+)*\.?"),
+}
+
+# Header words that point at each field, in student field order
+FIELD_HEADER_WORDS = {
+    "Rno": ("roll",),
+    "Jno": ("application", "jac", "jee"),
+    "CN": ("name", "candidate"),
+    "B": ("branch", "course"),
+    "Sec": ("section",),
+}
+
+# Share of sample values that must match a field's pattern (a matching header
+# word counts for half) before a column is suggested for it
+MIN_MAPPING_SCORE = 0.5
+
+def record_stage(stage: str, seconds: float):
+    """Record one extraction stage timing"""
+    EXTRACTION_STAGE_SECONDS.observe(seconds, stage)
+
+def _cell_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+def suggest_column_mapping(header: List[str], rows: List[List[str]]) -> Dict[str, int]:
+    """
+    Suggest the PDF column index of each student field from sample rows
+    
+    A column scores the share of its non-empty sample values that match the
+    field's pattern, plus 0.5 when its header names the field. Each field
+    takes the best scoring column still free; fields whose best score is
+    under MIN_MAPPING_SCORE are left out.
+    """
+    width = max([len(header)] + [len(row) for row in rows])
+    column_values = [[_cell_text(row[index]) for row in rows if index < len(row) and row[index]]
+                     for index in range(width)]
+    
+    mapping = {}
+    for field, pattern in FIELD_PATTERNS.items():
+        best_score, best_column = 0.0, None
+        for index, values in enumerate(column_values):
+            if index in mapping.values():
+                continue
+            score = sum(1 for value in values if pattern.fullmatch(value)) / len(values) if values else 0.0
+            title = header[index].lower() if index < len(header) else ""
+            if any(word in title for word in FIELD_HEADER_WORDS[field]):
+                score += 0.5
+            if score > best_score:
+                best_score, best_column = score, index
+        if best_score >= MIN_MAPPING_SCORE:
+            mapping[field] = best_column
+    
+    return {field: mapping[field] for field in FIELD_HEADER_WORDS if field in mapping}
+
+class ColumnTemplate:
+    """
+    Column layout of an enrollment list, learned from the header row of the
+    table on its first page
+    
+    Every page of such a list repeats the same columns, so later pages do not
+    need table detection: their characters are grouped into lines by position
+    and each character goes to the column whose x-range holds its centre.
+    Text in one column stays together, so multi-word names are kept whole. A
+    line with an empty first column continues the cells of the line above (a
+    wrapped name).
+    """
+    
+    # Characters whose tops are this close (in points) are on the same line,
+    # and a wider horizontal gap than this between two of them is a space
+    LINE_TOLERANCE = 3
+    WORD_GAP = 3
+    
+    def __init__(self, header: List[str], boundaries: List[float]):
+        self.header = header
+        self.boundaries = boundaries
+    
+    @classmethod
+    def from_table(cls, table) -> Optional["ColumnTemplate"]:
+        """
+        Learn the template from a pdfplumber Table, or None when its header
+        row has no cells
+        """
+        texts = table.extract()[0]
+        columns = [(cell, text) for cell, text in zip(table.rows[0].cells, texts) if cell is not None]
+        if not columns:
+            return None
+        boundaries = [cell[0] for cell, _ in columns] + [columns[-1][0][2]]
+        return cls([_cell_text(text) for _, text in columns], boundaries)
+    
+    def slice_page(self, page) -> List[List[str]]:
+        """
+        Return the data rows of a page laid out like the template, or [] when
+        the table cannot be located on the page
+        
+        Only the table region is read: the template's columns, from this
+        page's header row (or, on pages that do not repeat the header, the
+        topmost ruling line across the columns) down to the lowest ruling
+        line below it (or the page bottom on pages without ruling). Repeated
+        header rows are dropped.
+        """
+        x0, x1 = self.boundaries[0], self.boundaries[-1]
+        rulings = [edge["top"] for edge in page.horizontal_edges if edge["x0"] < x1 and edge["x1"] > x0]
+        chars = [char for char in page.chars if x0 <= (char["x0"] + char["x1"]) / 2 < x1]
+        
+        lines = []
+        for char in sorted(chars, key=lambda char: char["top"]):
+            if lines and char["top"] - lines[-1][0]["top"] <= self.LINE_TOLERANCE:
+                lines[-1].append(char)
+            else:
+                lines.append([char])
+        cells = [self._line_cells(line) for line in lines]
+        
+        # The table starts at its header, or at its top ruling line when the
+        # page does not repeat the header; without either it is not found
+        top = next((line[0]["top"] for line, row in zip(lines, cells) if row == self.header), None)
+        if top is None:
+            if not rulings:
+                return []
+            top = min(rulings) - self.LINE_TOLERANCE
+        bottom = max((ruling for ruling in rulings if ruling > top), default=page.bbox[3])
+        
+        rows = []
+        for line, row in zip(lines, cells):
+            if line[0]["top"] < top or max(char["bottom"] for char in line) > bottom or row == self.header:
+                continue
+            if not row[0]:
+                if rows:
+                    rows[-1] = [" ".join(filter(None, pair)) for pair in zip(rows[-1], row)]
+                continue
+            rows.append(row)
+        
+        return rows
+    
+    def _line_cells(self, line) -> List[str]:
+        """
+        Split one line of characters into the template's columns
+        """
+        last_column = len(self.header) - 1
+        cells = [[] for _ in self.header]
+        ends = [None] * len(self.header)
+        for char in sorted(line, key=lambda char: char["x0"]):
+            column = min(max(bisect_right(self.boundaries, (char["x0"] + char["x1"]) / 2) - 1, 0), last_column)
+            if ends[column] is not None and char["x0"] - ends[column] > self.WORD_GAP:
+                cells[column].append(" ")
+            cells[column].append(char["text"])
+            ends[column] = char["x1"]
+        return [_cell_text("".join(text)) for text in cells]
 
 class StudentDataConverter:
-    def __init__(self):
+    def __init__(self, cache: Optional[ExtractionCache] = None):
         self.students_data = []
+        self.cache = cache
     
-    def extract_data_from_pdf(self, pdf_path: str, column_mapping: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    def extract_data_from_pdf(self, pdf_path: str, column_mapping: Optional[Dict[str, str]] = None, workers: Optional[int] = 1,
+                              progress: Optional[Callable[[int, int, int], None]] = None,
+                              method: str = "tables") -> List[Dict[str, Any]]:
         """
         Extract student data from PDF and convert to structured format
+        
+        The raw page content comes from extract_raw_pages (and so from the
+        cache when one is configured); the column mapping is applied on top.
+        method is one of EXTRACTION_METHODS (see extract_raw_pages).
+        
+        progress, if given, is called as progress(pages_processed, pages_total, records_found).
         """
+        records_by_page: Dict[int, List[Dict[str, Any]]] = {}
+        records_found = 0
+        
+        def on_pages(first_page: int, pages: List[Dict[str, Any]], pages_total: int):
+            nonlocal records_found
+            for offset, page_content in enumerate(pages):
+                start = time.perf_counter()
+                records = self._page_records(page_content, column_mapping)
+                record_stage("mapping", time.perf_counter() - start)
+                records_by_page[first_page + offset] = records
+                records_found += len(records)
+            if progress:
+                progress(len(records_by_page), pages_total, records_found)
+        
+        pages = self.extract_raw_pages(pdf_path, workers=workers, on_pages=on_pages, method=method)
+        
+        # Merge in page order regardless of the order pages were produced in
         students = []
+        for page_index in range(len(pages)):
+            students.extend(records_by_page[page_index])
+        
+        return students
+    
+    def extract_raw_pages(self, pdf_path: str, workers: Optional[int] = 1,
+                          on_pages: Optional[Callable[[int, List[Dict[str, Any]], int], None]] = None,
+                          method: str = "tables") -> List[Dict[str, Any]]:
+        """
+        Return the raw content ({"tables", "text"}) of every page, in page order
+        
+        With method="template" the column layout is learned from the first
+        page's table and later pages are sliced by word position (see
+        ColumnTemplate) instead of running table detection on each of them.
         
+        Served from the extraction cache when the same file was seen before.
+        on_pages, if given, is called as on_pages(first_page_index, pages, pages_total)
+        whenever a run of pages becomes available.
+        """
+        if method not in EXTRACTION_METHODS:
+            raise ValueError(f"Unknown extraction method '{method}'")
+        
+        key = None
+        if self.cache is not None:
+            key = self.cache.file_digest(pdf_path)
+            if method != "tables":
+                key = f"{key}.{method}"
+            pages = self.cache.get(key)
+            if pages is not None:
+                if on_pages:
+                    on_pages(0, pages, len(pages))
+                return pages
+        
+        pages = self._analyze_pdf(pdf_path, workers, on_pages, method)
+        
+        if self.cache is not None:
+            self.cache.put(key, pages)
+        
+        return pages
+    
+    def _analyze_pdf(self, pdf_path: str, workers: Optional[int] = 1,
+                     on_pages: Optional[Callable[[int, List[Dict[str, Any]], int], None]] = None,
+                     method: str = "tables") -> List[Dict[str, Any]]:
+        """
+        Analyze every page of a PDF, serially or across worker processes
+        
+        With workers > 1 (or None for one per CPU) the pages are split into
+        contiguous slices that are parsed in separate processes; the results
+        are merged in page order and match the serial output. In template
+        mode the first page is analyzed here and its template is handed to
+        the workers.
+        """
+        # pdfplumber and multiprocessing are imported on first use so that
+        # importing the converter (API boot, wrapper startup) stays cheap
+        import pdfplumber
+        
+        # Never more processes than CPUs, whatever the caller asked for
+        cpu_count = os.cpu_count() or 1
+        if workers is None or workers < 1:
+            workers = cpu_count
+        workers = min(workers, cpu_count)
+        
+        start = time.perf_counter()
+        pages = []
+        template = None
         with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                # Extract text from page
-                text = page.extract_text()
-                
-                if text:
-                    # Try to extract table data
-                    tables = page.extract_tables()
-                    
-                    if tables:
-                        for table in tables:
-                            students.extend(self._process_table(table, column_mapping))
-                    else:
-                        # Fallback to text parsing if no tables found
-                        students.extend(self._parse_text_data(text, column_mapping))
+            page_count = len(pdf.pages)
+            record_stage("open", time.perf_counter() - start)
+            if method == "template" and page_count:
+                page_content, template = self._learn_template(pdf.pages[0])
+                if on_pages:
+                    on_pages(0, [page_content], page_count)
+                pages.append(page_content)
+            
+            first_page = len(pages)
+            workers = min(workers, page_count - first_page)
+            if workers <= 1:
+                for page in pdf.pages[first_page:]:
+                    page_content = self._analyze_page(page, template=template)
+                    if on_pages:
+                        on_pages(len(pages), [page_content], page_count)
+                    pages.append(page_content)
+                return pages
+        
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        
+        # Contiguous page slices, one per worker
+        slice_size = -(-(page_count - first_page) // workers)
+        slices = [(start, min(start + slice_size, page_count)) for start in range(first_page, page_count, slice_size)]
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_analyze_page_range, pdf_path, start, stop, template): start
+                for start, stop in slices
+            }
+            
+            # Workers time their stages locally; record them here, where /metrics is served
+            for future in as_completed(futures):
+                range_pages, timings = future.result()
+                for stage, seconds in timings:
+                    record_stage(stage, seconds)
+                if on_pages:
+                    on_pages(futures[future], range_pages, page_count)
+            
+            for future in futures:
+                pages.extend(future.result()[0])
+        
+        return pages
+    
+    def _analyze_page(self, page, record: Callable[[str, float], None] = record_stage,
+                      template: Optional[ColumnTemplate] = None, found: Optional[list] = None) -> Dict[str, Any]:
+        """
+        Analyze a page's objects once and return its raw content as
+        {"tables": [...], "text": "..."}
+        
+        pdfplumber parses the page objects once and caches them; the decisions
+        below are made from those objects so the expensive layout passes only
+        run when their result is used. Table detection needs ruling edges, so
+        it is skipped on pages without any, and the text layout is only built
+        when no table was found and the text fallback is needed.
+        
+        With a template the page is sliced into the template's columns
+        instead; table detection only runs when that yields no rows. found
+        passes tables already detected on the page, so detection does not
+        run again.
+        
+        record(stage, seconds) receives the time spent in each step.
+        """
+        start = time.perf_counter()
+        has_chars = bool(page.chars)
+        has_edges = has_chars and bool(page.edges)
+        record("page_objects", time.perf_counter() - start)
+        if not has_chars:
+            return {"tables": [], "text": ""}
+        
+        if template is not None:
+            start = time.perf_counter()
+            rows = template.slice_page(page)
+            record("page_template", time.perf_counter() - start)
+            if rows:
+                return {"tables": [[template.header] + rows], "text": ""}
+        
+        tables = []
+        if has_edges or found:
+            start = time.perf_counter()
+            tables = [table.extract() for table in (page.find_tables() if found is None else found)]
+            record("page_tables", time.perf_counter() - start)
+        
+        text = ""
+        if not tables:
+            start = time.perf_counter()
+            text = page.extract_text() or ""
+            record("page_text", time.perf_counter() - start)
+        
+        return {"tables": tables, "text": text}
+    
+    def _learn_template(self, page, record: Callable[[str, float], None] = record_stage) -> Tuple[Dict[str, Any], Optional[ColumnTemplate]]:
+        """
+        Analyze the first page with table detection and learn the column
+        template from its first table
+        
+        Returns the page content and the template, which is None when the
+        page has no table; later pages then take the table detection path.
+        """
+        start = time.perf_counter()
+        found = page.find_tables() if page.chars and page.edges else []
+        record("page_tables", time.perf_counter() - start)
+        template = ColumnTemplate.from_table(found[0]) if found else None
+        return self._analyze_page(page, record, found=found), template
+    
+    def _page_records(self, page_content: Dict[str, Any], column_mapping: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Apply the column mapping to one page's raw tables or text
+        """
+        students = []
+        
+        if page_content["tables"]:
+            for table in page_content["tables"]:
+                students.extend(self._process_table(table, column_mapping))
+        elif page_content["text"]:
+            # Fallback to text parsing if no tables found
+            students.extend(self._parse_text_data(page_content["text"], column_mapping))
         
         return students
     
     def get_pdf_columns(self, pdf_path: str) -> List[str]:
         """
         Extract column headers from PDF to help with mapping
+        
+        Only the first PREVIEW_PAGES pages are looked at (see preview_pdf).
         """
-        columns = []
+        return [cell for cell in self.preview_pdf(pdf_path, rows=0)["columns"] if cell]
+    
+    def preview_pdf(self, pdf_path: str, pages: int = PREVIEW_PAGES, rows: int = PREVIEW_ROWS) -> Dict[str, Any]:
+        """
+        Sample the first pages of a PDF for column mapping
         
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if tables:
-                    # Get the first table's header row
-                    first_table = tables[0]
-                    if first_table and len(first_table) > 0:
-                        columns = [str(cell).strip() for cell in first_table[0] if cell]
+        Returns {"columns", "rows", "mapping", "pages_scanned", "page_count"}:
+        the header of the first table, up to `rows` data rows, the suggested
+        column index of each student field (see suggest_column_mapping, usable
+        as column_mapping), how many pages were analyzed and the page total.
+        At most `pages` pages are analyzed, stopping as soon as a header and
+        enough rows were found, so the cost does not grow with the PDF.
+        Pages without a table contribute the whitespace-split lines that hold
+        a roll number, like the text fallback.
+        """
+        header: List[str] = []
+        sample: List[List[str]] = []
+        scanned = 0
+        
+        def take(page_content: Dict[str, Any]) -> bool:
+            """Add a page's header and rows; True once the sample is complete"""
+            nonlocal header
+            for table in page_content["tables"]:
+                cells = [[_cell_text(cell) for cell in row] for row in table]
+                if cells and not header:
+                    header = cells[0]
+                # Later pages usually repeat the header
+                sample.extend(row for row in cells if row != header)
+            if not page_content["tables"]:
+                sample.extend(line.split() for line in page_content["text"].split("\n")
+                              if FIELD_PATTERNS["Rno"].search(line))
+            return bool(header) and len(sample) >= rows
+        
+        # Reuse the cached page content when this file was already extracted
+        cached = None
+        if self.cache is not None:
+            cached = self.cache.get(self.cache.file_digest(pdf_path))
+        
+        if cached is not None:
+            page_count = len(cached)
+            for page_content in cached[:pages]:
+                scanned += 1
+                if take(page_content):
+                    break
+        else:
+            import pdfplumber
+            
+            with pdfplumber.open(pdf_path) as pdf:
+                first_pages, page_count = _first_pages(pdf, pages)
+                for page in first_pages:
+                    scanned += 1
+                    if take(self._analyze_page(page)):
                         break
         
-        return columns
+        sample = sample[:rows]
+        return {
+            "columns": header,
+            "rows": sample,
+            "mapping": suggest_column_mapping(header, sample),
+            "pages_scanned": scanned,
+            "page_count": page_count,
+        }
     
     def _process_table(self, table: List[List[str]], column_mapping: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
         """
@@ -133,17 +555,87 @@ class StudentDataConverter:
     
     def save_to_json(self, students: List[Dict[str, Any]], output_path: str):
         """
-        Save student data to JSON file
+        Save student data (a list of records or a StudentStore) to JSON file
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
+        if isinstance(students, StudentStore):
+            students = students.to_list()
+        
+        # Write to a temporary file and rename so a crash never leaves a partial file
+        with atomic_write(output_path, 'w', encoding='utf-8') as f:
             json.dump(students, f, indent=2, ensure_ascii=False)
     
-    def load_from_json(self, json_path: str) -> List[Dict[str, Any]]:
+    def load_from_json(self, json_path: str) -> StudentStore:
         """
-        Load student data from JSON file
+        Load student data from JSON file into a columnar StudentStore
         """
         with open(json_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            return StudentStore(json.load(f))
+    
+    def save(self, students, output_path: str):
+        """
+        Save student data as JSON or, for a .snap path, as a binary snapshot
+        """
+        start = time.perf_counter()
+        if Path(output_path).suffix == SNAPSHOT_SUFFIX:
+            write_snapshot(students, output_path)
+        else:
+            self.save_to_json(students, output_path)
+        record_stage("save", time.perf_counter() - start)
+    
+    def load(self, path: str) -> StudentStore:
+        """
+        Load student data from JSON or, for a .snap path, by memory-mapping a binary snapshot
+        """
+        if Path(path).suffix == SNAPSHOT_SUFFIX:
+            return SnapshotStore(path)
+        return self.load_from_json(path)
+
+def _first_pages(pdf, count: int) -> Tuple[List[Any], int]:
+    """
+    The first `count` pages of an open pdfplumber PDF, and its page total
+    
+    pdf.pages walks the whole page tree, which takes about 0.3 s for 500
+    pages; this only walks as far as the pages it returns and reads the total
+    from the page tree root.
+    """
+    from itertools import islice
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import resolve1
+    from pdfplumber.page import Page
+    
+    pages = []
+    doctop = 0
+    for number, page_object in enumerate(islice(PDFPage.create_pages(pdf.doc), count), 1):
+        page = Page(pdf, page_object, page_number=number, initial_doctop=doctop)
+        pages.append(page)
+        doctop += page.height
+    
+    try:
+        page_count = int(resolve1(pdf.doc.catalog["Pages"])["Count"])
+    except (KeyError, TypeError, ValueError):
+        page_count = len(pdf.pages)
+    return pages, page_count
+
+def _analyze_page_range(pdf_path: str, start: int, stop: int,
+                        template: Optional[ColumnTemplate] = None) -> Tuple[List[Dict[str, Any]], List[Tuple[str, float]]]:
+    """
+    Worker entry point: open the PDF and analyze pages [start, stop),
+    with the column template when one was learned
+    
+    Returns the pages and the (stage, seconds) timings measured on the way,
+    since metrics recorded in a worker process would never be scraped.
+    """
+    import pdfplumber
+    
+    timings = []
+    record = lambda stage, seconds: timings.append((stage, seconds))
+    
+    converter = StudentDataConverter()
+    opened = time.perf_counter()
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = pdf.pages[start:stop]
+        record("open", time.perf_counter() - opened)
+        return [converter._analyze_page(page, record, template) for page in pages], timings
 
 def main():
     """
@@ -1,43 +1,161 @@
 import sys
 import json
 from pdf_to_json_converter import StudentDataConverter
+from extraction_cache import ExtractionCache
+
+# Converter kept warm in each serve-mode worker process
+_converter = None
+
+def pop_option(args, name, default=None):
+    """Remove `name value` from args and return the value"""
+    if name in args:
+        idx = args.index(name)
+        if idx + 1 < len(args):
+            value = args[idx + 1]
+            del args[idx:idx + 2]
+            return value
+        del args[idx]
+    return default
+
+def _init_worker(cache_dir):
+    global _converter
+    # Pay for the heavy import once per worker rather than on the first request
+    import pdfplumber  # noqa: F401
+    _converter = StudentDataConverter(cache=ExtractionCache(cache_dir) if cache_dir else None)
+
+def handle_request(request):
+    """Run one serve-mode request on the warm converter"""
+    mode = request.get('mode', 'extract')
+    pdf_path = request['pdf_path']
+
+    if mode == 'columns':
+        if request.get('preview'):
+            return _converter.preview_pdf(pdf_path)
+        return _converter.get_pdf_columns(pdf_path) or []
+    if mode == 'extract':
+        return _converter.extract_data_from_pdf(
+            pdf_path, request.get('column_mapping') or None,
+            workers=request.get('workers', 1),
+            method=request.get('method', 'tables')
+        )
+    raise ValueError(f"Unknown mode '{mode}'")
+
+def serve(concurrency, cache_dir, stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Long-running mode: read one JSON request per line from stdin and write
+    one JSON response per line to stdout, in completion order
+
+      request:  {"id": 1, "mode": "extract", "pdf_path": "...", "column_mapping": {...}, "method": "template"}
+                {"id": 2, "mode": "columns", "pdf_path": "...", "preview": true}
+                {"id": 3, "mode": "ping"}
+      response: {"id": 1, "ok": true, "result": [...]}
+                {"id": 1, "ok": false, "error": "..."}
+
+    Requests run concurrently on `concurrency` worker processes that import
+    pdfplumber and build their converter once, at startup.
+    """
+    import threading
+    from concurrent.futures import ProcessPoolExecutor
+    
+    write_lock = threading.Lock()
+
+    def respond(response):
+        line = json.dumps(response)
+        with write_lock:
+            stdout.write(line + "\n")
+            stdout.flush()
+
+    def on_done(request_id, future):
+        try:
+            respond({"id": request_id, "ok": True, "result": future.result()})
+        except Exception as e:
+            respond({"id": request_id, "ok": False, "error": str(e)})
+
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker, initargs=(cache_dir,)) as executor:
+        for line in stdin:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+                request_id = request.get('id')
+            except (ValueError, AttributeError):
+                respond({"id": None, "ok": False, "error": "Invalid JSON request"})
+                continue
+
+            if request.get('mode') == 'ping':
+                respond({"id": request_id, "ok": True, "result": "pong"})
+                continue
+
+            future = executor.submit(handle_request, request)
+            future.add_done_callback(lambda f, request_id=request_id: on_done(request_id, f))
+
+    return 0
 
 def main():
     # Modes:
-    #   extract: python_wrapper.py [extract] <pdf_path> [column_mapping_json]
-    #   columns: python_wrapper.py columns <pdf_path>
-    if len(sys.argv) < 2:
+    #   extract: python_wrapper.py [extract] <pdf_path> [column_mapping_json] [--workers N] [--method M] [--cache-dir DIR]
+    #   columns: python_wrapper.py columns <pdf_path> [--preview] [--cache-dir DIR]
+    #   serve:   python_wrapper.py serve [--concurrency N] [--cache-dir DIR]
+    # --workers N parses pages in N processes (0 = one per CPU, default 1)
+    # --preview prints the header, sample rows and a suggested column mapping
+    #   of the first pages instead of the list of column names
+    # --method M lays out pages with "tables" (default) or a learned column "template"
+    # --cache-dir DIR reuses page content of previously extracted PDFs
+    # --concurrency N runs up to N serve-mode requests at once (default 2)
+    args = sys.argv[:]
+    try:
+        workers = int(pop_option(args, '--workers', 1))
+    except ValueError:
+        workers = 1
+    try:
+        concurrency = max(int(pop_option(args, '--concurrency', 2)), 1)
+    except ValueError:
+        concurrency = 2
+    method = pop_option(args, '--method', 'tables')
+    preview = '--preview' in args
+    if preview:
+        args.remove('--preview')
+    cache_dir = pop_option(args, '--cache-dir')
+
+    if len(args) > 1 and args[1] == 'serve':
+        return serve(concurrency, cache_dir)
+
+    if len(args) < 2:
         print("[]")
         return 0
 
     arg_idx = 1
     mode = 'extract'
-    if sys.argv[arg_idx] in ('extract', 'columns'):
-        mode = sys.argv[arg_idx]
+    if args[arg_idx] in ('extract', 'columns'):
+        mode = args[arg_idx]
         arg_idx += 1
 
-    if len(sys.argv) <= arg_idx:
+    if len(args) <= arg_idx:
         print("[]")
         return 0
 
-    pdf_path = sys.argv[arg_idx]
+    pdf_path = args[arg_idx]
     arg_idx += 1
 
-    converter = StudentDataConverter()
+    converter = StudentDataConverter(cache=ExtractionCache(cache_dir) if cache_dir else None)
 
     if mode == 'columns':
+        if preview:
+            print(json.dumps(converter.preview_pdf(pdf_path)))
+            return 0
         cols = converter.get_pdf_columns(pdf_path)
         print(json.dumps(cols or []))
         return 0
 
     mapping = None
-    if len(sys.argv) > arg_idx and sys.argv[arg_idx]:
+    if len(args) > arg_idx and args[arg_idx]:
         try:
-            mapping = json.loads(sys.argv[arg_idx])
+            mapping = json.loads(args[arg_idx])
         except Exception:
             mapping = None
 
-    students = converter.extract_data_from_pdf(pdf_path, mapping)
+    students = converter.extract_data_from_pdf(pdf_path, mapping, workers=workers, method=method)
     print(json.dumps(students))
     return 0
 
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Dict, Hashable, Optional, Tuple
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized response bodies, bounded by their total size
+
+    Keys include the dataset version, so entries never need invalidating:
+    after an upload the old entries simply stop being asked for and age out.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        """
+        Return (body, media type) for a key, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, media_type: str):
+        """
+        Store a body, evicting least recently used entries over the size limit
+        """
+        # A body larger than the whole cache would only flush everything else
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[0])
+
+            self._entries[key] = (body, media_type)
+            self.bytes += len(body)
+
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Serve GET requests for the given paths from a ResponseCache, with strong ETags
+
+    The ETag is derived from the request and the dataset version alone, so
+    a matching If-None-Match gets 304 Not Modified before any handler runs.
+    A random per-process epoch keeps versions from different runs apart.
+    """
+
+    def __init__(self, app, cache: ResponseCache, version: Callable[[], int],
+                 paths: Collection[str], prefixes: Tuple[str, ...] = ()):
+        super().__init__(app)
+        self.cache = cache
+        self.version = version
+        self.paths = set(paths)
+        self.prefixes = prefixes
+        self.epoch = uuid.uuid4().hex[:12]
+
+    def cacheable(self, path: str) -> bool:
+        return path in self.paths or path.startswith(self.prefixes)
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET" or not self.cacheable(request.url.path):
+            return await call_next(request)
+
+        # Read the version before the handler runs, so a response is never
+        # older than the version it is cached under
+        request_key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        key = (request_key, self.version())
+        digest = hashlib.sha1(repr(request_key).encode("utf-8")).hexdigest()[:16]
+        etag = f'"{self.epoch}-{key[1]}-{digest}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if etag in tags or "*" in tags:
+                return Response(status_code=304, headers=headers)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            body, media_type = cached
+            return Response(content=body, media_type=media_type, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        media_type = response.headers.get("content-type", "application/json")
+        self.cache.put(key, body, media_type)
+        return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Binary, memory-mappable snapshot format for the student dataset
+
+Layout (little-endian, sections aligned to 8 bytes):
+
+    header       magic "STUSNAP1", format version (u32), row count (u64), field count (u32)
+    field table  one entry per field: name (8 bytes), kind (u8),
+                 offset/length of section A (u64 x2), offset/length of section B (u64 x2)
+    sections     string column:     A = row offsets (u64 x rows+1), B = UTF-8 data
+                 dictionary column: A = row codes (u16 or u32),     B = dictionary
+
+The dictionary section is: value count (u32), value offsets (u32 x count+1), UTF-8 data.
+
+Opening a snapshot maps the file and wraps each section in a memoryview, so a
+row is decoded only when it is read.
+
+Run: python snapshot.py to-snapshot students_data.json students_data.snap
+     python snapshot.py to-json students_data.snap students_data.json
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+from atomic_file import atomic_write
+from student_store import StudentStore, StringColumn
+
+SNAPSHOT_SUFFIX = ".snap"
+
+MAGIC = b"STUSNAP1"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sIQI")
+FIELD_ENTRY = struct.Struct("<8sBQQQQ")
+
+KIND_STRING = 0
+KIND_DICT_U16 = 1
+KIND_DICT_U32 = 2
+
+
+def _check_byte_order():
+    if sys.byteorder != "little":
+        raise NotImplementedError("Student snapshots are only supported on little-endian hosts")
+
+
+def _pad(length: int) -> bytes:
+    return b"\0" * (-length % 8)
+
+
+class MappedStringColumn:
+    """
+    String column read straight from a mapped snapshot
+    """
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row_id: int) -> str:
+        return str(self.data[self.offsets[row_id]:self.offsets[row_id + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data, offsets = self.data, self.offsets
+        for row_id in range(len(offsets) - 1):
+            yield str(data[offsets[row_id]:offsets[row_id + 1]], "utf-8")
+
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.data.nbytes
+
+
+class MappedDictionaryColumn:
+    """
+    Dictionary-encoded column whose codes are read straight from a mapped snapshot
+    """
+
+    def __init__(self, codes: memoryview, values: List[str]):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row_id: int) -> str:
+        return self.values[self.codes[row_id]]
+
+    def __iter__(self) -> Iterator[str]:
+        values = self.values
+        for code in self.codes:
+            yield values[code]
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(sys.getsizeof(value) for value in self.values)
+
+
+class SnapshotStore(StudentStore):
+    """
+    Read-only StudentStore backed by a memory-mapped snapshot file
+    """
+
+    def __init__(self, path: str):
+        _check_byte_order()
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+
+        buffer = memoryview(self._mmap)
+        magic, version, rows, field_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a student snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+
+        self.columns = {}
+        for i in range(field_count):
+            name, kind, a_offset, a_length, b_offset, b_length = FIELD_ENTRY.unpack_from(
+                buffer, HEADER.size + i * FIELD_ENTRY.size)
+            field = name.rstrip(b"\0").decode("ascii")
+            section_a = buffer[a_offset:a_offset + a_length]
+            section_b = buffer[b_offset:b_offset + b_length]
+
+            if kind == KIND_STRING:
+                column = MappedStringColumn(section_a.cast("Q"), section_b)
+            else:
+                column = MappedDictionaryColumn(
+                    section_a.cast("H" if kind == KIND_DICT_U16 else "I"),
+                    _decode_dictionary(section_b)
+                )
+            if len(column) != rows:
+                raise ValueError(f"Corrupt snapshot: column {field} has {len(column)} rows, expected {rows}")
+            self.columns[field] = column
+
+    def append(self, student: Dict[str, Any]):
+        raise TypeError("SnapshotStore is read-only; copy it into a StudentStore to modify it")
+
+
+def _encode_dictionary(values: List[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return struct.pack("<I", len(values)) + offsets.tobytes() + b"".join(encoded)
+
+
+def _decode_dictionary(section: memoryview) -> List[str]:
+    (count,) = struct.unpack_from("<I", section, 0)
+    offsets = array("I", bytes(section[4:4 + 4 * (count + 1)]))
+    data = bytes(section[4 + 4 * (count + 1):])
+    return [sys.intern(data[offsets[i]:offsets[i + 1]].decode("utf-8")) for i in range(count)]
+
+
+def _column_sections(column):
+    """
+    Return (kind, section A bytes, section B bytes) for a store column
+    """
+    if isinstance(column, (StringColumn, MappedStringColumn)):
+        return KIND_STRING, memoryview(column.offsets).cast("B"), memoryview(column.data).cast("B")
+
+    codes = column.codes
+    kind = KIND_DICT_U16 if codes.itemsize == 2 else KIND_DICT_U32
+    return kind, memoryview(codes).cast("B"), _encode_dictionary(column.values)
+
+
+def write_snapshot(students: Union[StudentStore, Iterable[Dict[str, Any]]], path: str):
+    """
+    Write students to a snapshot file, atomically replacing any existing file
+    """
+    _check_byte_order()
+
+    store = students if isinstance(students, StudentStore) else StudentStore(students)
+    fields = list(store.columns)
+
+    sections = [_column_sections(store.column(field)) for field in fields]
+
+    # Lay out the sections after the header and field table
+    position = HEADER.size + FIELD_ENTRY.size * len(fields)
+    position += len(_pad(position))
+    entries = []
+    for field, (kind, section_a, section_b) in zip(fields, sections):
+        a_offset = position
+        position += len(section_a) + len(_pad(len(section_a)))
+        b_offset = position
+        position += len(section_b) + len(_pad(len(section_b)))
+        entries.append(FIELD_ENTRY.pack(field.encode("ascii"), kind, a_offset, len(section_a), b_offset, len(section_b)))
+
+    with atomic_write(path) as f:
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, len(store), len(fields)) + b"".join(entries)
+        f.write(header + _pad(len(header)))
+        for _, section_a, section_b in sections:
+            f.write(section_a)
+            f.write(_pad(len(section_a)))
+            f.write(section_b)
+            f.write(_pad(len(section_b)))
+
+
+def json_to_snapshot(json_path: str, snapshot_path: str) -> int:
+    with open(json_path, "r", encoding="utf-8") as f:
+        store = StudentStore(json.load(f))
+    write_snapshot(store, snapshot_path)
+    return len(store)
+
+
+def snapshot_to_json(snapshot_path: str, json_path: str) -> int:
+    store = SnapshotStore(snapshot_path)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(store.to_list(), f, indent=2, ensure_ascii=False)
+    return len(store)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-snapshot", "to-json"):
+        print("Usage: python snapshot.py to-snapshot <input.json> <output.snap>")
+        print("       python snapshot.py to-json <input.snap> <output.json>")
+        return 1
+
+    if sys.argv[1] == "to-snapshot":
+        count = json_to_snapshot(sys.argv[2], sys.argv[3])
+    else:
+        count = snapshot_to_json(sys.argv[2], sys.argv[3])
+
+    print(f"Converted {count} students to {sys.argv[3]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import requests
 import json
 import pandas as pd
 import os
+import time
 from io import BytesIO
 from pdf_to_json_converter import StudentDataConverter
 
@@ -60,7 +61,15 @@ def make_api_request(endpoint, method="GET", data=None, files=None):
     try:
         url = f"{API_BASE_URL}{endpoint}"
         if method == "GET":
-            response = requests.get(url)
+            # Revalidate with the ETag of the last response; 304 means it is still current
+            etag_cache = st.session_state.setdefault("etag_cache", {})
+            cached = etag_cache.get(url)
+            headers = {"If-None-Match": cached[0]} if cached else {}
+            response = requests.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                return cached[1]
+            if response.status_code == 200 and "ETag" in response.headers:
+                etag_cache[url] = (response.headers["ETag"], response.json())
         elif method == "POST":
             if files and data:
                 response = requests.post(url, files=files, data=data)
@@ -69,7 +78,7 @@ def make_api_request(endpoint, method="GET", data=None, files=None):
             else:
                 response = requests.post(url, json=data)
         
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             return response.json()
         else:
             st.error(f"API Error: {response.status_code} - {response.text}")
@@ -81,6 +90,30 @@ def make_api_request(endpoint, method="GET", data=None, files=None):
         st.error(f"Error: {str(e)}")
         return None
 
+def wait_for_job(job_id, poll_interval=0.5):
+    """Poll a PDF ingestion job until it finishes, showing its progress"""
+    progress_bar = st.progress(0.0, text="Queued...")
+    
+    while True:
+        job = make_api_request(f"/jobs/{job_id}")
+        if not job:
+            return None
+        
+        if job.get("pages_total"):
+            fraction = job["pages_processed"] / job["pages_total"]
+            progress_bar.progress(
+                min(fraction, 1.0),
+                text=f"Processed {job['pages_processed']}/{job['pages_total']} pages, found {job['records_found']} students"
+            )
+        
+        if job.get("status") == "completed":
+            return job.get("result")
+        if job.get("status") == "failed":
+            st.error(f"Processing failed: {'; '.join(job.get('errors', []))}")
+            return None
+        
+        time.sleep(poll_interval)
+
 def load_stats():
     """Load and display statistics"""
     stats = make_api_request("/stats")
@@ -206,17 +239,19 @@ def upload_file():
             
             # First, get PDF columns
             if st.button("🔍 Extract PDF Columns", type="secondary"):
-                with st.spinner("Extracting column headers from PDF..."):
+                with st.spinner("Sampling the first pages of the PDF..."):
                     # Save file temporarily to get columns
                     temp_path = f"temp_{uploaded_file.name}"
                     with open(temp_path, "wb") as f:
                         f.write(uploaded_file.getvalue())
                     
                     try:
-                        columns = converter.get_pdf_columns(temp_path)
+                        preview = converter.preview_pdf(temp_path)
+                        columns = preview["columns"]
                         if columns:
                             st.session_state.pdf_columns = columns
-                            st.success(f"Found {len(columns)} columns in PDF")
+                            st.session_state.pdf_preview = preview
+                            st.success(f"Found {len(columns)} columns in the first {preview['pages_scanned']} of {preview['page_count']} pages")
                         else:
                             st.warning("No columns found in PDF")
                     except Exception as e:
@@ -230,6 +265,14 @@ def upload_file():
                 st.write("**PDF Columns Found:**")
                 st.write(st.session_state.pdf_columns)
                 
+                preview = st.session_state.get("pdf_preview", {})
+                if preview.get("rows"):
+                    st.write("**Sample Rows:**")
+                    st.dataframe(pd.DataFrame([row[:len(st.session_state.pdf_columns)] for row in preview["rows"]],
+                                              columns=[f"{i}: {name}" for i, name in enumerate(st.session_state.pdf_columns)]),
+                                 use_container_width=True)
+                suggested = preview.get("mapping", {})
+                
                 st.write("**Map PDF columns to database columns:**")
                 
                 # Database column definitions
@@ -249,6 +292,7 @@ def upload_file():
                         pdf_col_index = st.selectbox(
                             f"{db_col} ({description})",
                             options=range(len(st.session_state.pdf_columns)),
+                            index=min(suggested.get(db_col, i), len(st.session_state.pdf_columns) - 1),
                             format_func=lambda x: f"Column {x}: {st.session_state.pdf_columns[x]}" if x < len(st.session_state.pdf_columns) else "Select column",
                             key=f"mapping_{db_col}"
                         )
@@ -268,6 +312,8 @@ def upload_file():
                         data = {"column_mapping": json.dumps(column_mapping)}
                         
                         result = make_api_request("/upload/pdf", method="POST", files=files, data=data)
+                        if result and result.get("job_id"):
+                            result = wait_for_job(result["job_id"])
                         
                         if result and result.get("success"):
                             st.success(f"✅ {result.get('message')}")
@@ -287,6 +333,9 @@ def upload_file():
                     if result and result.get("success"):
                         st.success(f"✅ {result.get('message')}")
                         st.info(f"📊 Processed {result.get('students_count', 0)} students")
+                        if result.get("invalid_count"):
+                            st.warning(f"⚠️ Skipped {result['invalid_count']} invalid records")
+                            st.json(result.get("invalid_records", []))
                         st.rerun()  # Refresh the page to show updated data
                     else:
                         st.error("❌ Upload failed")
@@ -0,0 +1,233 @@
+import sys
+from array import array
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+STUDENT_FIELDS = ("Rno", "Jno", "CN", "B", "Sec")
+
+# Low-cardinality columns that are stored as codes into a dictionary
+ENCODED_FIELDS = ("B", "Sec")
+
+# (row id, previous record or None if the row was appended, new record),
+# as passed to the incremental updates of the indexes built over a store
+RowChange = Tuple[int, Optional[Dict[str, str]], Dict[str, str]]
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+class StringColumn:
+    """
+    Variable-length strings packed into one UTF-8 buffer with an offset table
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+
+    def append(self, value: str):
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row_id: int) -> str:
+        return self.data[self.offsets[row_id]:self.offsets[row_id + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data, offsets = self.data, self.offsets
+        for row_id in range(len(offsets) - 1):
+            yield data[offsets[row_id]:offsets[row_id + 1]].decode("utf-8")
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.data) + sys.getsizeof(self.offsets)
+
+    @classmethod
+    def patched(cls, column, values: Dict[int, str]) -> "StringColumn":
+        """
+        Copy a string column (in memory or mapped) with some rows' values replaced
+
+        Runs of unchanged rows are copied as whole buffer slices; only the
+        offsets after a value whose length changed have to be shifted.
+        """
+        data, offsets = column.data, column.offsets
+        patched = cls()
+        new_data = patched.data
+        new_offsets = patched.offsets
+        shift = 0
+        start = 0
+
+        def copy_rows(stop: int):
+            # Rows [start, stop) keep their bytes; their end offsets move by shift
+            new_data.extend(data[offsets[start]:offsets[stop]])
+            ends = offsets[start + 1:stop + 1]
+            if shift:
+                new_offsets.extend(end + shift for end in ends)
+            else:
+                new_offsets.frombytes(memoryview(ends).cast("B"))
+
+        for row_id in sorted(values):
+            copy_rows(row_id)
+            encoded = values[row_id].encode("utf-8")
+            new_data.extend(encoded)
+            shift += len(encoded) - (offsets[row_id + 1] - offsets[row_id])
+            new_offsets.append(len(new_data))
+            start = row_id + 1
+        copy_rows(len(offsets) - 1)
+
+        return patched
+
+
+class DictionaryColumn:
+    """
+    Repeating strings stored once, interned, and referenced by integer codes
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes_by_value: Dict[str, int] = {}
+        self.codes = array("H")
+
+    def append(self, value: str):
+        # _code() may widen the code array, so look the array up afterwards
+        code = self._code(value)
+        self.codes.append(code)
+
+    def _code(self, value: str) -> int:
+        code = self.codes_by_value.get(value)
+
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value)
+            self.values.append(value)
+            self.codes_by_value[value] = code
+
+            # Widen the code array once 16-bit codes run out
+            if code > 0xFFFF and self.codes.typecode == "H":
+                self.codes = array("I", self.codes)
+
+        return code
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row_id: int) -> str:
+        return self.values[self.codes[row_id]]
+
+    def __iter__(self) -> Iterator[str]:
+        values = self.values
+        for code in self.codes:
+            yield values[code]
+
+    def nbytes(self) -> int:
+        return (sys.getsizeof(self.codes) + sys.getsizeof(self.values)
+                + sys.getsizeof(self.codes_by_value) + sum(sys.getsizeof(v) for v in self.values))
+
+    @classmethod
+    def patched(cls, column, values: Dict[int, str]) -> "DictionaryColumn":
+        """
+        Copy a dictionary column (in memory or mapped) with some rows' values replaced
+        """
+        patched = cls()
+        patched.values = list(column.values)
+        patched.codes_by_value = {value: code for code, value in enumerate(patched.values)}
+        # array codes have a typecode, mapped (memoryview) codes a format
+        patched.codes = array(getattr(column.codes, "typecode", None) or column.codes.format)
+        patched.codes.frombytes(memoryview(column.codes).cast("B"))
+
+        for row_id, value in values.items():
+            code = patched._code(value)
+            patched.codes[row_id] = code
+
+        return patched
+
+
+class StudentStore:
+    """
+    Columnar in-memory storage for student records
+
+    Each field is kept in its own parallel column: Rno, Jno and CN are packed
+    string columns, while B and Sec are dictionary-encoded. Rows are exposed as
+    plain dicts so callers can keep treating the store like a list of students.
+    """
+
+    def __init__(self, students: Optional[Iterable[Dict[str, Any]]] = None):
+        self.columns = {
+            field: DictionaryColumn() if field in ENCODED_FIELDS else StringColumn()
+            for field in STUDENT_FIELDS
+        }
+
+        if students is not None:
+            self.extend(students)
+
+    def append(self, student: Dict[str, Any]):
+        """
+        Add one student record; missing fields are stored as empty strings
+        """
+        for field, column in self.columns.items():
+            column.append(_text(student.get(field)))
+
+    def extend(self, students: Iterable[Dict[str, Any]]):
+        for student in students:
+            self.append(student)
+
+    def column(self, field: str):
+        """
+        Return the column for a field, iterable in row order
+        """
+        return self.columns[field]
+
+    def __len__(self) -> int:
+        return len(self.columns["Rno"])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, row_id: int) -> Dict[str, Any]:
+        if row_id < 0:
+            row_id += len(self)
+        if not 0 <= row_id < len(self):
+            raise IndexError("student row out of range")
+
+        return {field: column[row_id] for field, column in self.columns.items()}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        fields = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(fields, values))
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield the rows in [start, stop) without materializing the rest
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        columns = list(self.columns.items())
+
+        for row_id in range(max(start, 0), stop):
+            yield {field: column[row_id] for field, column in columns}
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def updated(self, replaced: Dict[int, Dict[str, Any]], appended: Iterable[Dict[str, Any]] = ()) -> "StudentStore":
+        """
+        Return a new store with some rows replaced and others appended
+
+        The columns are copied buffer by buffer rather than row by row, and
+        this store (which may be a read-only snapshot) is left untouched.
+        """
+        store = StudentStore()
+        store.columns = {
+            field: (DictionaryColumn if field in ENCODED_FIELDS else StringColumn).patched(
+                column, {row_id: _text(student.get(field)) for row_id, student in replaced.items()})
+            for field, column in self.columns.items()
+        }
+        store.extend(appended)
+        return store
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the column buffers
+        """
+        return sum(column.nbytes() for column in self.columns.values())
@@ -100,6 +100,20 @@ def test_api():
     except Exception as e:
         print(f"❌ Statistics failed: {e}")
     
+    # Test batch verification
+    print("\n8. Testing batch verification...")
+    try:
+        response = requests.post(f"{BASE_URL}/verify", json={
+            "Rno": ["24/A01/001", "99/A99/999"],
+            "Jno": ["240310038495"]
+        })
+        data = response.json()
+        print(f"✅ Batch verification: {response.status_code}")
+        print(f"   {data['message']}")
+        print(f"   Missing roll numbers: {data['Rno']['missing']}")
+    except Exception as e:
+        print(f"❌ Batch verification failed: {e}")
+    
     print("\n" + "=" * 50)
     print("🎉 API testing completed!")
     print("\nTo test file upload endpoints, use:")
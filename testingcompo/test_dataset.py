@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Dataset tests: upserts update a shard's store, indexes, aggregates and Merkle
+tree incrementally, with the same result as rebuilding the shard, and
+substring search, short queries included, and fuzzy name search match a
+scan, and misspelled names are found; roll numbers match regardless of
+case while application numbers match exactly; dictionary columns
+widen their codes past 65,536 distinct values; the change log replays to the
+same shards after a restart, cuts off a torn tail, and never takes a batch
+that cannot be applied
+Run: python -m pytest test_dataset.py
+"""
+
+import asyncio
+import random
+
+import pytest
+
+import dataset as dataset_module
+import main
+from changelog import ChangeLog, DELETE, REPLACE, UPSERT, _encode
+from dataset import ShardedDataset, StudentDataset
+from indexes import FuzzyNameIndex, name_grams, normalize_name
+from student_store import DictionaryColumn, StudentStore
+
+NAMES = ["AADIT MOGHA", "Ravi Kumar", "rávi  kumar", "Priya", "", "A", "Sita Ram"]
+
+QUERIES = ["r1", "ku", "a", "s1", "j1", "mogha", "jr"]
+
+class MemoryChangeLog:
+    """Change log stand-in that only hands out sequence numbers"""
+
+    def __init__(self):
+        self.last_seq = 0
+
+    def append(self, op, **batch):
+        self.last_seq += 1
+        return self.last_seq
+
+def random_student(rng, count):
+    # Few distinct keys and names, so upserts hit existing rows, duplicate
+    # application numbers and shared names
+    return {
+        "Rno": rng.choice([f"R{rng.randrange(count)}", f" r{rng.randrange(count)}"]),
+        "Jno": rng.choice([f"J{rng.randrange(count // 2)}", f"j{rng.randrange(count // 2)}"]),
+        "CN": rng.choice(NAMES) + rng.choice(["", " Jr"]),
+        "B": rng.choice(["CS", "EE", "ME"]),
+        "Sec": rng.choice(["Sec-1", "Sec-2"]),
+    }
+
+def view(shard):
+    """Everything a reader can observe through a shard"""
+    return (
+        shard.store.to_list(),
+        shard.index.by_roll,
+        shard.index.by_application,
+        [shard.search_index.search(query) for query in QUERIES],
+        [shard.name_index.search(query, 20, 0.1) for query in QUERIES],
+        shard.stats.snapshot(),
+        shard.merkle.root,
+    )
+
+def test_upserts_match_a_full_rebuild():
+    rng = random.Random(7)
+    changelog = MemoryChangeLog()
+    dataset = ShardedDataset()
+    dataset.commit(changelog, UPSERT, "default", students=[random_student(rng, 60) for _ in range(40)])
+
+    for _ in range(200):
+        previous = dataset.get("default")
+        before = view(previous)
+
+        batch = [random_student(rng, 90) for _ in range(rng.randrange(1, 6))]
+        shard = dataset.commit(changelog, UPSERT, "default", students=batch)
+
+        assert view(shard) == view(StudentDataset(shard.store.to_list()))
+        # Readers still holding the previous version see it unchanged
+        assert view(previous) == before
+
+def test_search_matches_a_scan():
+    rng = random.Random(11)
+    changelog = MemoryChangeLog()
+    dataset = ShardedDataset()
+    dataset.commit(changelog, UPSERT, "default", students=[random_student(rng, 60) for _ in range(40)])
+    # Values added by an update, short values included, are found too
+    shard = dataset.commit(changelog, UPSERT, "default", students=[
+        {"Rno": "Q", "Jno": "", "CN": "zz", "B": "X", "Sec": "qx"}, random_student(rng, 90)])
+    students = shard.store.to_list()
+
+    for query in QUERIES + ["", "r", "a ", "zz", "z", "Q", "x", "qx", "sec-", "nope"]:
+        expected = [row_id for row_id, student in enumerate(students)
+                    if any(query.lower() in value.lower() for value in student.values())]
+        assert shard.search_index.search(query) == expected, query
+
+def test_fuzzy_search_matches_a_scan():
+    rng = random.Random(17)
+    words = ["AADIT", "MOGHA", "RAVI", "KUMAR", "PRIYA", "SHARMA", "SITA", "RAM", "AMISHI", "MITTAL"]
+    names = [" ".join(rng.sample(words, rng.randrange(1, 4))) for _ in range(300)] + ["", "-"]
+    index = FuzzyNameIndex(StudentStore([{"CN": name} for name in names]))
+
+    def scan(query, limit, threshold):
+        grams = name_grams(normalize_name(query))
+        rows_by_name = {}
+        for row_id, name in enumerate(names):
+            if normalize_name(name):
+                rows_by_name.setdefault(normalize_name(name), []).append(row_id)
+        scored = []
+        for name, rows in rows_by_name.items():
+            other = name_grams(name)
+            score = len(grams & other) / len(grams | other)
+            if score >= threshold:
+                scored.append((-score, rows[0], rows, score))
+        results = [(row_id, round(score, 4)) for _, _, rows, score in sorted(scored) for row_id in rows]
+        return results[:limit]
+
+    for query in ["ravi kumr", "AADIT MOHGA", "sita", "mittal amishi", "priya sharma ram", "x", "", "kumar ravi"]:
+        for limit, threshold in [(10, 0.3), (3, 0.1), (50, 0.6), (0, 0.3)]:
+            assert index.search(query, limit, threshold) == scan(query, limit, threshold), (query, limit, threshold)
+
+def test_fuzzy_search_finds_misspelled_names():
+    shard = StudentDataset([{"Rno": str(i), "CN": name} for i, name in enumerate(NAMES)])
+
+    def names(query, limit=10, threshold=0.3):
+        return [(student["CN"], score) for student, score in shard.fuzzy_search(query, limit, threshold)]
+
+    assert names("AADIT MOHGA")[0][0] == "AADIT MOGHA"
+    # Case, accents, punctuation and word order do not count against a match
+    assert names("kumar, RAVI") == [("Ravi Kumar", 1.0), ("rávi  kumar", 1.0)]
+    assert names("Ravi Kumaar", limit=1) == [("Ravi Kumar", 0.7692)]
+    assert names("Priyaa", threshold=0.9) == []
+    assert names("zzz") == []
+
+def test_application_numbers_match_exactly():
+    shard = StudentDataset([
+        {"Rno": "24/A01/045", "Jno": "OIA240001582", "CN": "AMISHI MITTAL", "B": "CS", "Sec": "Sec-1"},
+        {"Rno": "24/A01/046", "Jno": "oia240001582", "CN": "SRI VENKATA SAI", "B": "CS", "Sec": "Sec-1"},
+    ])
+
+    assert shard.find_by_application("OIA240001582")["Rno"] == "24/A01/045"
+    assert shard.find_by_application("oia240001582")["Rno"] == "24/A01/046"
+    assert shard.find_by_application(" OIA240001582") is None
+    assert shard.find_by_application("Oia240001582") is None
+    assert shard.find_by_roll("24/a01/046")["Jno"] == "oia240001582"
+    assert set(shard.find_many(["OIA240001582", "Oia240001582"], "Jno")) == {"OIA240001582"}
+    assert set(shard.find_many(["24/a01/045"], "Rno")) == {"24/a01/045"}
+
+def test_dictionary_codes_widen_past_16_bits():
+    column = DictionaryColumn()
+    values = [f"B{i}" for i in range(70000)] + ["B0", "B69999"]
+    for value in values:
+        column.append(value)
+
+    assert column.codes.typecode == "I"
+    assert list(column) == values
+    assert column[65536] == "B65536"
+
+    patched = DictionaryColumn.patched(column, {0: "NEW", 70001: "B65537"})
+    assert (patched[0], patched[1], patched[70001]) == ("NEW", "B1", "B65537")
+
+def test_change_log_replays_after_a_restart(tmp_path):
+    rng = random.Random(13)
+    changelog = ChangeLog(str(tmp_path / "changes.log"))
+    dataset = ShardedDataset()
+    dataset.commit(changelog, REPLACE, "default", students=[random_student(rng, 60) for _ in range(30)])
+    dataset.commit(changelog, UPSERT, "other", students=[random_student(rng, 60) for _ in range(10)])
+    for _ in range(20):
+        dataset.commit(changelog, UPSERT, "default", students=[random_student(rng, 90) for _ in range(3)])
+    dataset.commit(changelog, DELETE, "default", keys=["R1", "R2", "R3"])
+
+    restarted_log = ChangeLog(changelog.path)
+    restarted = ShardedDataset()
+    assert restarted.replay(list(restarted_log.replay())) == 23
+
+    assert restarted.institutions() == dataset.institutions()
+    for institution in ("default", "other"):
+        assert view(restarted.get(institution)) == view(dataset.get(institution))
+    assert restarted_log.last_seq == changelog.last_seq
+
+def test_torn_tail_is_cut_off_on_replay(tmp_path):
+    changelog = ChangeLog(str(tmp_path / "changes.log"))
+    dataset = ShardedDataset()
+    dataset.commit(changelog, UPSERT, "default", students=[{"Rno": "R1", "CN": "A"}])
+    dataset.commit(changelog, UPSERT, "default", students=[{"Rno": "R2", "CN": "B"}])
+    complete = changelog.size()
+
+    # A crash halfway through writing the third batch
+    frame = _encode({"seq": 3, "op": UPSERT, "students": [{"Rno": "R3"}]})
+    with open(changelog.path, "ab") as f:
+        f.write(frame[:len(frame) // 2])
+
+    restarted_log = ChangeLog(changelog.path)
+    restarted = ShardedDataset()
+    assert restarted.replay(list(restarted_log.replay())) == 2
+    assert [student["Rno"] for student in restarted.iter_students()] == ["R1", "R2"]
+    assert restarted_log.size() == complete
+
+    # Appends after the repair start on a frame boundary and replay again
+    restarted.commit(restarted_log, UPSERT, "default", students=[{"Rno": "R3", "CN": "C"}])
+    assert [batch["seq"] for batch in ChangeLog(changelog.path).replay()] == [1, 2, 3]
+
+def test_batch_that_cannot_be_applied_is_not_logged(tmp_path, monkeypatch):
+    changelog = ChangeLog(str(tmp_path / "changes.log"))
+    dataset = ShardedDataset()
+    dataset.commit(changelog, UPSERT, "default", students=[{"Rno": "R1", "CN": "A"}])
+    size, version = changelog.size(), dataset.version
+
+    def broken(*args, **kwargs):
+        raise OverflowError("index build failed")
+
+    monkeypatch.setattr(dataset_module, "apply_batch_changes", broken)
+    with pytest.raises(OverflowError):
+        dataset.commit(changelog, UPSERT, "default", students=[{"Rno": "R2", "CN": "B"}])
+
+    assert (changelog.size(), changelog.last_seq, dataset.version) == (size, 1, version)
+    assert [student["Rno"] for student in dataset.iter_students()] == ["R1"]
+
+def test_startup_refuses_a_change_log_it_cannot_replay(tmp_path, monkeypatch):
+    changelog = ChangeLog(str(tmp_path / "changes.log"))
+    ShardedDataset().commit(changelog, UPSERT, "default", students=[{"Rno": "R1", "CN": "A"}])
+    with open(changelog.path, "ab") as f:
+        f.write(_encode({"seq": 2, "op": "rename", "students": []}))
+
+    monkeypatch.setattr(main, "DATA_FILE", str(tmp_path / "students_data.json"))
+    monkeypatch.setattr(main, "changelog", changelog)
+    monkeypatch.setattr(main, "dataset", main.dataset)
+    with pytest.raises(RuntimeError, match="batch 2"):
+        asyncio.run(main.startup_event())
+
+    # The log is left for an operator to inspect, not truncated
+    assert [batch["seq"] for batch in ChangeLog(changelog.path).replay()] == [1, 2]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Extraction tests: the learned column template gives the same records as
+table detection, keeps multi-word and wrapped names in one cell and finds
+the table on every page, without detecting the first page's tables twice; a
+preview of the first page suggests the column mapping; PDF parsing never
+starts more processes than there are CPUs; the extraction cache serves a
+repeat upload without parsing and evicts least recently used entries
+Run: python -m pytest test_extraction.py
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import httpx
+
+import main
+from extraction_cache import ExtractionCache
+from pdf_to_json_converter import ColumnTemplate, StudentDataConverter, suggest_column_mapping
+
+SAMPLE_PDF = Path(__file__).parent / "data" / "[httpsnoti.akshat.sh] file0811-1-2.pdf"
+
+HEADER = ["Roll No", "Application No", "Candidate Name", "Branch", "Section"]
+BOUNDARIES = [50, 120, 240, 400, 450, 510]
+
+class FakePage:
+    """The page attributes ColumnTemplate reads, built from (x, top, text) runs"""
+
+    def __init__(self, runs, ruling_top=None):
+        self.bbox = (0, 0, 600, 800)
+        self.chars = []
+        for x, top, text in runs:
+            # No space characters, like PDFs that position every word separately
+            for word in text.split():
+                for char in word:
+                    self.chars.append({"text": char, "x0": x, "x1": x + 5, "top": top, "bottom": top + 10})
+                    x += 5
+                x += 4
+        self.horizontal_edges = [] if ruling_top is None else [{"x0": 0, "x1": 600, "top": ruling_top}]
+
+def test_template_matches_table_detection():
+    converter = StudentDataConverter()
+
+    tables = converter.extract_data_from_pdf(str(SAMPLE_PDF))
+    template = converter.extract_data_from_pdf(str(SAMPLE_PDF), method="template")
+
+    assert template == tables
+    assert {"Rno": "24/A01/001", "Jno": "240310038495", "CN": "AADIT MOGHA", "B": "CS", "Sec": "Sec-1"} in template
+
+def test_template_slices_rows_by_position():
+    template = ColumnTemplate(HEADER, BOUNDARIES)
+    page = FakePage([
+        (60, 20, "ENROLLMENT LIST"),
+        (60, 95, "Roll No"), (130, 95, "Application No"), (250, 95, "Candidate Name"),
+        (405, 95, "Branch"), (455, 95, "Section"),
+        (60, 120, "24/A01/045"), (130, 120, "OIA240001582"), (250, 120, "AMISHI MITTAL"),
+        (405, 120, "CS"), (455, 120, "Sec-1"),
+        (60, 135, "24/A01/046"), (130, 135, "240311063904"), (250, 135, "SRI VENKATA SAI"),
+        (405, 135, "CS"), (455, 135, "Sec-1"),
+        (250, 147, "KRISHNA"),
+        (60, 790, "Page 2"),
+    ], ruling_top=160)
+
+    assert template.slice_page(page) == [
+        ["24/A01/045", "OIA240001582", "AMISHI MITTAL", "CS", "Sec-1"],
+        ["24/A01/046", "240311063904", "SRI VENKATA SAI KRISHNA", "CS", "Sec-1"],
+    ]
+
+def test_template_finds_the_table_on_each_page():
+    template = ColumnTemplate(HEADER, BOUNDARIES)
+    # A continuation page whose table starts higher than the first page's and
+    # does not repeat the header: it is found from its ruling lines
+    page = FakePage([
+        (60, 40, "24/A01/047"), (130, 40, "240310011111"), (250, 40, "PRIYA"), (405, 40, "EE"), (455, 40, "Sec-2"),
+        (60, 55, "24/A01/048"), (130, 55, "240310022222"), (250, 55, "RAVI KUMAR"), (405, 55, "EE"), (455, 55, "Sec-2"),
+        (60, 790, "Page 3"),
+    ], ruling_top=35)
+    page.horizontal_edges.append({"x0": 0, "x1": 600, "top": 70})
+
+    assert template.slice_page(page) == [
+        ["24/A01/047", "240310011111", "PRIYA", "EE", "Sec-2"],
+        ["24/A01/048", "240310022222", "RAVI KUMAR", "EE", "Sec-2"],
+    ]
+    # Neither a header nor ruling: the page is left to table detection
+    assert template.slice_page(FakePage([(60, 40, "24/A01/047"), (250, 40, "PRIYA")])) == []
+
+def test_learning_the_template_detects_tables_once(monkeypatch):
+    import pdfplumber
+
+    with pdfplumber.open(str(SAMPLE_PDF)) as pdf:
+        page = pdf.pages[0]
+        calls = []
+        monkeypatch.setattr(page, "find_tables", lambda: calls.append(1) or [])
+
+        content, template = StudentDataConverter()._learn_template(page)
+
+    assert template is None
+    assert calls == [1]
+    assert "AADIT MOGHA" in content["text"]
+
+def test_preview_suggests_a_mapping_from_the_first_page():
+    preview = StudentDataConverter().preview_pdf(str(SAMPLE_PDF), rows=3)
+
+    assert preview["columns"] == ["Roll No", "JAC/OIA Application No", "Candidate Name", "Branch", "Section"]
+    assert preview["rows"][0] == ["24/A01/001", "240310038495", "AADIT MOGHA", "CS", "Sec-1"]
+    assert len(preview["rows"]) == 3
+    assert preview["mapping"] == {"Rno": 0, "Jno": 1, "CN": 2, "B": 3, "Sec": 4}
+    assert (preview["pages_scanned"], preview["page_count"]) == (1, 2)
+
+def test_mapping_is_inferred_from_values_alone():
+    rows = [
+        ["Sec-2", "AADIT MOGHA", "", "MAM", "OIA240000233", "24/A01/001"],
+        ["Sec-2", "Aashi Gupta", "", "CS", "240310038495", "24/A01/002"],
+        ["Sec-3", "ABHINAV", "", "EE", "INT202400993", "24/B11/1234"],
+    ]
+
+    assert suggest_column_mapping(["", "", "", "", "", ""], rows) == {"Rno": 5, "Jno": 4, "CN": 1, "B": 3, "Sec": 0}
+
+def test_preview_endpoints():
+    async def upload(path):
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            return await client.post(path, files={"file": ("list.pdf", SAMPLE_PDF.read_bytes())})
+
+    preview = asyncio.run(upload("/pdf-preview?rows=2"))
+    columns = asyncio.run(upload("/pdf-columns"))
+
+    assert preview.status_code == 200
+    assert preview.json()["mapping"] == {"Rno": 0, "Jno": 1, "CN": 2, "B": 3, "Sec": 4}
+    assert len(preview.json()["rows"]) == 2
+    assert columns.status_code == 200
+    assert columns.json()["columns"] == preview.json()["columns"]
+
+def test_workers_are_capped_at_the_cpu_count(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("started a worker pool on a single CPU")
+
+    # With one CPU the pages are parsed in this process, however many workers are asked for
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", no_pool)
+
+    assert len(StudentDataConverter()._analyze_pdf(str(SAMPLE_PDF), workers=64)) == 2
+
+def test_extraction_cache_hits_misses_and_eviction(tmp_path):
+    pages = [{"tables": [], "text": "x" * 100}]
+    entry_size = len('[{"tables":[],"text":""}]') + 100
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=2 * entry_size)
+
+    assert cache.get("a") is None
+    cache.put("a", pages)
+    cache.put("b", pages)
+    # Make "a" the older entry, then read it so "b" becomes least recently used
+    now = time.time()
+    os.utime(cache._entry_path("a"), (now - 20, now - 20))
+    os.utime(cache._entry_path("b"), (now - 10, now - 10))
+    assert cache.get("a") == pages
+    cache.put("c", pages)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == pages and cache.get("c") == pages
+    assert cache.stats() == {"hits": 3, "misses": 2, "evictions": 1, "entries": 2,
+                             "bytes": 2 * entry_size, "max_bytes": 2 * entry_size}
+
+    # A damaged entry is a miss rather than an error
+    cache._entry_path("c").write_text("[{")
+    assert cache.get("c") is None and cache.misses == 3
+
+    cache.clear()
+    assert cache.get("a") is None
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (0, 0)
+
+def test_file_digest_is_the_sha256_of_the_file(tmp_path):
+    path = tmp_path / "list.pdf"
+    path.write_bytes(os.urandom(3000))
+
+    digest = ExtractionCache.file_digest(str(path), chunk_size=1024)
+
+    assert digest == hashlib.sha256(path.read_bytes()).hexdigest()
+
+def test_repeat_extraction_is_served_from_the_cache(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    converter = StudentDataConverter(cache=cache)
+    first = converter.extract_data_from_pdf(str(SAMPLE_PDF))
+
+    def no_parse(*args, **kwargs):
+        raise AssertionError("parsed a PDF that was already cached")
+
+    monkeypatch.setattr(converter, "_analyze_pdf", no_parse)
+    progress = []
+
+    assert converter.extract_data_from_pdf(str(SAMPLE_PDF), progress=lambda *args: progress.append(args)) == first
+    assert progress[-1] == (2, 2, len(first))
+    # A different column mapping of the same file still comes from the cache
+    remapped = converter.extract_data_from_pdf(str(SAMPLE_PDF), {"Rno": 0, "CN": 2})
+    assert remapped[0] == {"Rno": first[0]["Rno"], "CN": first[0]["CN"]}
+    assert (cache.hits, cache.misses) == (2, 1)
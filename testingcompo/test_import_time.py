@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Import-time budget tests for the converter, wrapper and API entry points
+Run: python -m pytest test_import_time.py
+Set IMPORT_BUDGET_SCALE (e.g. 2.0) on slow machines.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HERE = Path(__file__).parent
+
+# Budgets in milliseconds for the time spent importing each module
+BUDGETS_MS = {
+    "pdf_to_json_converter": 100,
+    "python_wrapper": 100,
+    # Measured excluding FastAPI itself, which the API cannot avoid
+    "main": 150,
+}
+
+# Libraries that only the PDF extraction path needs
+HEAVY_MODULES = {"pdfplumber", "pdfminer", "pandas", "numpy"}
+
+def import_profile(module):
+    """Run `python -X importtime -c 'import module'` and return {module: cumulative_us}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True, check=True
+    )
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+def import_time_ms(module):
+    """Best-of-three import time of a module, in milliseconds"""
+    best = None
+    for _ in range(3):
+        profile = import_profile(module)
+        elapsed = profile[module] - (profile.get("fastapi", 0) if module == "main" else 0)
+        best = elapsed if best is None else min(best, elapsed)
+    return best / 1000
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_heavy_dependencies_are_lazy(module):
+    imported = {name.split(".")[0] for name in import_profile(module)}
+    assert not imported & HEAVY_MODULES, f"{module} eagerly imports {sorted(imported & HEAVY_MODULES)}"
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_import_time_budget(module):
+    budget = BUDGETS_MS[module] * float(os.environ.get("IMPORT_BUDGET_SCALE", "1"))
+    elapsed = import_time_ms(module)
+    assert elapsed <= budget, f"importing {module} took {elapsed:.1f} ms (budget {budget:.0f} ms)"
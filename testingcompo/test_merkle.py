@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Merkle tests: roots match the RFC 6962 tree hash, inclusion and consistency
+proofs verify for every leaf and earlier size and fail once tampered with or
+out of range, updates give the same tree as a rebuild, and the proof
+endpoints round-trip
+Run: python -m pytest test_merkle.py
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from changelog import ChangeLog, UPSERT
+from merkle import EMPTY_ROOT, MerkleTree, leaf_hash, node_hash, verify_consistency, verify_proof
+from student_store import StudentStore
+
+def students(count, tag=""):
+    return [{"Rno": f"24/A01/{i:03d}", "Jno": f"2403{i:08d}", "CN": f"STUDENT {i}{tag}", "B": "CS", "Sec": "Sec-1"}
+            for i in range(count)]
+
+def tree(records):
+    return MerkleTree.build(StudentStore(records))
+
+def rfc6962_root(leaves):
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1 << (len(leaves) - 1).bit_length() - 1
+    return node_hash(rfc6962_root(leaves[:split]), rfc6962_root(leaves[split:]))
+
+def flip(digest):
+    return ("0" if digest[0] != "0" else "1") + digest[1:]
+
+def test_root_is_the_rfc6962_tree_hash():
+    assert tree([]).root == EMPTY_ROOT
+    for size in range(1, 40):
+        records = students(size)
+        assert tree(records).root == rfc6962_root([leaf_hash(record) for record in records]).hex(), size
+
+def test_inclusion_proofs_verify_for_every_leaf():
+    for size in (1, 2, 7, 16, 33):
+        records = students(size)
+        merkle = tree(records)
+        for index, record in enumerate(records):
+            leaf = leaf_hash(record).hex()
+            assert merkle.leaf(index) == leaf
+            assert verify_proof(leaf, merkle.proof(index), merkle.root), (size, index)
+
+def test_tampered_inclusion_proofs_fail():
+    records = students(13)
+    merkle = tree(records)
+    leaf, proof, root = leaf_hash(records[5]).hex(), merkle.proof(5), merkle.root
+
+    other = leaf_hash({**records[5], "CN": "SOMEONE ELSE"}).hex()
+    swapped = [{**step, "position": "left" if step["position"] == "right" else "right"} for step in proof]
+    assert not verify_proof(other, proof, root)
+    assert not verify_proof(leaf, [{**proof[0], "hash": flip(proof[0]["hash"])}] + proof[1:], root)
+    assert not verify_proof(leaf, swapped, root)
+    assert not verify_proof(leaf, proof[:-1], root)
+    assert not verify_proof(leaf, merkle.proof(6), root)
+    assert not verify_proof(leaf, proof, flip(root))
+    assert not verify_proof(leaf, [{"hash": "not hex", "position": "left"}], root)
+    assert not verify_proof(leaf, [{"position": "left"}], root)
+
+def test_out_of_range_proofs_are_refused():
+    merkle = tree(students(5))
+
+    for index in (-1, 5):
+        with pytest.raises(IndexError):
+            merkle.proof(index)
+    for size in (-1, 6):
+        with pytest.raises(IndexError):
+            merkle.consistency_proof(size)
+    with pytest.raises(IndexError):
+        tree([]).proof(0)
+
+def test_consistency_proofs_verify_for_every_earlier_size():
+    records = students(37)
+    for second in (1, 2, 8, 9, 37):
+        current = tree(records[:second])
+        for first in range(second + 1):
+            earlier = tree(records[:first])
+            proof = current.consistency_proof(first)
+            assert verify_consistency(first, second, earlier.root, current.root, proof), (first, second)
+
+def test_tampered_consistency_proofs_fail():
+    records = students(21)
+    earlier, current = tree(records[:6]), tree(records)
+    proof = current.consistency_proof(6)
+    assert verify_consistency(6, 21, earlier.root, current.root, proof)
+
+    assert not verify_consistency(6, 21, earlier.root, current.root, [flip(proof[0])] + proof[1:])
+    assert not verify_consistency(6, 21, earlier.root, current.root, proof[:-1])
+    assert not verify_consistency(6, 21, earlier.root, current.root, proof + [proof[0]])
+    assert not verify_consistency(6, 21, earlier.root, current.root, [])
+    assert not verify_consistency(6, 21, flip(earlier.root), current.root, proof)
+    assert not verify_consistency(6, 21, earlier.root, flip(current.root), proof)
+    assert not verify_consistency(7, 21, earlier.root, current.root, proof)
+    assert not verify_consistency(22, 21, earlier.root, current.root, proof)
+    assert not verify_consistency(6, 21, earlier.root, current.root, ["not hex"])
+    # An earlier record changed since: the old tree is no longer a prefix
+    rewritten = tree(records[:3] + students(21, " (edited)")[3:4] + records[4:])
+    assert not verify_consistency(6, 21, earlier.root, rewritten.root, rewritten.consistency_proof(6))
+
+def test_updates_match_a_rebuild():
+    records = students(20)
+    merkle = tree(records)
+    changed = {3: {**records[3], "CN": "RENAMED"}, 20: students(22)[20], 21: students(22)[21]}
+    updated = merkle.updated({row_id: leaf_hash(record) for row_id, record in changed.items()}, 22)
+
+    rebuilt = records + [changed[20], changed[21]]
+    rebuilt[3] = changed[3]
+    assert updated.levels == tree(rebuilt).levels
+    # The previous version is left as it was
+    assert merkle.root == tree(records).root
+
+def test_proof_endpoints(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "changelog", ChangeLog(str(tmp_path / "changes.log")))
+    records = students(9)
+    main.dataset.commit(main.changelog, UPSERT, "merkle-proofs", students=records[:5])
+    earlier_root = main.dataset.get("merkle-proofs").merkle.root
+    main.dataset.commit(main.changelog, UPSERT, "merkle-proofs", students=records[5:])
+
+    async def requests():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            proof = (await client.get("/merkle/proof", params={"roll_no": "24/A01/006",
+                                                               "institution": "merkle-proofs"})).json()
+            verified = (await client.post("/merkle/verify", json={
+                "student": proof["data"], "proof": proof["proof"], "root": proof["root"]})).json()
+            tampered = (await client.post("/merkle/verify", json={
+                "student": {**proof["data"], "Sec": "Sec-2"}, "proof": proof["proof"], "root": proof["root"]})).json()
+            consistency = await client.get("/merkle/consistency", params={"first_size": 5, "institution": "merkle-proofs"})
+            too_large = await client.get("/merkle/consistency", params={"first_size": 10, "institution": "merkle-proofs"})
+            return proof, verified, tampered, consistency, too_large
+
+    proof, verified, tampered, consistency, too_large = asyncio.run(requests())
+
+    assert proof["leaf_index"] == 6
+    assert verified["valid"] and not tampered["valid"]
+    assert consistency.status_code == 200
+    body = consistency.json()
+    assert (body["first_size"], body["second_size"], body["root"]) == (5, 9, proof["root"])
+    assert verify_consistency(5, 9, earlier_root, body["root"], body["proof"])
+    assert too_large.status_code == 400
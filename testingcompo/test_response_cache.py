@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Response cache tests: cached GET responses carry an ETag, a matching
+If-None-Match gets 304 without a body, an upload changes the ETag and the
+body, and the cache evicts least recently used entries past its size
+Run: python -m pytest test_response_cache.py
+"""
+
+import asyncio
+import json
+
+import httpx
+
+import main
+from changelog import ChangeLog
+from response_cache import ResponseCache
+
+def upload(client, institution, students):
+    body = json.dumps(students)
+    return client.post(f"/upload/json?institution={institution}", files={"file": ("students.json", body)})
+
+def test_etags_and_conditional_requests(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "changelog", ChangeLog(str(tmp_path / "changes.log")))
+    student = {"Rno": "24/A01/001", "Jno": "240310038495", "CN": "AADIT MOGHA", "B": "CS", "Sec": "Sec-1"}
+    path = "/students?institution=response-cache"
+
+    async def requests():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            await upload(client, "response-cache", [student])
+            first = await client.get(path)
+            hits = main.response_cache.hits
+            second = await client.get(path)
+            cached_hits = main.response_cache.hits - hits
+            etag = first.headers["etag"]
+            not_modified = [
+                await client.get(path, headers={"If-None-Match": tag})
+                for tag in (etag, f"W/{etag}", f'"other", {etag}', "*")
+            ]
+            other = await client.get(path, headers={"If-None-Match": '"other"'})
+            other_path = await client.get("/institutions", headers={"If-None-Match": etag})
+
+            await upload(client, "response-cache", [{**student, "Rno": "24/A01/002", "Jno": "240310038496"}])
+            after_upload = await client.get(path, headers={"If-None-Match": etag})
+            return first, second, cached_hits, not_modified, other, other_path, after_upload
+
+    first, second, cached_hits, not_modified, other, other_path, after_upload = asyncio.run(requests())
+
+    assert first.status_code == 200 and first.headers["etag"].startswith('"')
+    assert (second.content, second.headers["etag"]) == (first.content, first.headers["etag"])
+    assert cached_hits == 1
+    for response in not_modified:
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == first.headers["etag"]
+    assert other.status_code == 200
+    assert other_path.status_code == 200 and other_path.headers["etag"] != first.headers["etag"]
+
+    assert after_upload.status_code == 200
+    assert after_upload.headers["etag"] != first.headers["etag"]
+    assert len(after_upload.json()["data"]) == 2
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", b"aaaa", "text/plain")
+    cache.put("b", b"bbbb", "text/plain")
+    assert cache.get("a") == (b"aaaa", "text/plain")
+
+    cache.put("c", b"cccc", "text/plain")
+    # A body larger than the whole cache is not stored at all
+    cache.put("d", b"d" * 11, "text/plain")
+
+    assert cache.get("b") is None and cache.get("d") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert (cache.bytes, cache.evictions) == (8, 1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Snapshot tests: records written as a binary snapshot read back unchanged,
+with 16-bit and 32-bit dictionary codes, through the converter's JSON and
+snapshot formats alike; files are replaced atomically; a dataset over a
+snapshot builds its indexes only when they are used
+Run: python -m pytest test_snapshot.py
+"""
+
+import os
+
+import pytest
+
+from atomic_file import atomic_write
+from dataset import StudentDataset
+from pdf_to_json_converter import StudentDataConverter
+from snapshot import SnapshotStore, write_snapshot
+from student_store import StudentStore
+
+def students(count):
+    # B gets more distinct values than 16-bit codes can hold, Sec only a few
+    return [{"Rno": f"24/A01/{i:06d}", "Jno": f"2403{i:08d}", "CN": f"STUDENT {i} ÄÖ" if i % 7 else "",
+             "B": f"B{i}", "Sec": f"Sec-{i % 3}"} for i in range(count)]
+
+def test_snapshot_round_trip_with_16_and_32_bit_codes(tmp_path):
+    records = students(70000)
+    path = str(tmp_path / "students.snap")
+    write_snapshot(StudentStore(records), path)
+
+    store = SnapshotStore(path)
+
+    assert store.column("Sec").codes.format == "H"
+    assert store.column("B").codes.format == "I"
+    assert len(store) == len(records)
+    assert store.to_list() == records
+    assert store[65536] == records[65536]
+
+def test_converter_chooses_the_format_by_extension(tmp_path):
+    records = students(50)
+    converter = StudentDataConverter()
+
+    for name in ("students.json", "students.snap"):
+        path = str(tmp_path / name)
+        converter.save(records, path)
+        assert converter.load(path).to_list() == records
+
+    assert isinstance(converter.load(str(tmp_path / "students.snap")), SnapshotStore)
+
+def test_failed_write_leaves_the_old_file(tmp_path):
+    path = tmp_path / "students.json"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path), "w", encoding="utf-8") as f:
+            f.write("partial")
+            raise RuntimeError("disk full")
+
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["students.json"]
+
+    with atomic_write(str(path), "w", encoding="utf-8") as f:
+        f.write("new")
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == ["students.json"]
+
+def test_indexes_are_built_on_first_use(tmp_path):
+    path = str(tmp_path / "students.snap")
+    write_snapshot(StudentStore(students(1000)), path)
+    shard = StudentDataset(SnapshotStore(path))
+    built = lambda: {name for name, structure in shard._structures.items() if structure is not None}
+
+    assert built() == set()
+    assert shard.find_by_roll("24/A01/000500")["Jno"] == "240300000500"
+    assert built() == {"index"}
+
+    shard.build()
+
+    assert built() == set(StudentDataset.BUILDERS)
+    assert shard.merkle.root == StudentDataset(students(1000)).merkle.root
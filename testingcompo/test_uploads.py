@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Upload tests: large PDF uploads are spooled to disk and large JSON uploads
+parsed at flat memory, bodies over the size limit are refused early,
+invalid JSON records are reported one by one, and a replace from a broken
+JSON file leaves the institution unchanged; queued PDFs run as background
+jobs whose progress, outcome and errors are reported at /jobs/{id}
+Run: python -m pytest test_uploads.py
+"""
+
+import asyncio
+import json
+import os
+import threading
+import tracemalloc
+
+import httpx
+import pytest
+
+import main
+from changelog import ChangeLog
+from dataset import StudentDataset
+from jobs import COMPLETED, FAILED, RUNNING, Job, JobManager, JobQueueFull
+from uploads import UploadLimitMiddleware
+
+MB = 1024 * 1024
+
+# Python heap allowed for a whole upload, however large the file. The
+# uploads below are several times larger, and small enough to stream in a
+# few seconds with allocation tracing on
+MEMORY_LIMIT = 1 * MB
+
+# Size of the chunks the client sends; the server's own buffers are smaller
+# than the limit above only if these are too
+CHUNK_SIZE = 64 * 1024
+
+BOUNDARY = b"----test-upload-boundary"
+
+def multipart_envelope(filename="scan.pdf"):
+    """The bytes before and after the file in a multipart/form-data body"""
+    head = (b"--" + BOUNDARY + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="' + filename.encode() + b'"\r\n'
+            b"Content-Type: application/pdf\r\n\r\n")
+    return head, b"\r\n--" + BOUNDARY + b"--\r\n"
+
+def multipart_body(size, chunk_size=MB):
+    """Yield a multipart/form-data body with one file of `size` bytes, chunk by chunk"""
+    head, tail = multipart_envelope()
+    yield head
+    chunk = b"%PDF" * (chunk_size // 4)
+    for offset in range(0, size, chunk_size):
+        yield chunk[:min(chunk_size, size - offset)]
+    yield tail
+
+def body_length(size):
+    head, tail = multipart_envelope()
+    return len(head) + size + len(tail)
+
+async def post(app, path, chunks, content_length=None):
+    """Send a streamed POST straight to an ASGI app; return (status, receive calls)"""
+    chunks = iter(chunks)
+    calls = 0
+    status = None
+    body_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive():
+        nonlocal calls, body_sent
+        if body_sent:
+            # Like a server: nothing more arrives until the client goes away after the response
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+        calls += 1
+        chunk = next(chunks, None)
+        body_sent = chunk is None
+        return {"type": "http.request", "body": chunk or b"", "more_body": not body_sent}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif not message.get("more_body", False):
+            response_complete.set()
+
+    headers = [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "method": "POST", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": headers, "scheme": "http", "server": ("test", 80), "client": ("test", 1234),
+             "http_version": "1.1", "root_path": "", "app": app}
+    await app(scope, receive, send)
+    return status, calls
+
+@pytest.fixture
+def spooled_sizes(monkeypatch):
+    """Replace PDF extraction with a probe recording the size of each spooled file"""
+    sizes = []
+
+    def extract(pdf_path, *args, **kwargs):
+        sizes.append(os.path.getsize(pdf_path))
+        return []
+
+    monkeypatch.setattr(main.converter, "extract_data_from_pdf", extract)
+    return sizes
+
+async def upload_pdfs(sizes):
+    """Upload PDFs of the given sizes concurrently; return the statuses and peak traced memory"""
+    # Build the middleware stack and start the job workers outside the measurement
+    await post(main.app, "/upload/pdf", multipart_body(1024))
+
+    tracemalloc.start()
+    try:
+        results = await asyncio.gather(*(
+            post(main.app, "/upload/pdf", multipart_body(size, CHUNK_SIZE), content_length=body_length(size))
+            for size in sizes
+        ))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    while any(not job.finished for job in main.ingest_jobs.jobs.values()):
+        await asyncio.sleep(0.05)
+    await main.ingest_jobs.shutdown()
+    return [status for status, _ in results], peak
+
+def test_large_upload_is_spooled_at_flat_memory(spooled_sizes):
+    statuses, peak = asyncio.run(upload_pdfs([8 * MB]))
+
+    assert statuses == [202]
+    assert spooled_sizes[-1] == 8 * MB
+    assert peak < MEMORY_LIMIT, f"8 MB upload peaked at {peak / MB:.1f} MB of Python heap"
+
+def test_concurrent_uploads_stay_flat(spooled_sizes):
+    statuses, peak = asyncio.run(upload_pdfs([2 * MB] * 4))
+
+    assert statuses == [202] * 4
+    assert sorted(spooled_sizes[-4:]) == [2 * MB] * 4
+    assert peak < MEMORY_LIMIT, f"4 concurrent 2 MB uploads peaked at {peak / MB:.1f} MB of Python heap"
+
+def test_declared_oversized_upload_is_refused_before_reading():
+    app = UploadLimitMiddleware(main.app, max_bytes=MB, paths={"/upload/pdf"})
+    status, calls = asyncio.run(post(app, "/upload/pdf", multipart_body(10 * MB), content_length=body_length(10 * MB)))
+
+    assert status == 413
+    assert calls == 0
+
+def test_streamed_oversized_upload_is_cut_off():
+    app = UploadLimitMiddleware(main.app, max_bytes=MB, paths={"/upload/pdf"})
+    status, calls = asyncio.run(post(app, "/upload/pdf", multipart_body(100 * MB)))
+
+    assert status == 413
+    # Header chunk, then no more than the limit's worth of file chunks
+    assert calls <= 3
+
+def test_json_upload_reports_invalid_records(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "changelog", ChangeLog(str(tmp_path / "changes.log")))
+    records = [{"foo": 1}, {"Rno": "1", "Jno": 2, "CN": "A", "B": "CS", "Sec": "S1"}, "not a student"]
+    body = json.dumps(records)[:-1] + ', {"Rno": tru}]'
+
+    async def upload():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            return await client.post("/upload/json?institution=invalid-records",
+                                     files={"file": ("students.json", body)})
+
+    response = asyncio.run(upload())
+
+    assert response.status_code == 200
+    assert response.json()["students_count"] == 1
+    assert response.json()["invalid_count"] == 3
+    assert [record["index"] for record in response.json()["invalid_records"]] == [0, 2, 3]
+    assert main.dataset.get("invalid-records").find_by_application("2")["Rno"] == "1"
+
+def test_json_replace_with_a_broken_array_keeps_the_institution(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "changelog", ChangeLog(str(tmp_path / "changes.log")))
+    monkeypatch.setattr(main, "JSON_UPLOAD_BATCH_SIZE", 2)
+    records = [{"Rno": f"R{i}", "Jno": f"J{i}", "CN": f"NEW {i}", "B": "CS", "Sec": "S1"} for i in range(5)]
+
+    async def upload(body):
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            return await client.post("/upload/json?institution=staged-replace&replace=true",
+                                     files={"file": ("students.json", body)})
+
+    assert asyncio.run(upload(json.dumps(records[:3]))).status_code == 200
+    before = main.dataset.get("staged-replace")
+
+    # Several batches' worth of valid records before the file is cut off
+    broken = asyncio.run(upload(json.dumps(records)[:-1] + ', {"Rno": "R9"'))
+
+    assert broken.status_code == 400
+    assert broken.json()["detail"]["students_count"] == 0
+    assert main.dataset.get("staged-replace") is before
+    assert main.changelog.last_seq == 1
+
+    replaced = asyncio.run(upload(json.dumps(records[3:])))
+
+    assert replaced.status_code == 200
+    assert replaced.json()["institution_count"] == 2
+    assert main.dataset.get("staged-replace").find_by_roll("R0") is None
+
+def json_body(count, chunk_records=1000):
+    """Yield a multipart/form-data body with a JSON array of `count` students, chunk by chunk"""
+    head, tail = multipart_envelope("students.json")
+    yield head + b"["
+    for start in range(0, count, chunk_records):
+        yield b",".join(
+            json.dumps({"Rno": f"24/A{i // 1000 % 100:02d}/{i:07d}", "Jno": f"2403{i:08d}",
+                        "CN": f"STUDENT {i}", "B": "CS", "Sec": "Sec-1"}).encode()
+            for i in range(start, min(start + chunk_records, count))
+        ) + (b"," if start + chunk_records < count else b"")
+    yield b"]" + tail
+
+def test_large_json_upload_is_parsed_at_flat_memory(monkeypatch):
+    committed = []
+    monkeypatch.setattr(main, "JSON_UPLOAD_BATCH_SIZE", 500)
+
+    def commit(changelog, op, institution, students=None, keys=None):
+        committed.append(len(students))
+        return StudentDataset()
+
+    monkeypatch.setattr(main.dataset, "commit", commit)
+
+    async def upload():
+        await post(main.app, "/upload/json", json_body(10))
+        tracemalloc.start()
+        try:
+            status, _ = await post(main.app, "/upload/json", json_body(40_000, chunk_records=250))
+            return status, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    status, peak = asyncio.run(upload())
+
+    assert status == 200
+    assert sum(committed[1:]) == 40_000
+    assert max(committed) <= main.JSON_UPLOAD_BATCH_SIZE + 250
+    assert peak < MEMORY_LIMIT, f"Parsing a 40k record (3.8 MB) JSON upload peaked at {peak / MB:.1f} MB of Python heap"
+
+def test_jobs_run_in_the_background_and_report_failures():
+    manager = JobManager(workers=1, max_queued=1, history=1)
+    release = threading.Event()
+    completed = []
+
+    def slow(job):
+        job.report_progress(1, 2, 10)
+        release.wait(5)
+        return 10
+
+    def broken(job):
+        raise ValueError("no student table")
+
+    async def run():
+        first = manager.submit(Job("first.pdf"), slow, lambda job, result: completed.append((job.id, result)))
+        # The worker has not taken the first job off the queue yet
+        with pytest.raises(JobQueueFull):
+            manager.submit(Job("refused.pdf"), slow)
+        while first.status != RUNNING:
+            await asyncio.sleep(0.01)
+        progress = first.to_dict()
+
+        second = manager.submit(Job("second.pdf"), broken)
+        release.set()
+        while not second.finished:
+            await asyncio.sleep(0.01)
+        # Submitting trims the history down to the most recent finished job
+        third = manager.submit(Job("third.pdf"), lambda job: None)
+        while not third.finished:
+            await asyncio.sleep(0.01)
+        await manager.shutdown()
+        return first, second, third, progress
+
+    first, second, third, progress = asyncio.run(run())
+
+    assert (progress["pages_processed"], progress["pages_total"], progress["records_found"]) == (1, 2, 10)
+    assert progress["started_at"] is not None and progress["finished_at"] is None
+    assert first.status == COMPLETED and completed == [(first.id, 10)]
+    assert second.status == FAILED and second.errors == ["no student table"]
+    assert second.finished_at >= second.started_at
+    assert third.status == COMPLETED
+    assert manager.get(first.id) is None
+    assert manager.get(second.id) is second and manager.get(third.id) is third
+
+def test_job_status_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "changelog", ChangeLog(str(tmp_path / "changes.log")))
+    student = {"Rno": "24/A01/001", "Jno": "240310038495", "CN": "AADIT MOGHA", "B": "CS", "Sec": "Sec-1"}
+
+    def extract(pdf_path, mapping=None, workers=1, progress=None, method=None):
+        progress(2, 2, 1)
+        if os.path.getsize(pdf_path) < 8:
+            raise ValueError("not a PDF")
+        return [student]
+
+    monkeypatch.setattr(main.converter, "extract_data_from_pdf", extract)
+
+    async def requests():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            queued = [(await client.post("/upload/pdf?institution=background-jobs",
+                                         files={"file": ("list.pdf", body)})).json()
+                      for body in (b"%PDF-1.4 list", b"%PDF")]
+            while any(not job.finished for job in main.ingest_jobs.jobs.values()):
+                await asyncio.sleep(0.05)
+            statuses = [(await client.get(job["status_url"])).json() for job in queued]
+            missing = await client.get("/jobs/unknown")
+        await main.ingest_jobs.shutdown()
+        return queued, statuses, missing
+
+    queued, (done, failed), missing = asyncio.run(requests())
+
+    assert [job["status"] for job in queued] == ["queued", "queued"]
+    assert done["job_id"] == queued[0]["job_id"] and done["filename"] == "list.pdf"
+    assert done["status"] == COMPLETED
+    assert (done["pages_processed"], done["pages_total"], done["records_found"]) == (2, 2, 1)
+    assert done["result"]["students_count"] == 1 and done["result"]["institution"] == "background-jobs"
+    assert done["result"]["merkle_root"] == main.dataset.get("background-jobs").merkle.root
+    assert failed["status"] == FAILED and failed["errors"] == ["not a PDF"]
+    assert missing.status_code == 404
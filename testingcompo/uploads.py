@@ -0,0 +1,373 @@
+import codecs
+import json
+import os
+import re
+import tempfile
+from typing import AsyncIterator, Collection, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+DEFAULT_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+# Largest plain form field (e.g. column_mapping) read alongside an upload
+MAX_FIELD_BYTES = 64 * 1024
+
+# Largest single element of a streamed JSON array
+MAX_JSON_ELEMENT_CHARS = 1024 * 1024
+
+
+def upload_openapi(description: str) -> Dict:
+    """
+    OpenAPI request body for an endpoint that reads a "file" field with StreamedUpload
+    """
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["file"],
+        "properties": {"file": {"type": "string", "format": "binary", "description": description}}
+    }}}}}
+
+
+class StreamedUpload:
+    """
+    One file field read straight from a multipart/form-data request body
+
+    FastAPI's UploadFile has the whole body parsed and spooled to an
+    anonymous temporary file before the handler runs, so keeping the file
+    means copying it a second time. This parses the body as it arrives
+    instead: open() reads up to the file's headers (so the filename can be
+    checked before any content is read) and chunks() yields the content as
+    it streams in. Plain form fields are collected in `fields`; those after
+    the file are only there once chunks() is exhausted.
+    """
+
+    def __init__(self, request, field: str = "file"):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+        self.field = field
+        self.filename: Optional[str] = None
+        self.fields: Dict[str, str] = {}
+        self._stream = request.stream().__aiter__()
+        self._stream_done = False
+        self._data: List[bytes] = []
+        self._file_done = False
+
+        # Per-part parsing state
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._kind: Optional[str] = None  # "file", "field" or "skip" (other files)
+        self._name = ""
+        self._value = bytearray()
+
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._kind = None
+        self._value = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in options:
+            self._kind = "field"
+        elif self._name == self.field and self.filename is None:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._kind = "file"
+        else:
+            self._kind = "skip"
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._kind == "file":
+            self._data.append(data[start:end])
+        elif self._kind == "field":
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=400, detail=f"Form field '{self._name}' is too large")
+
+    def _on_part_end(self):
+        if self._kind == "file":
+            self._file_done = True
+        elif self._kind == "field":
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+        self._kind = None
+
+    async def _feed(self) -> bool:
+        """Parse the next chunk of the body; False once the body is exhausted"""
+        if self._stream_done:
+            return False
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._stream_done = True
+            self._parser.finalize()
+            return False
+        self._parser.write(chunk)
+        return True
+
+    async def open(self) -> "StreamedUpload":
+        """Read the body up to the file's headers; 400 if the request has no such file"""
+        while self.filename is None:
+            if not await self._feed():
+                raise HTTPException(status_code=400, detail=f"Missing file field '{self.field}'")
+        return self
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Yield the file's content as it arrives, then consume the rest of the body"""
+        await self.open()
+        while True:
+            if self._data:
+                data, self._data = self._data, []
+                for piece in data:
+                    yield piece
+            if self._file_done or not await self._feed():
+                break
+        while await self._feed():
+            pass
+
+
+class JsonArraySplitter:
+    """
+    Split a top-level JSON array, fed in chunks, into the source text of its elements
+
+    Only the unfinished element is buffered, so memory is bounded by the
+    largest element rather than the file. Element boundaries are found by
+    a regex scan that only stops at quotes, escapes, brackets and commas;
+    the elements themselves are not decoded here, so a malformed element
+    can be reported on its own. Errors in the array structure (which lose
+    track of where elements start) raise ValueError.
+    """
+
+    TOKENS = re.compile(r'\\.|\\|["{}\[\],]', re.DOTALL)
+    # A whole element without nesting (object, string or scalar) and the
+    # comma or bracket after it, split in one match; most student records
+    FLAT_ELEMENT = re.compile(
+        r'[ \t\r\n]*(\{[^{}\[\]"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}\[\]"]*)*\}|"[^"\\]*(?:\\.[^"\\]*)*"|[^ \t\r\n,\[\]{}"]*)'
+        r'[ \t\r\n]*([,\]])',
+        re.DOTALL
+    )
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, max_element_chars: int = MAX_JSON_ELEMENT_CHARS):
+        self.max_element_chars = max_element_chars
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._scanned = 0  # Buffer position the scan resumes from
+        self._depth = 0
+        self._in_string = False
+        self._state = "start"  # "start", "elements" or "end"
+        self._pending_comma = False
+        self.count = 0  # Elements returned so far
+        self.offset = 0  # Characters dropped from the front of the buffer
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[str]:
+        """Add the next chunk of the file; return the elements it completes"""
+        try:
+            self._buffer += self._decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            raise ValueError("File is not valid UTF-8")
+        elements = self._split()
+        if len(self._buffer) > self.max_element_chars:
+            raise ValueError(f"Element {self.count} is larger than {self.max_element_chars} characters")
+        return elements
+
+    def close(self) -> List[str]:
+        """Split what is left at the end of the file and check the array was closed"""
+        elements = self.feed(b"", final=True)
+        if self._state == "start":
+            raise ValueError("JSON must contain an array of student objects")
+        if self._state == "elements":
+            raise ValueError(f"Unexpected end of file in element {self.count}")
+        return elements
+
+    def _split(self) -> List[str]:
+        elements = []
+        buffer = self._buffer
+        start = 0
+
+        if self._state == "start":
+            stripped = buffer.lstrip(self.WHITESPACE)
+            if not stripped:
+                return elements
+            if stripped[0] != "[":
+                raise ValueError("JSON must contain an array of student objects")
+            start = len(buffer) - len(stripped) + 1
+            self._scanned = start
+            self._state = "elements"
+
+        while self._state == "elements":
+            if self._scanned == start and not self._depth and not self._in_string:
+                match = self.FLAT_ELEMENT.match(buffer, start)
+                if match is not None:
+                    start = self._scanned = self._end_element(elements, match.group(1), match.group(2), match.start(2))
+                    continue
+
+            # A nested element, or one that is not complete yet: scan it token by token
+            end = self._scan(buffer)
+            if end is None:
+                break
+            token, position = end
+            start = self._scanned = self._end_element(elements, buffer[start:position], token, position)
+
+        if self._state == "end":
+            if buffer[start:].strip(self.WHITESPACE):
+                raise ValueError(f"Unexpected data after the array at character {self.offset + start}")
+            start = len(buffer)
+
+        # Drop what has been split off; the scan resumes where it stopped
+        self._buffer = buffer[start:]
+        self._scanned = max(self._scanned - start, 0)
+        self.offset += start
+        return elements
+
+    def _scan(self, buffer: str) -> Optional[Tuple[str, int]]:
+        """
+        Scan on from where the last scan stopped to the comma or bracket that
+        ends the current element; None if the buffer ends first
+        """
+        for match in self.TOKENS.finditer(buffer, self._scanned):
+            token = match.group()
+            if token == "\\":
+                # An escape cut off by the end of the chunk; wait for its second half
+                self._scanned = match.start()
+                return None
+            if self._in_string:
+                if token == '"':
+                    self._in_string = False
+            elif token == '"':
+                self._in_string = True
+            elif token in "{[":
+                self._depth += 1
+            elif self._depth > 0:
+                # Commas and closing brackets inside the element
+                if token != ",":
+                    self._depth -= 1
+            elif token == "}":
+                raise ValueError(f"Unbalanced '}}' at character {self.offset + match.start()}")
+            else:
+                return token, match.start()
+        self._scanned = len(buffer)
+        return None
+
+    def _end_element(self, elements: List[str], text: str, token: str, position: int) -> int:
+        """Record the element ended by token (a comma or the closing bracket); return where the next one starts"""
+        text = text.strip(self.WHITESPACE)
+        if text:
+            elements.append(text)
+            self.count += 1
+        elif token == "," or self._pending_comma:
+            raise ValueError(f"Missing element {self.count} at character {self.offset + position}")
+        self._pending_comma = token == ","
+        if token == "]":
+            self._state = "end"
+        return position + 1
+
+
+async def spool_upload(upload: StreamedUpload, suffix: str = "", directory: Optional[str] = None) -> str:
+    """
+    Write an upload to a new, uniquely named temporary file as it streams in
+
+    Only one chunk is held in memory at a time, and writes happen off the
+    event loop. The caller owns the returned path and must remove it.
+    """
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in upload.chunks():
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware rejecting upload request bodies larger than max_bytes with 413
+
+    A declared Content-Length over the limit is refused before any of the
+    body is read. Otherwise the body is counted as it streams in: once the
+    limit is passed the 413 is sent at once, the app is told the client has
+    gone, and whatever the app does with the truncated body is discarded.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Collection[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def reject(self, send):
+        body = json.dumps({"detail": f"Upload exceeds the limit of {self.max_bytes} bytes"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self.reject(send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    if not response_started:
+                        await self.reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app fails on the body it was cut off from; the 413 already went out
+            if not rejected:
+                raise